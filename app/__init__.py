@@ -9,15 +9,30 @@ login_manager = LoginManager()
 csrf = CSRFProtect()
 
 def create_app():
+    from app.startup import timed, begin_startup, startup_report, format_startup_report
+    begin_startup()
+
+    with timed('create_app', 'total'):
+        app = _build_app()
+
+    if app.config['STARTUP_REPORT']:
+        print(format_startup_report(startup_report()))
+
+    return app
+
+def _build_app():
+    from app.startup import timed
+
     template_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'templates'))
     static_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static'))
 
     app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
     app.config.from_object('config.Config')
 
-    db.init_app(app)
-    login_manager.init_app(app)
-    csrf.init_app(app)
+    with timed('extension', 'sqlalchemy/login/csrf'):
+        db.init_app(app)
+        login_manager.init_app(app)
+        csrf.init_app(app)
 
     login_manager.login_view = 'auth.login'
 
@@ -28,23 +43,54 @@ def create_app():
         def load_user(user_id):
             return User.query.get(int(user_id))
 
-    # Import des blueprints
-    from app.auth import auth
-    from app.main import main
-    from app.employees import employees
-    from app.recruitment import recruitment_bp
-    from app.termination import termination_bp
-    from app.prediction_routes import prediction_bp
-
-    # Enregistrement des blueprints
-    app.register_blueprint(auth)
-    app.register_blueprint(main)
-    app.register_blueprint(employees)
-    app.register_blueprint(recruitment_bp)
-    app.register_blueprint(termination_bp)
-    app.register_blueprint(prediction_bp)
+    # Import et enregistrement des blueprints (chronométrés pour le rapport de démarrage)
+    with timed('blueprint', 'auth'):
+        from app.auth import auth
+        app.register_blueprint(auth)
+    with timed('blueprint', 'main'):
+        from app.main import main
+        app.register_blueprint(main)
+    with timed('blueprint', 'employees'):
+        from app.employees import employees
+        app.register_blueprint(employees)
+    with timed('blueprint', 'recruitment'):
+        from app.recruitment import recruitment_bp
+        app.register_blueprint(recruitment_bp)
+    with timed('blueprint', 'termination'):
+        from app.termination import termination_bp
+        app.register_blueprint(termination_bp)
+    with timed('blueprint', 'employees_api'):
+        from app.routes import employees_bp
+        app.register_blueprint(employees_bp)
+    with timed('blueprint', 'prediction'):
+        from app.prediction_routes import prediction_bp
+        app.register_blueprint(prediction_bp)
 
     # Invoke-RestMethod -Uri "http://localhost:5000/prediction/predict" -Method POST -ContentType "application/json" -Body '{"start_year": 2025, "end_year": 2027, "recruitments": 100, "departures": 50, "initial_employees": 1000}'Exemption CSRF pour le blueprint de prédiction
     csrf.exempt(prediction_bp)
+    # API JSON: corps application/json obligatoire (pas de formulaire inter-sites possible)
+    csrf.exempt(employees_bp)
+
+    from app.cli import register_cli
+    register_cli(app)
+
+    from app.model_loader import registry
+
+    # Modèle chargé, vérifié et préchauffé au démarrage: aucune requête ne paie le chargement
+    # 'sync': dans create_app(), 'background': dans un thread (démarrage rapide), 'off': au premier usage
+    if app.config['PRELOAD_MODEL'] == 'sync':
+        with timed('model', 'load + warmup'):
+            bundle = registry.current()
+        app.logger.info(f"Modèle chargé: version {bundle.version}")
+    elif app.config['PRELOAD_MODEL'] == 'background':
+        registry.preload()
+
+    # Surveillance des artefacts du modèle: nouveau bundle chargé sans redémarrage
+    # Démarrée à la première requête: les commandes flask n'en servent aucune, et le thread
+    # naît dans le worker qui sert (pas dans un processus maître qui fork ensuite)
+    if app.config['MODEL_WATCH_INTERVAL'] > 0:
+        @app.before_request
+        def start_model_watcher():
+            registry.watch(app.config['MODEL_WATCH_INTERVAL'])
 
-    return app
\ No newline at end of file
+    return app
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from app.startup import lazy_import
+
+np = lazy_import('numpy')
+xgboost = lazy_import('xgboost')
+
+# Format des bundles d'artefacts (à incrémenter si la structure change)
+# 1: un seul booster XGBoost; 2: plusieurs familles de modèles côte à côte
+BUNDLE_FORMAT = 2
+SUPPORTED_FORMATS = (1, 2)
+
+# Fichiers d'un bundle: ml_models/artifacts/bundles/<version>/
+MANIFEST_NAME = 'manifest.json'
+SCALER_NAME = 'scaler.npy'
+# Format 1: booster et tables compilées du modèle unique
+BOOSTER_NAME = 'booster.ubj'
+TREES_NAME = 'trees.npz'
+# Fichier pointeur vers la version courante: ml_models/artifacts/bundles/CURRENT
+CURRENT_NAME = 'CURRENT'
+
+# Familles de modèles sérialisables, fichiers écrits pour un modèle nommé <name>:
+# - xgboost: booster natif <name>.ubj (UBJSON) + tables compilées <name>.trees.npz (optionnelles)
+# - random_forest: uniquement ses tables d'arbres compilées <name>.trees.npz
+# - linear: <name>.npy, coefficients puis constante (espace normalisé)
+MODEL_FAMILIES = ('xgboost', 'random_forest', 'linear')
+
+
+class ArrayScaler:
+    """
+    Équivalent de StandardScaler.transform à partir de tableaux (moyenne, écart-type)
+    Les paramètres sont lus depuis un fichier .npy projeté en mémoire
+    """
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.n_features_in_ = len(mean)
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+
+class LinearModel:
+    """Équivalent de LinearRegression.predict à partir de ses coefficients"""
+
+    def __init__(self, coef, intercept):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.n_features_in_ = len(coef)
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _write_model(staging, name, family, model, compiled):
+    """Écrit les fichiers d'un modèle; retourne leurs noms"""
+    if family not in MODEL_FAMILIES:
+        raise ValueError(f"Famille de modèle inconnue: {family}")
+
+    files = []
+    if family == 'xgboost':
+        files.append(f'{name}.ubj')
+        model.get_booster().save_model(os.path.join(staging, files[-1]))
+    elif family == 'linear':
+        files.append(f'{name}.npy')
+        params = np.append(np.ravel(model.coef_), model.intercept_).astype(np.float64)
+        np.save(os.path.join(staging, files[-1]), params)
+
+    if family == 'random_forest' and compiled is None:
+        raise ValueError(f"Tables compilées requises pour la forêt aléatoire: {name}")
+    if compiled is not None:
+        files.append(f'{name}.trees.npz')
+        compiled.save(os.path.join(staging, files[-1]))
+    return files
+
+def write_bundle(bundles_dir, models, scaler, feature_names, default_model):
+    """
+    Écrit un bundle d'artefacts versionné puis le désigne comme version courante
+    - models: {nom: {'family', 'model', 'metrics', 'compiled'}} entraînés sur les mêmes features
+    - paramètres du scaler commun en tableau NumPy brut (2, n_features): moyenne puis écart-type
+    - manifeste: version, noms de features, modèles, tailles et SHA-256 des fichiers
+    Retourne: (version, chemin du bundle)
+    """
+    if default_model not in models:
+        raise ValueError(f"Modèle par défaut absent du bundle: {default_model}")
+
+    os.makedirs(bundles_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=bundles_dir, prefix='.staging-')
+    os.chmod(staging, 0o755)
+    try:
+        n_features = len(feature_names)
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+        np.save(os.path.join(staging, SCALER_NAME), np.vstack([mean, scale]).astype(np.float64))
+
+        files = [SCALER_NAME]
+        manifest_models = {}
+        for name, entry in models.items():
+            model_files = _write_model(staging, name, entry['family'], entry.get('model'), entry.get('compiled'))
+            files.extend(model_files)
+            manifest_models[name] = {
+                'family': entry['family'],
+                'files': model_files,
+                'metrics': {key: float(value) for key, value in entry['metrics'].items()}
+            }
+
+        checksums = {name: {'sha256': _sha256(os.path.join(staging, name)),
+                            'size': os.path.getsize(os.path.join(staging, name))}
+                     for name in files}
+
+        # Version: contenu des modèles, du scaler et des noms de features
+        version = hashlib.sha256(json.dumps({
+            'files': {name: checksum['sha256'] for name, checksum in checksums.items()},
+            'default_model': default_model,
+            'feature_names': list(feature_names)
+        }, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+        manifest = {
+            'format': BUNDLE_FORMAT,
+            'version': version,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'feature_names': list(feature_names),
+            'default_model': default_model,
+            'models': manifest_models,
+            'files': checksums
+        }
+        with open(os.path.join(staging, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        bundle_dir = os.path.join(bundles_dir, version)
+        if os.path.exists(bundle_dir):
+            shutil.rmtree(staging)
+        else:
+            os.rename(staging, bundle_dir)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Bascule atomique de la version courante
+    fd, tmp_path = tempfile.mkstemp(dir=bundles_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(version + '\n')
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, os.path.join(bundles_dir, CURRENT_NAME))
+
+    return version, bundle_dir
+
+def current_bundle_dir(bundles_dir):
+    """Dossier du bundle courant, ou None si aucun bundle n'a été exporté"""
+    try:
+        with open(os.path.join(bundles_dir, CURRENT_NAME), 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return os.path.join(bundles_dir, version) if version else None
+
+def _read_model(bundle_dir, name, family, files):
+    """Charge un modèle du bundle: (modèle, tables compilées ou None)"""
+    from app.tree_engine import TreeEnsemble
+
+    model, compiled = None, None
+    for file_name in files:
+        path = os.path.join(bundle_dir, file_name)
+        if file_name.endswith('.npz'):
+            compiled = TreeEnsemble.load(path)
+        elif family == 'xgboost':
+            model = xgboost.XGBRegressor()
+            model.load_model(path)
+        elif family == 'linear':
+            params = np.load(path)
+            model = LinearModel(params[:-1], float(params[-1]))
+    return model, compiled
+
+def read_bundle(bundle_dir):
+    """
+    Charge et vérifie un bundle (format, tailles et SHA-256 de chaque fichier)
+    Retourne: dict avec version, scaler, feature_names, default_model et
+    models {nom: {'family', 'model', 'compiled', 'metrics'}}
+    """
+    with open(os.path.join(bundle_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format') not in SUPPORTED_FORMATS:
+        raise ValueError(f"Format de bundle non supporté: {manifest.get('format')}")
+
+    for name, expected in manifest['files'].items():
+        path = os.path.join(bundle_dir, name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Fichier manquant dans le bundle: {path}")
+        if os.path.getsize(path) != expected['size'] or _sha256(path) != expected['sha256']:
+            raise ValueError(f"Somme de contrôle invalide: {path}")
+
+    params = np.load(os.path.join(bundle_dir, SCALER_NAME), mmap_mode='r')
+    scaler = ArrayScaler(params[0], params[1])
+
+    if manifest['format'] == 1:
+        # Un seul booster XGBoost, servi sous le nom 'xgboost'
+        files = [name for name in (BOOSTER_NAME, TREES_NAME) if name in manifest['files']]
+        entries = {'xgboost': {'family': 'xgboost', 'files': files, 'metrics': manifest['metrics']}}
+        default_model = 'xgboost'
+    else:
+        entries = manifest['models']
+        default_model = manifest['default_model']
+
+    models = {}
+    for name, entry in entries.items():
+        model, compiled = _read_model(bundle_dir, name, entry['family'], entry['files'])
+        models[name] = {'family': entry['family'], 'model': model, 'compiled': compiled,
+                        'metrics': entry['metrics']}
+
+    return {
+        'version': manifest['version'],
+        'scaler': scaler,
+        'feature_names': manifest['feature_names'],
+        'default_model': default_model,
+        'models': models
+    }
@@ -0,0 +1,96 @@
+import json
+
+import click
+
+from app.startup import startup_report, format_startup_report
+
+def register_cli(app):
+    """Enregistre les commandes `flask ...` de l'application"""
+
+    @app.cli.command('startup-report')
+    @click.option('--json', 'as_json', is_flag=True, help='Rapport au format JSON')
+    def startup_report_command(as_json):
+        """Temps de démarrage par étape (extensions, blueprints, modèle) et imports différés"""
+        report = startup_report()
+        if as_json:
+            click.echo(json.dumps(report, indent=2))
+        else:
+            click.echo(format_startup_report(report))
+
+    @app.cli.command('migrate-db')
+    @click.option('--status', is_flag=True, help='Lister les migrations sans les appliquer')
+    def migrate_db_command(status):
+        """
+        Applique les migrations de schéma et de données manquantes (app/migrations.py)
+        Crée aussi toutes les tables d'une base neuve; à exécuter à chaque déploiement,
+        avant de démarrer le serveur (create_app() ne migre pas la base)
+        """
+        from app.migrations import pending_migrations, upgrade
+        if status:
+            pending = pending_migrations()
+            for version, name in pending:
+                click.echo(f"En attente: {version:04d} {name}")
+            if not pending:
+                click.echo("Base à jour")
+            return
+
+        applied = upgrade()
+        if not applied:
+            click.echo("Base à jour")
+
+    @app.cli.command('import-employees')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--mode', type=click.Choice(['insert', 'upsert']), default='insert',
+                  help="insert: matricule existant refusé; upsert: employé existant mis à jour")
+    @click.option('--chunk-size', type=int, default=None, help='Lignes écrites par transaction')
+    @click.option('--errors', 'show_errors', type=int, default=20, help="Nombre d'erreurs affichées")
+    def import_employees_command(path, mode, chunk_size, show_errors):
+        """Importe des employés depuis un fichier CSV ou XLSX, par lots"""
+        from app.employee_import import IMPORT_CHUNK_SIZE, import_employees, iter_employee_file
+
+        def progress(report):
+            click.echo(f"  {report.rows} lignes lues, {report.inserted} créées, "
+                       f"{report.updated} mises à jour, {report.failed} en erreur")
+
+        with open(path, 'rb') as stream:
+            try:
+                report = import_employees(iter_employee_file(stream, path), mode=mode,
+                                          chunk_size=chunk_size or IMPORT_CHUNK_SIZE, progress=progress)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+
+        result = report.to_dict()
+        for error in result['errors'][:show_errors]:
+            click.echo(f"Ligne {error['line']} (matricule {error['matricule']}): {error['error']}")
+        click.echo(f"✅ Import terminé: {result['inserted']} créés, {result['updated']} mis à jour, "
+                   f"{result['failed']} en erreur, {result['rows_per_second']} lignes/s")
+
+    @app.cli.command('headcount')
+    @click.option('--rebuild', is_flag=True, help='Recalculer toute la table depuis employees')
+    @click.option('--csv', 'csv_path', type=click.Path(dir_okay=False), default=None,
+                  help='Écrire la série mensuelle (Year, Month, nbemp, joined, left, mass_salary) dans un CSV')
+    @click.option('--departement', default=None, help='Limiter la série à un département')
+    def headcount_command(rebuild, csv_path, departement):
+        """Effectif et masse salariale mensuels dérivés des employés (table headcount_monthly)"""
+        import csv
+        from app import db
+        from app.headcount import current_headcount, headcount_series, rebuild_headcount
+
+        if rebuild:
+            with db.engine.begin() as conn:
+                rows = rebuild_headcount(conn)
+            click.echo(f"✅ headcount_monthly recalculée: {rows} lignes")
+
+        if csv_path:
+            series = headcount_series(departement)
+            with open(csv_path, 'w', newline='', encoding='utf-8') as stream:
+                writer = csv.DictWriter(stream, fieldnames=['Year', 'Month', 'nbemp', 'joined', 'left', 'mass_salary'])
+                writer.writeheader()
+                writer.writerows(series)
+            click.echo(f"✅ {len(series)} mois écrits dans {csv_path}")
+
+        current = current_headcount(departement)
+        if current is None:
+            click.echo("Aucun effectif enregistré")
+        else:
+            click.echo(f"Effectif {current['month']:02d}/{current['year']}: {current['active']}")
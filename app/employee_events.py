@@ -0,0 +1,111 @@
+from sqlalchemy import event, inspect
+
+from app import db
+from app.models import Employee
+
+# Colonnes transmises aux abonnés, avant et après chaque changement
+TRACKED_COLUMNS = [column.key for column in inspect(Employee).column_attrs]
+
+_listeners = []
+_write_listeners = []
+
+
+class EmployeeChange:
+    """
+    Changement d'un employé validé en base
+    before: colonnes avant le changement (None pour une création)
+    after: colonnes après le changement (None pour une suppression)
+    matricule (et after['matricule']) est None pour une ligne importée sans matricule,
+    numérotée par la base: les abonnés qui indexent par matricule doivent se reconstruire
+    """
+    __slots__ = ('matricule', 'before', 'after')
+
+    def __init__(self, matricule, before, after):
+        self.matricule = matricule
+        self.before = before
+        self.after = after
+
+    def __repr__(self):
+        return f'EmployeeChange({self.matricule}, {self.before!r} -> {self.after!r})'
+
+
+def on_employee_change(callback):
+    """Abonne callback(changes) aux changements d'employés, appelé après chaque commit"""
+    _listeners.append(callback)
+    return callback
+
+def on_employee_write(callback):
+    """
+    Abonne callback(connection, changes) aux écritures d'employés, appelé dans la transaction
+    de l'écriture (après chaque flush): une erreur annule l'écriture
+    Pour les données dérivées en base qui doivent rester cohérentes avec employees.
+    """
+    _write_listeners.append(callback)
+    return callback
+
+def notify_write(connection, changes):
+    """Transmet aux abonnés on_employee_write des écritures faites hors ORM (même transaction)"""
+    if not changes:
+        return
+    for callback in list(_write_listeners):
+        callback(connection, changes)
+
+def publish(changes):
+    """
+    Transmet des changements aux abonnés
+    À appeler après les écritures qui contournent l'ORM (insert/update en masse).
+    """
+    if not changes:
+        return
+    for callback in list(_listeners):
+        try:
+            callback(changes)
+        except Exception as e:
+            print(f"Erreur abonné changements employés: {e}")
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    return value
+
+# Valeur précédente chargée avant chaque modification, même sur un employé expiré par un commit:
+# sans elle l'historique des attributs est vide et le changement semble ne rien modifier
+for _key in TRACKED_COLUMNS:
+    event.listen(getattr(Employee, _key), 'set', _load_previous_value, active_history=True, retval=True)
+
+
+def _values(employee):
+    return {key: getattr(employee, key) for key in TRACKED_COLUMNS}
+
+def _previous_values(employee):
+    """Valeurs chargées avant les modifications en attente (historique des attributs)"""
+    state = inspect(employee)
+    values = {}
+    for key in TRACKED_COLUMNS:
+        history = state.attrs[key].history
+        values[key] = history.deleted[0] if history.deleted else getattr(employee, key)
+    return values
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changes(session, flush_context):
+    # Avant la fin du flush: new/dirty/deleted et l'historique reflètent encore l'état précédent
+    changes = []
+    for employee in session.new:
+        if isinstance(employee, Employee):
+            changes.append(EmployeeChange(employee.matricule, None, _values(employee)))
+    for employee in session.dirty:
+        if isinstance(employee, Employee) and session.is_modified(employee, include_collections=False):
+            changes.append(EmployeeChange(employee.matricule, _previous_values(employee), _values(employee)))
+    for employee in session.deleted:
+        if isinstance(employee, Employee):
+            changes.append(EmployeeChange(employee.matricule, _previous_values(employee), None))
+    if changes:
+        notify_write(session.connection(), changes)
+        session.info.setdefault('employee_changes', []).extend(changes)
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_changes(session):
+    publish(session.info.pop('employee_changes', None))
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('employee_changes', None)
@@ -0,0 +1,223 @@
+import csv
+import io
+import os
+import time
+from datetime import date, datetime
+from itertools import islice
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db
+from app.employee_events import EmployeeChange, TRACKED_COLUMNS, notify_write, publish
+from app.employees import parse_employee
+from app.models import Employee, derived_columns
+from app.table_versions import bump_version
+
+# Lignes validées et écrites par transaction
+IMPORT_CHUNK_SIZE = 1000
+# Erreurs détaillées conservées dans le rapport (les suivantes sont seulement comptées)
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_FIELDS = ('matricule', 'first_name', 'last_name', 'birth_date', 'position', 'departement',
+                 'salary', 'indemnite1', 'indemnite2', 'date_joined')
+IMPORT_MODES = ('insert', 'upsert')
+
+
+def _cell_text(value):
+    """Valeur d'une cellule (CSV ou XLSX) en texte, comme un champ de formulaire"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+def _records(header, rows, first_line):
+    """(numéro de ligne, champ -> texte) pour chaque ligne non vide"""
+    columns = [str(name or '').strip().lower() for name in header]
+    missing = {'first_name', 'last_name', 'birth_date'} - set(columns)
+    if missing:
+        raise ValueError(f"Colonnes manquantes: {', '.join(sorted(missing))}")
+
+    for line, row in enumerate(rows, start=first_line):
+        values = {name: _cell_text(value) for name, value in zip(columns, row) if name in IMPORT_FIELDS}
+        if any(values.values()):
+            yield line, values
+
+def iter_csv(stream):
+    """Lignes d'un CSV (UTF-8, séparateur ',' ou ';') lues au fil de l'eau"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    header_line = text.readline()
+    delimiter = ';' if header_line.count(';') > header_line.count(',') else ','
+    header = next(csv.reader([header_line], delimiter=delimiter), [])
+    yield from _records(header, csv.reader(text, delimiter=delimiter), first_line=2)
+
+def iter_xlsx(stream):
+    """Lignes de la première feuille d'un classeur XLSX (openpyxl en lecture seule, par flux)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Import XLSX indisponible: installer openpyxl (ou exporter le fichier en CSV)")
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None) or []
+        yield from _records(header, rows, first_line=2)
+    finally:
+        workbook.close()
+
+def iter_employee_file(stream, filename):
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        return iter_csv(stream)
+    if extension in ('.xlsx', '.xlsm'):
+        return iter_xlsx(stream)
+    raise ValueError("Format non supporté: fichier .csv ou .xlsx attendu")
+
+
+class ImportReport:
+    """Compteurs et erreurs par ligne d'un import"""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.chunks = 0
+        self.errors = []
+        self._start = time.perf_counter()
+
+    def error(self, line, matricule, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'matricule': matricule, 'error': message})
+
+    def to_dict(self):
+        seconds = time.perf_counter() - self._start
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'failed': self.failed,
+            'chunks': self.chunks,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.rows / seconds, 1) if seconds > 0 else None,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors)
+        }
+
+
+def import_employees(records, mode='insert', chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Importe des employés par lots: chaque lot est validé (règles du formulaire d'ajout)
+    puis écrit en une transaction (insertion multi-lignes, mise à jour par clé en mode upsert)
+    records: itérable de (numéro de ligne, champ -> texte), lu au fil de l'eau
+    mode: 'insert' (matricule existant = erreur) ou 'upsert' (employé existant mis à jour)
+    progress: callback(report) appelé après chaque lot
+    Retourne: ImportReport
+    """
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Mode inconnu: {mode} ({', '.join(IMPORT_MODES)})")
+
+    report = ImportReport()
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        report.rows += len(chunk)
+        report.chunks += 1
+        _import_chunk(chunk, mode, report)
+        if progress is not None:
+            progress(report)
+    return report
+
+def _import_chunk(chunk, mode, report):
+    valid = []
+    seen = set()
+    for line, data in chunk:
+        try:
+            values = parse_employee(data)
+        except ValueError as e:
+            report.error(line, data.get('matricule') or None, str(e))
+            continue
+        matricule = values['matricule']
+        if matricule is not None:
+            if matricule in seen:
+                report.error(line, matricule, "matricule en double dans le fichier")
+                continue
+            seen.add(matricule)
+        # Colonnes présentes dans le fichier: seules celles-ci sont modifiées en mode upsert
+        valid.append((line, values, set(data)))
+
+    try:
+        changes, conflicts = _write_rows(valid, mode)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        # Lot refusé par la base: réécrire ligne par ligne pour isoler les erreurs
+        changes, conflicts = [], []
+        for row in valid:
+            try:
+                row_changes, row_conflicts = _write_rows([row], mode)
+                db.session.commit()
+                changes.extend(row_changes)
+                conflicts.extend(row_conflicts)
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                report.error(row[0], row[1]['matricule'], str(getattr(e, 'orig', e)))
+
+    for line, matricule, message in conflicts:
+        report.error(line, matricule, message)
+    report.inserted += sum(1 for change in changes if change.before is None)
+    report.updated += sum(1 for change in changes if change.before is not None)
+
+    # Écritures hors ORM: prévenir les abonnés (facettes) explicitement
+    publish(changes)
+
+def _write_rows(rows, mode):
+    """
+    Écrit des lignes validées dans la transaction courante
+    Retourne: (changements, [(ligne, matricule, erreur)] des matricules existants en mode insert)
+    """
+    table = Employee.__table__
+    matricules = [values['matricule'] for _, values, _ in rows if values['matricule'] is not None]
+    existing = {}
+    if matricules:
+        existing = {row.matricule: dict(row._mapping)
+                    for row in db.session.execute(select(table).where(table.c.matricule.in_(matricules)))}
+
+    inserts, updates, changes, conflicts = [], [], [], []
+    for line, values, present in rows:
+        before = existing.get(values['matricule'])
+        if before is None:
+            values = {**values, **derived_columns(values)}
+            inserts.append(values)
+            changes.append(EmployeeChange(values['matricule'], None, _tracked(values)))
+        elif mode == 'upsert':
+            changed = {key: value for key, value in values.items() if key in present}
+            after = {**before, **changed}
+            changed.update(derived_columns(after), matricule=values['matricule'])
+            after.update(changed)
+            updates.append(changed)
+            changes.append(EmployeeChange(values['matricule'], _tracked(before), _tracked(after)))
+        else:
+            conflicts.append((line, values['matricule'], "matricule déjà existant"))
+
+    if inserts:
+        db.session.execute(insert(table), inserts)
+    if updates:
+        db.session.execute(update(Employee), updates)
+    if inserts or updates:
+        # Écritures hors ORM: le compteur de la table n'est pas incrémenté par la session
+        bump_version(db.session.connection(), 'employees')
+    notify_write(db.session.connection(), changes)
+    return changes, conflicts
+
+def _tracked(values):
+    return {key: values.get(key) for key in TRACKED_COLUMNS}
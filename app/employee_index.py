@@ -0,0 +1,141 @@
+import bisect
+import threading
+import time
+
+from flask import current_app
+
+from app import db
+from app.employee_events import on_employee_change
+from app.models import Employee, normalize_name
+
+# Au-delà de ce nombre de changements validés ensemble (import en masse),
+# l'index est reconstruit au prochain accès plutôt que mis à jour clé par clé
+INCREMENTAL_LIMIT = 500
+
+_FIELDS = ('matricule', 'first_name', 'last_name', 'departement', 'position', 'date_left')
+
+
+def _keys(values):
+    """Clés de recherche d'un employé: nom, prénom, "prénom nom", "nom prénom", matricule"""
+    first = normalize_name(values.get('first_name'))
+    last = normalize_name(values.get('last_name'))
+    keys = {key for key in (first, last) if key}
+    if first and last:
+        keys.update((f'{first} {last}', f'{last} {first}'))
+    if values.get('matricule') is not None:
+        keys.add(str(values['matricule']))
+    return keys
+
+def _entry(values):
+    return {
+        'matricule': values['matricule'],
+        'first_name': values.get('first_name'),
+        'last_name': values.get('last_name'),
+        'departement': values.get('departement'),
+        'position': values.get('position'),
+        'active': values.get('date_left') is None
+    }
+
+
+class EmployeePrefixIndex:
+    """
+    Index en mémoire pour l'autocomplétion des employés (nom, prénom ou matricule)
+    - liste triée de (clé, matricule): une recherche est une bisection puis un parcours
+      des seules clés qui commencent par le préfixe
+    - construit au premier accès (une requête sur les colonnes affichées), puis tenu à jour
+      par les changements d'employés validés (app/employee_events.py)
+    - ttl borne l'écart avec les écritures faites par les autres processus (0 = jamais)
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._keys = None
+        self._entries = {}
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def rebuild(self):
+        with self._lock:
+            self._rebuild_locked()
+
+    def _rebuild_locked(self):
+        # Verrou tenu pendant la requête: les changements publiés entre-temps attendent
+        # et s'appliquent sur le nouvel index au lieu d'être perdus
+        rows = db.session.query(*(getattr(Employee, field) for field in _FIELDS)).all()
+        keys, entries = [], {}
+        for row in rows:
+            values = dict(zip(_FIELDS, row))
+            entries[values['matricule']] = _entry(values)
+            keys.extend((key, values['matricule']) for key in _keys(values))
+        keys.sort()
+
+        self._keys = keys
+        self._entries = entries
+        self._built_at = time.monotonic()
+
+    def apply(self, changes):
+        """Retire les clés de l'ancien état et ajoute celles du nouveau"""
+        with self._lock:
+            if self._keys is None:
+                return
+            # Matricule attribué par la base (import sans matricule): inconnu ici, l'employé
+            # ne pourrait pas être indexé; reconstruction au prochain accès
+            if len(changes) > INCREMENTAL_LIMIT or any(
+                    change.after is not None and change.after.get('matricule') is None for change in changes):
+                self._keys = None
+                return
+            for change in changes:
+                if change.before is not None:
+                    for key in _keys(change.before):
+                        position = bisect.bisect_left(self._keys, (key, change.before['matricule']))
+                        if position < len(self._keys) and self._keys[position] == (key, change.before['matricule']):
+                            del self._keys[position]
+                    self._entries.pop(change.before['matricule'], None)
+                if change.after is not None:
+                    for key in _keys(change.after):
+                        bisect.insort(self._keys, (key, change.after['matricule']))
+                    self._entries[change.after['matricule']] = _entry(change.after)
+
+    def lookup(self, prefix, limit=10, active_only=False):
+        """Employés dont une clé commence par prefix, dans l'ordre des clés, au plus limit"""
+        prefix = prefix.strip()
+        prefix = prefix if prefix.isdigit() else normalize_name(prefix)
+        if not prefix:
+            return []
+
+        results, seen = [], set()
+        with self._lock:
+            # Reconstruction sous le même verrou que la recherche: apply() peut invalider
+            # l'index (import en masse) entre un contrôle et une recherche séparés
+            if self._keys is None or (self.ttl > 0 and time.monotonic() - self._built_at > self.ttl):
+                self._rebuild_locked()
+            keys, entries = self._keys, self._entries
+            position = bisect.bisect_left(keys, (prefix,))
+            while position < len(keys) and len(results) < limit:
+                key, matricule = keys[position]
+                if not key.startswith(prefix):
+                    break
+                position += 1
+                entry = entries.get(matricule)
+                if matricule in seen or entry is None or (active_only and not entry['active']):
+                    continue
+                seen.add(matricule)
+                results.append(dict(entry))
+        return results
+
+
+_employee_index = None
+_employee_index_lock = threading.Lock()
+
+def get_employee_index():
+    """Retourne l'index d'autocomplétion des employés de l'application courante"""
+    global _employee_index
+    with _employee_index_lock:
+        if _employee_index is None:
+            _employee_index = EmployeePrefixIndex(ttl=current_app.config['EMPLOYEE_INDEX_TTL'])
+        return _employee_index
+
+@on_employee_change
+def _update_index(changes):
+    if _employee_index is not None:
+        _employee_index.apply(changes)
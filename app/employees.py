@@ -1,69 +1,212 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required
 from datetime import datetime
 import html
 from app import db
-from app.models import Employee
+from app.models import Employee, normalize_departement, normalize_name
+from app.facet_cache import get_facet_cache
+from app.employee_index import get_employee_index
+from app.headcount import payroll_report
 
 employees = Blueprint('employees', __name__, url_prefix='/employees')
 
+# Taille d'une page de la liste des employés
+EMPLOYEES_PAGE_SIZE = 50
+
 def _sanitize_input(value: str) -> str:
     """Sanitize user input to prevent XSS attacks"""
     if not value:
         return ''
     return html.escape(value.strip())
 
+def parse_employee(data):
+    """
+    Valide et convertit les champs d'un nouvel employé (formulaire d'ajout ou ligne importée)
+    data: champ -> texte; lève ValueError si une règle n'est pas respectée
+    """
+    first_name = _sanitize_input(data.get("first_name", ""))
+    last_name = _sanitize_input(data.get("last_name", ""))
+
+    if not first_name or not last_name:
+        raise ValueError("First name and last name are required")
+
+    birth_date_raw = _sanitize_input(data.get("birth_date", ""))
+    if not birth_date_raw:
+        raise ValueError("Birth date is required")
+    birth_date = datetime.strptime(birth_date_raw, "%Y-%m-%d").date()
+
+    matricule_raw = _sanitize_input(data.get("matricule", ""))
+    matricule = float(matricule_raw) if matricule_raw else None
+    if matricule and matricule < 0:
+        raise ValueError("matricule cannot be negative")
+    if matricule is not None:
+        if not matricule.is_integer():
+            raise ValueError("matricule must be an integer")
+        matricule = int(matricule)
+
+    salary_raw = _sanitize_input(data.get("salary", ""))
+    salary = float(salary_raw) if salary_raw else None
+    if salary and salary < 0:
+        raise ValueError("Salary cannot be negative")
+
+    indemnite1_raw = _sanitize_input(data.get("indemnite1", ""))
+    indemnite1 = float(indemnite1_raw) if indemnite1_raw else None
+    if indemnite1 and indemnite1 < 0:
+        raise ValueError("Indemnite cannot be negative")
+
+    indemnite2_raw = _sanitize_input(data.get("indemnite2", ""))
+    indemnite2 = float(indemnite2_raw) if indemnite2_raw else None
+    if indemnite2 and indemnite2 < 0:
+        raise ValueError("Indemnite cannot be negative")
+
+    date_joined_raw = _sanitize_input(data.get("date_joined", ""))
+    date_joined = datetime.strptime(date_joined_raw, "%Y-%m-%d").date() if date_joined_raw else None
+
+    departement_input = _sanitize_input(data.get("departement", ""))
+    departement = departement_input.upper() if departement_input else None
+
+    return {
+        'first_name': first_name,
+        'last_name': last_name,
+        'birth_date': birth_date,
+        'position': _sanitize_input(data.get("position", "")) or None,
+        'departement': departement,
+        'salary': salary,
+        'indemnite1': indemnite1,
+        'indemnite2': indemnite2,
+        'date_joined': date_joined,
+        'matricule': matricule
+    }
+
+def filter_employees(query, departement=None, status=None, year=None):
+    """
+    Filtres de la liste des employés sur les colonnes indexées
+    (departement_norm, date_left, join_year): pas de UPPER() ni d'EXTRACT() côté base
+    """
+    if departement:
+        query = query.filter(Employee.departement_norm == normalize_departement(departement))
+
+    if status == 'active':
+        query = query.filter(Employee.date_left.is_(None))
+    elif status == 'terminated':
+        query = query.filter(Employee.date_left.isnot(None))
+
+    if year:
+        query = query.filter(Employee.join_year == year)
+    return query
+
+def search_employees(query, search):
+    """
+    Recherche par préfixe servie par les index
+    - chiffres (18 au plus): matricule exact ou commençant par ces chiffres (plages de clés)
+    - texte: nom ou prénom commençant par la saisie (sans accents ni casse),
+      ou "prénom nom" quand la saisie contient plusieurs mots
+    """
+    search = search.strip()
+    # Chiffres ASCII uniquement ('²' est isdigit() mais pas un entier), et tenant dans un BIGINT
+    if search.isascii() and search.isdigit() and len(search) <= 18:
+        conditions = [Employee.matricule == int(search)]
+        # 12 -> 120..129, 1200..1299, ... jusqu'au nombre de chiffres du plus grand matricule
+        max_matricule = db.session.query(db.func.max(Employee.matricule)).scalar() or 0
+        low = high = int(search)
+        for _ in range(len(str(max_matricule)) - len(search)):
+            low, high = low * 10, high * 10 + 9
+            conditions.append(Employee.matricule.between(low, high))
+        return query.filter(db.or_(*conditions))
+
+    prefix = normalize_name(search)
+    if not prefix:
+        return query
+    conditions = [_name_prefix(Employee.last_name_norm, prefix), _name_prefix(Employee.first_name_norm, prefix)]
+    if ' ' in prefix:
+        first, last = prefix.split(' ', 1)
+        conditions.append(db.and_(_name_prefix(Employee.first_name_norm, first),
+                                  _name_prefix(Employee.last_name_norm, last)))
+    return query.filter(db.or_(*conditions))
+
+def _name_prefix(column, prefix):
+    """column commence par prefix, écrit en plage (col >= 'ab' AND col < 'ac') pour utiliser l'index"""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return db.and_(column >= prefix, column < upper)
+
+def _decode_after(value):
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
 # --- List Employees ---
 @employees.route("/")
 @login_required
 def list_employees():
+    """
+    Liste paginée par clé (matricule croissant): chaque page lit EMPLOYEES_PAGE_SIZE lignes
+    par l'index, le total est compté en base sans charger les employés
+    """
     search = _sanitize_input(request.args.get('search', ''))
     departement = _sanitize_input(request.args.get('departement', ''))
     status = _sanitize_input(request.args.get('status', ''))
     year = request.args.get('year', type=int)
+    after = _decode_after(request.args.get('after'))
 
     query = Employee.query
+    if search:
+        query = search_employees(query, html.unescape(search))
+    query = filter_employees(query, departement, status, year)
 
+    # Total: compteurs des facettes sans recherche texte, sinon compté en base
+    facet_cache = get_facet_cache()
     if search:
-        query = query.filter(
-            (Employee.first_name.ilike(f'%{search}%')) |
-            (Employee.last_name.ilike(f'%{search}%')) |
-            (Employee.matricule.ilike(f'%{search}%'))
-        )
+        total = query.order_by(None).count()
+    else:
+        total = facet_cache.count(normalize_departement(departement), year,
+                                  status if status in ('active', 'terminated') else None)
 
-    if departement:
-        query = query.filter(db.func.upper(Employee.departement) == departement.upper())
+    if after is not None:
+        query = query.filter(Employee.matricule > after)
+    rows = query.order_by(Employee.matricule).limit(EMPLOYEES_PAGE_SIZE + 1).all()
+    page = rows[:EMPLOYEES_PAGE_SIZE]
+    next_after = page[-1].matricule if len(rows) > EMPLOYEES_PAGE_SIZE else None
 
-    if status == 'active':
-        query = query.filter(Employee.date_left.is_(None))
-    elif status == 'terminated':
-        query = query.filter(Employee.date_left.isnot(None))
+    # Valeurs des filtres: cache de facettes, sans requête
+    facets = facet_cache.snapshot()
 
-    if year:
-        query = query.filter(db.extract('year', Employee.date_joined) == year)
-
-    all_employees = query.all()
-
-    # Get distinct departments (uppercase)
-    departments = db.session.query(
-        db.func.upper(Employee.departement)
-    ).distinct().filter(
-        Employee.departement.isnot(None)
-    ).order_by(db.func.upper(Employee.departement)).all()
-    departments = [dept[0] for dept in departments if dept[0]]
-
-    # Get distinct years from date_joined
-    years = db.session.query(
-        db.extract('year', Employee.date_joined).label('year')
-    ).distinct().filter(
-        Employee.date_joined.isnot(None)
-    ).order_by(db.text('year DESC')).all()
-    years = [int(year[0]) for year in years]
+    # Filtres courants, repris dans les liens de pagination
+    filters = {key: value for key, value in request.args.items() if key in ('search', 'departement', 'status', 'year') and value}
 
     return render_template("employees.html",
-                         employees=all_employees,
-                         departments=departments,
-                         years=years)
+                         employees=page,
+                         total=total,
+                         next_after=next_after,
+                         is_first_page=after is None,
+                         filters=filters,
+                         facets=facets)
+
+@employees.route("/facets", methods=["GET"])
+@login_required
+def employee_facets():
+    """Départements et années d'entrée avec effectifs actifs / partis (cache de facettes)"""
+    return jsonify({'status': 'success', 'facets': get_facet_cache().snapshot()})
+
+@employees.route("/facets/rebuild", methods=["POST"])
+@login_required
+def rebuild_employee_facets():
+    """Recompte les facettes depuis la base (après des écritures hors de l'application)"""
+    cache = get_facet_cache()
+    cache.rebuild()
+    return jsonify({'status': 'success', 'facets': cache.snapshot()})
+
+# --- Payroll Report ---
+@employees.route("/payroll", methods=["GET"])
+@login_required
+def payroll():
+    """
+    Effectif et masse salariale de fin de mois d'une année (?year=, année courante par défaut),
+    par département (?departement= pour un seul): lus dans l'agrégat headcount_monthly
+    """
+    year = request.args.get('year', datetime.now().year, type=int)
+    departement = _sanitize_input(request.args.get('departement', ''))
+    return jsonify({'status': 'success', **payroll_report(year, html.unescape(departement) or None)})
 
 # --- Add Employee ---
 @employees.route("/add", methods=["GET", "POST"])
@@ -71,54 +214,7 @@ def list_employees():
 def add_employee():
     if request.method == "POST":
         try:
-            first_name = _sanitize_input(request.form.get("first_name", ""))
-            last_name = _sanitize_input(request.form.get("last_name", ""))
-
-            if not first_name or not last_name:
-                raise ValueError("First name and last name are required")
-
-
-            birth_date_raw = _sanitize_input(request.form.get("birth_date", ""))
-            birth_date = datetime.strptime(birth_date_raw, "%Y-%m-%d").date() if birth_date_raw else None
-
-            matricule_raw = _sanitize_input(request.form.get("matricule", ""))
-            matricule = float(matricule_raw) if matricule_raw else None
-            if matricule and matricule < 0:
-                raise ValueError("matricule cannot be negative")
-
-            salary_raw = _sanitize_input(request.form.get("salary", ""))
-            salary = float(salary_raw) if salary_raw else None
-            if salary and salary < 0:
-                raise ValueError("Salary cannot be negative")
-
-            indemnite1_raw = _sanitize_input(request.form.get("indemnite1", ""))
-            indemnite1 = float(indemnite1_raw) if indemnite1_raw else None
-            if indemnite1 and indemnite1 < 0:
-                raise ValueError("Indemnite cannot be negative")
-
-            indemnite2_raw = _sanitize_input(request.form.get("indemnite2", ""))
-            indemnite2 = float(indemnite2_raw) if indemnite2_raw else None
-            if indemnite2 and indemnite2 < 0:
-                raise ValueError("Indemnite cannot be negative")
-
-            date_joined_raw = _sanitize_input(request.form.get("date_joined", ""))
-            date_joined = datetime.strptime(date_joined_raw, "%Y-%m-%d").date() if date_joined_raw else None
-
-            departement_input = _sanitize_input(request.form.get("departement", ""))
-            departement = departement_input.upper() if departement_input else None
-
-            emp = Employee(
-                first_name=first_name,
-                last_name=last_name,
-                birth_date=birth_date,
-                position=_sanitize_input(request.form.get("position", "")) or None,
-                departement=departement,
-                salary=salary,
-                indemnite1=indemnite1,
-                indemnite2=indemnite2,
-                date_joined=date_joined,
-                matricule=matricule
-            )
+            emp = Employee(**parse_employee(request.form))
 
             db.session.add(emp)
             db.session.commit()
@@ -134,6 +230,46 @@ def add_employee():
 
     return render_template("add_employee.html")
 
+# --- Employee Lookup ---
+# Nombre maximal de suggestions par requête d'autocomplétion
+LOOKUP_MAX_RESULTS = 50
+
+@employees.route("/lookup", methods=["GET"])
+@login_required
+def lookup_employees():
+    """
+    Autocomplétion: employés dont le nom, le prénom ou le matricule commence par q
+    Paramètres: q, limit (10 par défaut), status=active pour exclure les employés partis
+    """
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), LOOKUP_MAX_RESULTS)
+    results = get_employee_index().lookup(query, limit=limit, active_only=request.args.get('status') == 'active')
+    return jsonify({'status': 'success', 'query': query, 'results': results})
+
+# --- Import Employees ---
+@employees.route("/import", methods=["POST"])
+@login_required
+def import_employees_route():
+    """
+    Import CSV / XLSX (champ "file"), lu par flux et écrit par lots
+    Champs optionnels: mode = insert | upsert, chunk_size
+    Retourne le rapport: lignes créées / mises à jour, erreurs par ligne, débit
+    """
+    from app.employee_import import IMPORT_CHUNK_SIZE, import_employees, iter_employee_file
+
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'status': 'error', 'message': 'Aucun fichier reçu'}), 400
+
+    try:
+        chunk_size = min(max(request.form.get('chunk_size', IMPORT_CHUNK_SIZE, type=int), 1), 10000)
+        report = import_employees(iter_employee_file(upload.stream, upload.filename),
+                                  mode=request.form.get('mode', 'insert'), chunk_size=chunk_size)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    return jsonify({'status': 'success', **report.to_dict()}), 200
+
 # --- Edit Employee ---
 @employees.route("/edit/<int:matricule>", methods=["GET", "POST"])
 @login_required
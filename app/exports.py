@@ -0,0 +1,169 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import select
+
+from app import db
+from app.models import Employee, Recruitment, Termination, derived_columns
+
+# Lignes lues par lot sur le curseur côté serveur (et par groupe de lignes Parquet)
+EXPORT_BATCH_SIZE = 5000
+
+# Tables exportables: nom dans l'URL -> modèle
+EXPORT_DATASETS = {
+    'employees': Employee,
+    'recruitments': Recruitment,
+    'terminations': Termination,
+}
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Colonnes internes (recherche, filtres) non exportées
+_INTERNAL_COLUMNS = set(derived_columns({}))
+
+
+def export_columns(model):
+    return [column for column in model.__table__.columns if column.name not in _INTERNAL_COLUMNS]
+
+def iter_batches(model, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Lignes de la table par lots, ordonnées par clé primaire
+    stream_results: curseur côté serveur (MySQL), la table n'est jamais chargée en entier
+    """
+    columns = export_columns(model)
+    statement = select(*columns).order_by(*model.__table__.primary_key.columns)
+    result = db.session.execute(statement, execution_options={'stream_results': True, 'yield_per': batch_size})
+    try:
+        for partition in result.partitions(batch_size):
+            yield partition
+    finally:
+        result.close()
+
+def json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _stream_csv(model, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.name for column in export_columns(model)])
+    for rows in batches:
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _stream_ndjson(model, batches):
+    names = [column.name for column in export_columns(model)]
+    for rows in batches:
+        yield ''.join(json.dumps({name: json_value(value) for name, value in zip(names, row)},
+                                 ensure_ascii=False, separators=(',', ':')) + '\n' for row in rows)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Fichier en écriture seule dont les octets sont récupérés au fur et à mesure (drain)"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def _arrow_schema(pa, model):
+    """Schéma Arrow d'après les types des colonnes SQLAlchemy"""
+    fields = []
+    for column in export_columns(model):
+        python_type = column.type.python_type
+        if python_type is bool:
+            arrow_type = pa.bool_()
+        elif python_type is int:
+            arrow_type = pa.int64()
+        elif python_type in (float, Decimal):
+            arrow_type = pa.float64()
+        elif python_type is datetime:
+            arrow_type = pa.timestamp('us')
+        elif python_type is date:
+            arrow_type = pa.date32()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type, nullable=column.nullable or column.primary_key))
+    return pa.schema(fields)
+
+def _stream_parquet(model, batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(pa, model)
+    names = schema.names
+    sink = _ChunkSink()
+    # Un groupe de lignes Parquet par lot lu en base
+    with pq.ParquetWriter(sink, schema, compression='snappy') as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            arrays = [pa.array([float(value) if isinstance(value, Decimal) else value for value in values],
+                               type=schema.field(name).type)
+                      for name, values in zip(names, columns)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_export(dataset, fmt, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Générateur de l'export d'une table (csv, ndjson ou parquet), lot par lot
+    Lève ValueError si la table ou le format est inconnu, ou si pyarrow manque pour Parquet
+    """
+    model = EXPORT_DATASETS.get(dataset)
+    if model is None:
+        raise ValueError(f"Table inconnue: {dataset} ({', '.join(EXPORT_DATASETS)})")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format inconnu: {fmt} ({', '.join(EXPORT_FORMATS)})")
+    if fmt == 'parquet' and not parquet_available():
+        raise ValueError("Export Parquet indisponible: installer pyarrow")
+
+    batches = iter_batches(model, batch_size)
+    if fmt == 'csv':
+        return _stream_csv(model, batches)
+    if fmt == 'ndjson':
+        return _stream_ndjson(model, batches)
+    return _stream_parquet(model, batches)
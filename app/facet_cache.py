@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app
+
+from app import db
+from app.employee_events import on_employee_change
+from app.models import Employee
+
+
+class FacetCache:
+    """
+    Valeurs des filtres de la liste des employés (départements, années d'entrée)
+    et effectifs actifs / partis de chacune, gardés en mémoire
+    - construit par une seule requête GROUP BY (premier accès, expiration ou reconstruction)
+    - tenu à jour par les changements d'employés validés (app/employee_events.py)
+    - ttl borne l'écart avec les écritures faites par les autres processus (0 = jamais)
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        # (département normalisé, année d'entrée, actif) -> nombre d'employés
+        self._cells = None
+        self._built_at = 0.0
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def rebuild(self):
+        """Recompte tous les employés"""
+        active = Employee.date_left.is_(None)
+        rows = db.session.query(Employee.departement_norm, Employee.join_year, active, db.func.count()) \
+            .group_by(Employee.departement_norm, Employee.join_year, active).all()
+        cells = Counter({(departement, year, bool(is_active)): count for departement, year, is_active, count in rows})
+
+        with self._lock:
+            self._cells = cells
+            self._built_at = time.monotonic()
+            self._loaded_at = datetime.utcnow().isoformat()
+
+    def apply(self, changes):
+        """Reporte des changements d'employés sur les compteurs (sans requête)"""
+        with self._lock:
+            if self._cells is None:
+                return
+            for change in changes:
+                if change.before is not None:
+                    cell = self._cell(change.before)
+                    self._cells[cell] -= 1
+                    if self._cells[cell] <= 0:
+                        del self._cells[cell]
+                if change.after is not None:
+                    self._cells[self._cell(change.after)] += 1
+
+    def count(self, departement=None, year=None, status=None):
+        """Nombre d'employés d'une combinaison de facettes (département normalisé, année, 'active'/'terminated')"""
+        cells = self._current_cells()
+        return sum(count for (cell_departement, cell_year, active), count in cells.items()
+                   if (departement is None or cell_departement == departement)
+                   and (year is None or cell_year == year)
+                   and (status is None or active == (status == 'active')))
+
+    def _current_cells(self):
+        with self._lock:
+            expired = self.ttl > 0 and time.monotonic() - self._built_at > self.ttl
+            cells = None if expired or self._cells is None else dict(self._cells)
+        if cells is None:
+            self.rebuild()
+            with self._lock:
+                cells = dict(self._cells)
+        return cells
+
+    def snapshot(self):
+        """
+        Facettes de la liste des employés, reconstruites si absentes ou expirées
+        Retourne: {'departments': [{'name', 'active', 'terminated'}], 'years': [{'year', ...}],
+                   'status': {'active', 'terminated'}, 'loaded_at'}
+        """
+        cells = self._current_cells()
+
+        departments, years, status = {}, {}, {'active': 0, 'terminated': 0}
+        for (departement, year, active), count in cells.items():
+            key = 'active' if active else 'terminated'
+            status[key] += count
+            if departement is not None:
+                departments.setdefault(departement, {'name': departement, 'active': 0, 'terminated': 0})[key] += count
+            if year is not None:
+                years.setdefault(year, {'year': year, 'active': 0, 'terminated': 0})[key] += count
+
+        return {
+            'departments': [departments[name] for name in sorted(departments)],
+            'years': [years[year] for year in sorted(years, reverse=True)],
+            'status': status,
+            'loaded_at': self._loaded_at
+        }
+
+    @staticmethod
+    def _cell(values):
+        return values['departement_norm'], values['join_year'], values['date_left'] is None
+
+
+_facet_cache = None
+_facet_cache_lock = threading.Lock()
+
+def get_facet_cache():
+    """Retourne le cache de facettes des employés de l'application courante"""
+    global _facet_cache
+    with _facet_cache_lock:
+        if _facet_cache is None:
+            _facet_cache = FacetCache(ttl=current_app.config['FACET_CACHE_TTL'])
+        return _facet_cache
+
+@on_employee_change
+def _update_facets(changes):
+    if _facet_cache is not None:
+        _facet_cache.apply(changes)
@@ -0,0 +1,245 @@
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import and_, bindparam, case, delete, extract, func, insert, literal, or_, select, true, union_all, update
+
+from app import db
+from app.employee_events import on_employee_write
+from app.models import Employee, HeadcountMonthly, normalize_departement
+
+HEADCOUNT = HeadcountMonthly.__table__
+
+
+def _month_index(year, month):
+    return year * 12 + month - 1
+
+def _from_index(index):
+    return index // 12, index % 12 + 1
+
+def _months_since(table, year, month):
+    """Mois (year, month) et suivants"""
+    return or_(table.c.year > year, and_(table.c.year == year, table.c.month >= month))
+
+def _months_until(table, year, month):
+    """Mois (year, month) et précédents"""
+    return or_(table.c.year < year, and_(table.c.year == year, table.c.month <= month))
+
+
+def rebuild_headcount(connection, today=None):
+    """
+    Recalcule toute la table en une passe ensembliste (INSERT ... SELECT):
+    - mois de la première entrée jusqu'au mois courant (ou au dernier mouvement daté plus tard),
+      générés par une CTE récursive
+    - entrées et départs groupés par département et par mois
+    - effectif de fin de mois = somme cumulée (fenêtre) des entrées moins les départs,
+      masse salariale de même avec la rémunération de chaque employé entré ou parti
+    Les employés sans date d'entrée ne sont pas comptés.
+    La masse salariale d'un mois passé est calculée au salaire actuel (pas d'historique des salaires).
+    """
+    today = today or date.today()
+    employees = Employee.__table__
+    hired = employees.c.date_joined.isnot(None)
+
+    first_joined, last_joined, last_left = connection.execute(
+        select(func.min(employees.c.date_joined), func.max(employees.c.date_joined), func.max(employees.c.date_left))
+        .where(hired)
+    ).one()
+    connection.execute(delete(HEADCOUNT))
+    if first_joined is None:
+        return 0
+
+    start_year, start_month = first_joined.year, first_joined.month
+    end_year, end_month = _from_index(max(
+        _month_index(day.year, day.month) for day in (today, last_joined, last_left) if day is not None
+    ))
+
+    months = select(literal(start_year).label('year'), literal(start_month).label('month')) \
+        .cte('months', recursive=True)
+    months = months.union_all(
+        select(case((months.c.month == 12, months.c.year + 1), else_=months.c.year),
+               case((months.c.month == 12, 1), else_=months.c.month + 1))
+        .where(or_(months.c.year < end_year, and_(months.c.year == end_year, months.c.month < end_month)))
+    )
+
+    departement = func.coalesce(employees.c.departement_norm, '')
+    pay = (func.coalesce(employees.c.salary, 0) + func.coalesce(employees.c.indemnite1, 0)
+           + func.coalesce(employees.c.indemnite2, 0))
+    departements = select(departement.label('departement')).where(hired).distinct().subquery('departements')
+
+    moves = union_all(
+        select(departement.label('departement'), extract('year', employees.c.date_joined).label('year'),
+               extract('month', employees.c.date_joined).label('month'),
+               literal(1).label('joined'), literal(0).label('left'), pay.label('pay')).where(hired),
+        select(departement, extract('year', employees.c.date_left), extract('month', employees.c.date_left),
+               literal(0), literal(1), -pay).where(hired, employees.c.date_left.isnot(None))
+    ).subquery('moves')
+    deltas = select(moves.c.departement, moves.c.year, moves.c.month, func.sum(moves.c.joined).label('joined'),
+                    func.sum(moves.c.left).label('left'), func.sum(moves.c.pay).label('pay')) \
+        .group_by(moves.c.departement, moves.c.year, moves.c.month).subquery('deltas')
+
+    joined = func.coalesce(deltas.c.joined, 0)
+    left = func.coalesce(deltas.c.left, 0)
+    running = {'partition_by': departements.c.departement, 'order_by': (months.c.year, months.c.month)}
+    series = select(
+        months.c.year, months.c.month, departements.c.departement,
+        func.sum(joined - left).over(**running), joined, left,
+        func.sum(func.coalesce(deltas.c.pay, 0)).over(**running)
+    ).select_from(
+        months.join(departements, true()).outerjoin(deltas, and_(
+            deltas.c.departement == departements.c.departement,
+            deltas.c.year == months.c.year, deltas.c.month == months.c.month
+        ))
+    )
+    connection.execute(insert(HEADCOUNT).from_select(
+        ['year', 'month', 'departement', 'active', 'joined', 'left', 'payroll'], series
+    ))
+    return connection.execute(select(func.count()).select_from(HEADCOUNT)).scalar()
+
+
+def _pay(values):
+    """Rémunération mensuelle: salaire + indemnités (Decimal, les imports fournissent des float)"""
+    return sum((Decimal(str(values[key])) for key in ('salary', 'indemnite1', 'indemnite2')
+                if values.get(key) is not None), Decimal(0))
+
+def _moves(values):
+    """
+    (département, mois d'entrée, mois de départ ou None, rémunération) d'un employé,
+    None s'il n'est pas compté
+    """
+    if values is None or values.get('date_joined') is None:
+        return None
+    date_joined, date_left = values['date_joined'], values.get('date_left')
+    return (values.get('departement_norm') or '',
+            _month_index(date_joined.year, date_joined.month),
+            _month_index(date_left.year, date_left.month) if date_left else None,
+            _pay(values))
+
+def apply_headcount_changes(connection, changes):
+    """
+    Reporte des changements d'employés sur la table, dans leur transaction
+    Seuls les mois et départements touchés sont mis à jour; un mouvement hors de la série
+    (nouveau département, mois pas encore matérialisé) la fait recalculer entièrement.
+    """
+    joined, left, active, payroll = Counter(), Counter(), Counter(), Counter()
+    for change in changes:
+        before, after = _moves(change.before), _moves(change.after)
+        if before == after:
+            continue
+        for moves, sign in ((before, -1), (after, 1)):
+            if moves is None:
+                continue
+            departement, join_index, left_index, pay = moves
+            joined[departement, join_index] += sign
+            active[departement, join_index] += sign
+            payroll[departement, join_index] += sign * pay
+            if left_index is not None:
+                left[departement, left_index] += sign
+                active[departement, left_index] -= sign
+                payroll[departement, left_index] -= sign * pay
+
+    touched = [key for counter in (joined, left, active, payroll) for key, delta in counter.items() if delta]
+    if not touched:
+        return
+
+    bounds = connection.execute(
+        select(func.min(_month_index(HEADCOUNT.c.year, HEADCOUNT.c.month)),
+               func.max(_month_index(HEADCOUNT.c.year, HEADCOUNT.c.month)))
+    ).one()
+    departements = set(connection.execute(
+        select(HEADCOUNT.c.departement).where(HEADCOUNT.c.departement.in_({key[0] for key in touched})).distinct()
+    ).scalars())
+    if bounds[0] is None or any(departement not in departements or not bounds[0] <= index <= bounds[1]
+                                for departement, index in touched):
+        rebuild_headcount(connection)
+        return
+
+    month_key = and_(HEADCOUNT.c.departement == bindparam('dept'),
+                     HEADCOUNT.c.year == bindparam('y'), HEADCOUNT.c.month == bindparam('m'))
+    for column, counter in (('joined', joined), ('left', left)):
+        rows = [{'dept': departement, 'y': _from_index(index)[0], 'm': _from_index(index)[1], 'delta': delta}
+                for (departement, index), delta in counter.items() if delta]
+        if rows:
+            connection.execute(update(HEADCOUNT).where(month_key)
+                               .values({column: HEADCOUNT.c[column] + bindparam('delta')}), rows)
+
+    # Effectif et masse salariale de fin de mois changent à partir du mois du mouvement,
+    # jusqu'à la fin de la série
+    rows = [{'dept': departement, 'y': _from_index(index)[0], 'm': _from_index(index)[1],
+             'delta': active[departement, index], 'pay': payroll[departement, index]}
+            for departement, index in set(active) | set(payroll)
+            if active[departement, index] or payroll[departement, index]]
+    if rows:
+        connection.execute(
+            update(HEADCOUNT)
+            .where(HEADCOUNT.c.departement == bindparam('dept'),
+                   _months_since(HEADCOUNT, bindparam('y'), bindparam('m')))
+            .values(active=HEADCOUNT.c.active + bindparam('delta'),
+                    payroll=HEADCOUNT.c.payroll + bindparam('pay')),
+            rows
+        )
+
+@on_employee_write
+def _update_headcount(connection, changes):
+    apply_headcount_changes(connection, changes)
+
+
+def current_headcount_query(departement=None, today=None):
+    """Effectif du dernier mois matérialisé jusqu'à aujourd'hui, parcouru à rebours sur la clé primaire"""
+    today = today or date.today()
+    query = select(HEADCOUNT.c.year, HEADCOUNT.c.month, func.sum(HEADCOUNT.c.active)) \
+        .where(_months_until(HEADCOUNT, today.year, today.month)) \
+        .group_by(HEADCOUNT.c.year, HEADCOUNT.c.month) \
+        .order_by(HEADCOUNT.c.year.desc(), HEADCOUNT.c.month.desc()).limit(1)
+    if departement:
+        query = query.where(HEADCOUNT.c.departement == normalize_departement(departement))
+    return query
+
+def current_headcount(departement=None, today=None):
+    """
+    Effectif courant (tous départements ou un seul), en une requête indexée
+    Retourne: {'year', 'month', 'active'} ou None si la table est vide
+    """
+    row = db.session.execute(current_headcount_query(departement, today)).first()
+    if row is None:
+        return None
+    return {'year': row[0], 'month': row[1], 'active': int(row[2])}
+
+def headcount_series(departement=None):
+    """
+    Série mensuelle (Year, Month, nbemp, joined, left, mass_salary), tous départements ou un seul
+    mass_salary: au salaire actuel des employés présents, pas la masse salariale versée à l'époque
+    """
+    query = select(HEADCOUNT.c.year, HEADCOUNT.c.month, func.sum(HEADCOUNT.c.active),
+                   func.sum(HEADCOUNT.c.joined), func.sum(HEADCOUNT.c.left), func.sum(HEADCOUNT.c.payroll)) \
+        .group_by(HEADCOUNT.c.year, HEADCOUNT.c.month).order_by(HEADCOUNT.c.year, HEADCOUNT.c.month)
+    if departement:
+        query = query.where(HEADCOUNT.c.departement == normalize_departement(departement))
+    return [{'Year': year, 'Month': month, 'nbemp': int(active), 'joined': int(joined), 'left': int(left),
+             'mass_salary': float(payroll)}
+            for year, month, active, joined, left, payroll in db.session.execute(query)]
+
+
+def payroll_report(year, departement=None):
+    """
+    Effectif et masse salariale de fin de mois d'une année, par département et au total
+    Lit au plus 12 x départements lignes de headcount_monthly (clé year, month, departement),
+    quel que soit le nombre d'employés
+    Retourne: {'year', 'months': [{'month', 'active', 'payroll', 'joined', 'left', 'departments': [...]}]}
+    """
+    query = select(HEADCOUNT).where(HEADCOUNT.c.year == year) \
+        .order_by(HEADCOUNT.c.month, HEADCOUNT.c.departement)
+    if departement:
+        query = query.where(HEADCOUNT.c.departement == normalize_departement(departement))
+
+    months = {}
+    for row in db.session.execute(query):
+        month = months.setdefault(row.month, {'month': row.month, 'active': 0, 'payroll': 0.0,
+                                              'joined': 0, 'left': 0, 'departments': []})
+        month['active'] += row.active
+        month['payroll'] = round(month['payroll'] + float(row.payroll), 2)
+        month['joined'] += row.joined
+        month['left'] += row.left
+        month['departments'].append({'departement': row.departement or None, 'active': row.active,
+                                     'payroll': float(row.payroll)})
+    return {'year': year, 'months': [months[month] for month in sorted(months)]}
@@ -0,0 +1,257 @@
+import atexit
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert, select
+
+from app import db
+from app.models import PredictionHistory, PredictionResult
+from app.results_store import encode_payload, strip_images, summarize
+
+# Nombre de durées d'écriture conservées pour les percentiles
+FLUSH_LATENCY_WINDOW = 200
+
+
+def history_record(user_id, scenario, result_key, model_version, payload):
+    """Ligne d'historique à écrire: entrées du scénario, résultat et date de la requête"""
+    start_year, end_year, recruitments, departures, initial_employees = scenario
+    return {
+        'user_id': user_id,
+        'start_year': start_year,
+        'end_year': end_year,
+        'recruitments': recruitments,
+        'departures': departures,
+        'initial_employees': initial_employees,
+        'created_at': datetime.utcnow(),
+        'result_key': result_key,
+        'model_version': model_version,
+        'payload': payload
+    }
+
+
+class HistoryWriter:
+    """
+    File d'écriture différée de l'historique des prédictions
+    - la requête dépose la ligne et répond sans attendre la base
+    - un thread regroupe les lignes et les insère en une instruction multi-lignes
+      (résultats manquants puis historique), avec un seul commit par lot
+    - file bornée: si elle est pleine, la requête attend (contre-pression) puis
+      écrit elle-même sa ligne plutôt que de la perdre
+    - la file est vidée à l'arrêt du serveur
+    """
+
+    def __init__(self, app, maxsize=1000, batch_size=200, flush_interval=0.5, put_timeout=2.0, enabled=True):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.enabled = enabled
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0, 'written': 0, 'failed': 0, 'batches': 0,
+            'backpressure_waits': 0, 'sync_writes': 0, 'max_depth': 0
+        }
+        self._flush_latencies = deque(maxlen=FLUSH_LATENCY_WINDOW)
+
+    def submit(self, record):
+        """Dépose une ligne d'historique (écriture immédiate si la file est désactivée)"""
+        if not self.enabled or self._stop.is_set():
+            self._write_sync([record])
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._count('backpressure_waits')
+            try:
+                self._queue.put(record, timeout=self.put_timeout)
+            except queue.Full:
+                # La base ne suit pas: la requête écrit sa propre ligne
+                self._write_sync([record])
+                return
+
+        with self._stats_lock:
+            self._stats['enqueued'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], self._queue.qsize())
+
+    def flush(self):
+        """Attend que toutes les lignes déposées soient écrites"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def shutdown(self):
+        """Arrête le thread d'écriture après avoir vidé la file"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # Lignes déposées pendant l'arrêt
+        remaining = self._drain(self._queue.qsize())
+        if remaining:
+            self._write_sync(remaining)
+
+    def stats(self):
+        """Profondeur de la file et compteurs d'écriture (latences en millisecondes)"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._flush_latencies)
+
+        stats['depth'] = self._queue.qsize()
+        stats['capacity'] = self._queue.maxsize
+        stats['enabled'] = self.enabled
+        if latencies:
+            stats['flush_ms'] = {
+                'last': round(self._flush_latencies[-1] * 1000, 3),
+                'p50': round(latencies[len(latencies) // 2] * 1000, 3),
+                'p95': round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] * 1000, 3),
+                'max': round(latencies[-1] * 1000, 3)
+            }
+        return stats
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                    self._thread.start()
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            self._stats[name] += value
+
+    def _drain(self, limit):
+        records = []
+        while len(records) < limit:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            # Laisser le lot se remplir un court instant sous faible charge
+            if self._queue.qsize() < self.batch_size - 1 and not self._stop.is_set():
+                time.sleep(min(0.05, self.flush_interval))
+            batch = [first] + self._drain(self.batch_size - 1)
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_sync(self, records):
+        self._count('sync_writes', len(records))
+        self._write_batch(records)
+
+    def _write_batch(self, records):
+        start = time.perf_counter()
+        with self.app.app_context():
+            try:
+                _insert_records(records)
+                db.session.commit()
+                self._count('written', len(records))
+            except Exception as e:
+                db.session.rollback()
+                print(f"Erreur écriture historique (lot de {len(records)}): {e}")
+                # Réessayer ligne par ligne: une ligne invalide ne fait pas perdre le lot
+                for record in records:
+                    try:
+                        _insert_records([record])
+                        db.session.commit()
+                        self._count('written')
+                    except Exception as row_error:
+                        db.session.rollback()
+                        self._count('failed')
+                        print(f"Ligne d'historique perdue: {row_error}")
+            finally:
+                db.session.remove()
+
+        with self._stats_lock:
+            self._stats['batches'] += 1
+            self._flush_latencies.append(time.perf_counter() - start)
+
+def _insert_records(records):
+    """Insère les résultats manquants puis les lignes d'historique (une instruction chacun)"""
+    results = PredictionResult.__table__
+    history = PredictionHistory.__table__
+
+    payloads = {}
+    for record in records:
+        payloads.setdefault(record['result_key'], record)
+    keys = list(payloads)
+
+    existing = set(db.session.execute(select(results.c.result_key).where(results.c.result_key.in_(keys))).scalars())
+    missing = []
+    for key in keys:
+        if key in existing:
+            continue
+        record = payloads[key]
+        blob, raw_size = encode_payload(strip_images(record['payload']))
+        missing.append({'result_key': key, 'model_version': record['model_version'],
+                        'payload': blob, 'raw_size': raw_size, 'created_at': record['created_at']})
+    if missing:
+        # Un autre processus peut avoir inséré le même résultat entre-temps
+        db.session.execute(insert(results).values(missing)
+                           .prefix_with('IGNORE', dialect='mysql')
+                           .prefix_with('OR IGNORE', dialect='sqlite'))
+
+    ids = dict(db.session.execute(select(results.c.result_key, results.c.id).where(results.c.result_key.in_(keys))).all())
+    rows = []
+    for record in records:
+        rows.append({
+            'user_id': record['user_id'],
+            'start_year': record['start_year'],
+            'end_year': record['end_year'],
+            'recruitments': record['recruitments'],
+            'departures': record['departures'],
+            'initial_employees': record['initial_employees'],
+            'created_at': record['created_at'],
+            'result_id': ids[record['result_key']],
+            **summarize(record['payload'], record['start_year'], record['end_year'])
+        })
+    db.session.execute(insert(history).values(rows))
+
+
+_writers = []
+
+def get_history_writer():
+    """File d'écriture de l'historique de l'application courante (créée au premier usage)"""
+    app = current_app._get_current_object()
+    writer = app.extensions.get('history_writer')
+    if writer is None:
+        config = app.config
+        writer = HistoryWriter(
+            app,
+            maxsize=config['HISTORY_QUEUE_SIZE'],
+            batch_size=config['HISTORY_BATCH_SIZE'],
+            flush_interval=config['HISTORY_FLUSH_INTERVAL'],
+            put_timeout=config['HISTORY_PUT_TIMEOUT'],
+            enabled=config['HISTORY_WRITE_BEHIND']
+        )
+        writer = app.extensions.setdefault('history_writer', writer)
+        if writer not in _writers:
+            _writers.append(writer)
+    return writer
+
+def shutdown_history_writers():
+    """Vide les files d'historique (appelé à la fermeture du serveur)"""
+    for writer in _writers:
+        writer.shutdown()
+
+atexit.register(shutdown_history_writers)
@@ -1,10 +1,13 @@
-from flask import Blueprint, render_template, request, flash
+from flask import Blueprint, render_template, request, flash, jsonify, abort, Response, stream_with_context
+from datetime import datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
 from flask_login import login_required, current_user
 import html
 from .models import Employee
 from flask_login import login_required, current_user
 from app.models import PredictionHistory
-import json
+from app.rendering import get_graph_renderer, digest_from_url, GRAPH_FORMATS
 
 # Blueprint principal
 main = Blueprint('main', __name__)
@@ -25,20 +28,108 @@ def index():
 def home():
     return render_template("home.html", user=current_user)
 
+# --- Exports ---
+@main.route("/export/<dataset>.<fmt>", methods=["GET"])
+@login_required
+def export_data(dataset, fmt):
+    """
+    Export complet d'une table (employees, recruitments, terminations) en csv, ndjson ou parquet
+    Les lignes sont lues par lots sur un curseur côté serveur et envoyées au fil de l'eau
+    """
+    from app.exports import EXPORT_FORMATS, stream_export
+
+    try:
+        chunks = stream_export(dataset, fmt)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{dataset}-{datetime.utcnow():%Y%m%d}.{fmt}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # --- History ---
 
+# Nombre de lignes par page de l'historique
+HISTORY_PAGE_SIZE = 20
+
+def _encode_cursor(history):
+    return f"{history.created_at.isoformat()}_{history.id}"
+
+def _decode_cursor(cursor):
+    """Curseur "<created_at ISO>_<id>" de la dernière ligne affichée, ou None s'il est invalide"""
+    try:
+        created_at, history_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(history_id)
+    except (AttributeError, ValueError):
+        return None
+
 @main.route("/history", methods=["GET"], strict_slashes=False)
 @login_required
 def history():
-    histories = PredictionHistory.query.filter_by(user_id=current_user.id).order_by(PredictionHistory.created_at.desc()).all()
-
-    for h in histories:
-        try:
-            h.result_data = json.loads(h.result_json)
-        except Exception:
-            h.result_data = {}
-
-    return render_template("history.html", user=current_user, histories=histories)
+    """
+    Historique paginé par clé (user_id, created_at, id): chaque page est lue par l'index,
+    sans OFFSET ni décodage des résultats (colonnes de résumé uniquement)
+    """
+    query = PredictionHistory.query.options(load_only(
+        PredictionHistory.id, PredictionHistory.start_year, PredictionHistory.end_year,
+        PredictionHistory.recruitments, PredictionHistory.departures, PredictionHistory.initial_employees,
+        PredictionHistory.total_payroll, PredictionHistory.horizon_years, PredictionHistory.end_employees,
+        PredictionHistory.result_id, PredictionHistory.created_at
+    )).filter_by(user_id=current_user.id)
+
+    cursor = _decode_cursor(request.args.get('before'))
+    if cursor is not None:
+        created_at, history_id = cursor
+        query = query.filter(or_(
+            PredictionHistory.created_at < created_at,
+            and_(PredictionHistory.created_at == created_at, PredictionHistory.id < history_id)
+        ))
+
+    rows = query.order_by(PredictionHistory.created_at.desc(), PredictionHistory.id.desc()) \
+        .limit(HISTORY_PAGE_SIZE + 1).all()
+    histories = rows[:HISTORY_PAGE_SIZE]
+    next_cursor = _encode_cursor(histories[-1]) if len(rows) > HISTORY_PAGE_SIZE else None
+
+    return render_template("history.html", user=current_user, histories=histories,
+                           next_cursor=next_cursor, is_first_page=cursor is None)
+
+def _user_history(history_id):
+    history = PredictionHistory.query.filter_by(id=history_id, user_id=current_user.id).first()
+    if history is None:
+        abort(404)
+    return history
+
+@main.route("/history/<int:history_id>/result", methods=["GET"])
+@login_required
+def history_result(history_id):
+    """Résultat complet d'une prédiction de l'historique (chargé à la demande)"""
+    history = _user_history(history_id)
+    response = jsonify({'status': 'success', 'id': history.id, 'result': history.load_result()})
+    # Un résultat enregistré ne change plus
+    response.cache_control.private = True
+    response.cache_control.max_age = 86400
+    return response
+
+@main.route("/history/<int:history_id>/thumbnail.png", methods=["GET"])
+@login_required
+def history_thumbnail(history_id):
+    """Vignette du graphique d'une prédiction (mise en cache par le navigateur)"""
+    history = _user_history(history_id)
+    etag = f"h{history.id}-{history.result_id}"
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+
+    digest = digest_from_url(history.load_result().get('graph'))
+    image = get_graph_renderer().get(digest, 'thumb') if digest else None
+    if image is None:
+        abort(404)
+
+    response = Response(image, mimetype=GRAPH_FORMATS['thumb'])
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = 86400
+    return response
 
 # --- Predict ---
 @main.route("/predict", methods=["GET", "POST"], strict_slashes=False)
@@ -0,0 +1,300 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import bindparam, inspect, text
+
+from app import db
+
+# Taille des lots de lignes réécrites par les migrations de données
+BATCH_SIZE = 500
+
+
+def _has_table(conn, table):
+    return inspect(conn).has_table(table)
+
+def _columns(conn, table):
+    return {column['name'] for column in inspect(conn).get_columns(table)}
+
+def _create_indexes(conn, table):
+    """
+    Crée les index déclarés sur le modèle qui manquent dans la base
+    (sauf ceux dont les colonnes n'existent pas encore: créés par une migration suivante)
+    """
+    existing = {index['name'] for index in inspect(conn).get_indexes(table.name)}
+    columns = _columns(conn, table.name)
+    for index in table.indexes:
+        if index.name not in existing and all(column.name in columns for column in index.columns):
+            index.create(conn)
+
+def _rebuild_sqlite_table(conn, table):
+    """
+    SQLite ne sait pas modifier une colonne: la table est recréée d'après le modèle
+    puis les colonnes communes sont recopiées
+    """
+    old_columns = _columns(conn, table.name)
+    for index in inspect(conn).get_indexes(table.name):
+        conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+
+    conn.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "_old_{table.name}"'))
+    table.create(conn)
+    columns = ', '.join(f'"{column.name}"' for column in table.columns if column.name in old_columns)
+    conn.execute(text(f'INSERT INTO "{table.name}" ({columns}) SELECT {columns} FROM "_old_{table.name}"'))
+    conn.execute(text(f'DROP TABLE "_old_{table.name}"'))
+
+
+def _0001_prediction_results(conn):
+    """Résultats compressés et dédupliqués: prediction_results, référencés par l'historique"""
+    from app.models import Employee, PredictionHistory, PredictionResult, User
+    from app.results_store import content_key, encode_payload, result_key, strip_images
+
+    # Base neuve: tables référencées par l'historique créées d'abord, dans l'ordre de leurs
+    # clés étrangères (MySQL refuse une clé étrangère vers une table absente)
+    db.metadata.create_all(conn, tables=[Employee.__table__, User.__table__, PredictionResult.__table__],
+                           checkfirst=True)
+    if not _has_table(conn, 'prediction_history'):
+        PredictionHistory.__table__.create(conn)
+        return
+
+    if 'result_id' not in _columns(conn, 'prediction_history'):
+        if conn.dialect.name == 'sqlite':
+            _rebuild_sqlite_table(conn, PredictionHistory.__table__)
+        else:
+            conn.execute(text(
+                'ALTER TABLE prediction_history '
+                'ADD COLUMN result_id INTEGER NULL, '
+                'MODIFY result_json LONGTEXT NULL, '
+                'ADD CONSTRAINT fk_prediction_history_result '
+                'FOREIGN KEY (result_id) REFERENCES prediction_results (id)'
+            ))
+
+    # Réécrire les anciennes lignes: JSON complet (avec l'image base64) -> résultat partagé
+    history = PredictionHistory.__table__
+    results = PredictionResult.__table__
+    while True:
+        rows = conn.execute(
+            history.select()
+            .where(history.c.result_id.is_(None), history.c.result_json.isnot(None))
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+
+        for row in rows:
+            try:
+                payload = strip_images(json.loads(row.result_json))
+            except ValueError:
+                payload = {}
+
+            # Version du modèle connue: même adresse que les nouvelles exécutions du scénario
+            version = payload.get('model_version')
+            if version:
+                key = result_key('predict', [[row.start_year, row.end_year, row.recruitments, row.departures,
+                                              row.initial_employees], None],
+                                 f"{version}:{payload.get('model', 'xgboost')}")
+            else:
+                key = content_key(payload)
+
+            result_id = conn.execute(results.select().with_only_columns(results.c.id)
+                                     .where(results.c.result_key == key)).scalar()
+            if result_id is None:
+                blob, raw_size = encode_payload(payload)
+                result_id = conn.execute(results.insert().values(
+                    result_key=key, model_version=version, payload=blob, raw_size=raw_size,
+                    created_at=row.created_at or datetime.utcnow()
+                )).inserted_primary_key[0]
+
+            conn.execute(history.update().where(history.c.id == row.id)
+                         .values(result_id=result_id, result_json=None))
+
+
+def _0002_history_summary(conn):
+    """Colonnes de résumé de l'historique et index (user_id, created_at) pour la pagination par clé"""
+    from app.models import PredictionHistory, PredictionResult
+    from app.results_store import decode_payload, summarize
+
+    columns = _columns(conn, 'prediction_history')
+    for name, sql_type in (('total_payroll', 'FLOAT'), ('horizon_years', 'INTEGER'), ('end_employees', 'INTEGER')):
+        if name not in columns:
+            conn.execute(text(f'ALTER TABLE prediction_history ADD COLUMN {name} {sql_type} NULL'))
+    _create_indexes(conn, PredictionHistory.__table__)
+
+    # Remplir le résumé des lignes existantes: chaque résultat partagé n'est décodé qu'une fois
+    history = PredictionHistory.__table__
+    results = PredictionResult.__table__
+    summaries = {}
+    while True:
+        rows = conn.execute(
+            history.select()
+            .with_only_columns(history.c.id, history.c.result_id, history.c.start_year, history.c.end_year)
+            .where(history.c.horizon_years.is_(None))
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+
+        for row in rows:
+            key = (row.result_id, row.start_year, row.end_year)
+            if key not in summaries:
+                blob = None
+                if row.result_id is not None:
+                    blob = conn.execute(results.select().with_only_columns(results.c.payload)
+                                        .where(results.c.id == row.result_id)).scalar()
+                summaries[key] = summarize(decode_payload(blob) if blob else {}, row.start_year, row.end_year)
+            conn.execute(history.update().where(history.c.id == row.id).values(**summaries[key]))
+
+
+def _0003_query_indexes(conn):
+    """
+    Index des requêtes fréquentes (liste des employés, recrutements, départs) et colonnes
+    dérivées departement_norm / join_year, remplies ici puis tenues à jour par le modèle
+    """
+    from app.models import Employee, Recruitment, Termination, normalize_departement
+
+    for model in (Employee, Recruitment, Termination):
+        model.__table__.create(conn, checkfirst=True)
+
+    columns = _columns(conn, 'employees')
+    for name, sql_type in (('departement_norm', 'VARCHAR(50)'), ('join_year', 'INTEGER')):
+        if name not in columns:
+            conn.execute(text(f'ALTER TABLE employees ADD COLUMN {name} {sql_type} NULL'))
+
+    # normalize_departement() appliquée en Python (UPPER/TRIM SQL diffèrent hors ASCII):
+    # remplissage par lots, par clé croissante
+    employees = Employee.__table__
+    last_matricule = None
+    while True:
+        query = employees.select().with_only_columns(
+            employees.c.matricule, employees.c.departement, employees.c.date_joined
+        ).order_by(employees.c.matricule).limit(BATCH_SIZE)
+        if last_matricule is not None:
+            query = query.where(employees.c.matricule > last_matricule)
+        rows = conn.execute(query).fetchall()
+        if not rows:
+            break
+
+        conn.execute(
+            employees.update().where(employees.c.matricule == bindparam('key')).values(
+                departement_norm=bindparam('norm'), join_year=bindparam('year')
+            ),
+            [{'key': row.matricule, 'norm': normalize_departement(row.departement),
+              'year': row.date_joined.year if row.date_joined else None}
+             for row in rows]
+        )
+        last_matricule = rows[-1].matricule
+
+    for model in (Employee, Recruitment, Termination):
+        _create_indexes(conn, model.__table__)
+
+
+def _0004_employee_search(conn):
+    """Noms normalisés (minuscules, sans accents) et index pour la recherche par préfixe"""
+    from app.models import Employee, normalize_name
+
+    columns = _columns(conn, 'employees')
+    for name in ('first_name_norm', 'last_name_norm'):
+        if name not in columns:
+            conn.execute(text(f'ALTER TABLE employees ADD COLUMN {name} VARCHAR(50) NULL'))
+
+    # Normalisation Unicode faite en Python: remplissage par lots, par clé croissante
+    employees = Employee.__table__
+    last_matricule = None
+    while True:
+        query = employees.select().with_only_columns(
+            employees.c.matricule, employees.c.first_name, employees.c.last_name
+        ).order_by(employees.c.matricule).limit(BATCH_SIZE)
+        if last_matricule is not None:
+            query = query.where(employees.c.matricule > last_matricule)
+        rows = conn.execute(query).fetchall()
+        if not rows:
+            break
+
+        conn.execute(
+            employees.update().where(employees.c.matricule == bindparam('key')).values(
+                first_name_norm=bindparam('first'), last_name_norm=bindparam('last')
+            ),
+            [{'key': row.matricule, 'first': normalize_name(row.first_name), 'last': normalize_name(row.last_name)}
+             for row in rows]
+        )
+        last_matricule = rows[-1].matricule
+
+    _create_indexes(conn, employees)
+
+
+def _0005_table_versions(conn):
+    """Compteurs de changements des tables (ETag et requêtes conditionnelles de l'API)"""
+    from app.models import TableVersion
+    from app.table_versions import VERSIONED_TABLES
+
+    TableVersion.__table__.create(conn, checkfirst=True)
+    existing = {row.table_name for row in conn.execute(TableVersion.__table__.select())}
+    missing = [{'table_name': name, 'version': 0} for name in VERSIONED_TABLES if name not in existing]
+    if missing:
+        conn.execute(TableVersion.__table__.insert(), missing)
+
+
+def _0006_headcount_monthly(conn):
+    """Effectif mensuel par département, calculé depuis employees puis tenu à jour par les écritures"""
+    from app.headcount import rebuild_headcount
+    from app.models import HeadcountMonthly
+
+    HeadcountMonthly.__table__.create(conn, checkfirst=True)
+    rebuild_headcount(conn)
+
+
+def _0007_headcount_payroll(conn):
+    """Masse salariale mensuelle par département dans headcount_monthly"""
+    from app.headcount import rebuild_headcount
+
+    if 'payroll' not in _columns(conn, 'headcount_monthly'):
+        conn.execute(text('ALTER TABLE headcount_monthly ADD COLUMN payroll NUMERIC(14, 2) NOT NULL DEFAULT 0'))
+    rebuild_headcount(conn)
+
+
+# Migrations dans l'ordre d'application: (version, nom, fonction)
+MIGRATIONS = [
+    (1, 'prediction_results', _0001_prediction_results),
+    (2, 'history_summary', _0002_history_summary),
+    (3, 'query_indexes', _0003_query_indexes),
+    (4, 'employee_search', _0004_employee_search),
+    (5, 'table_versions', _0005_table_versions),
+    (6, 'headcount_monthly', _0006_headcount_monthly),
+    (7, 'headcount_payroll', _0007_headcount_payroll),
+]
+
+
+def _ensure_migrations_table(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version INTEGER NOT NULL PRIMARY KEY, '
+        'name VARCHAR(100) NOT NULL, '
+        'applied_at DATETIME NOT NULL)'
+    ))
+
+def applied_versions():
+    """Versions déjà appliquées sur la base courante"""
+    with db.engine.begin() as conn:
+        _ensure_migrations_table(conn)
+        return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+def pending_migrations():
+    applied = applied_versions()
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+def upgrade():
+    """
+    Applique les migrations manquantes, chacune dans sa propre transaction
+    Retourne: liste des (version, nom) appliquées
+    """
+    applied = applied_versions()
+    done = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        with db.engine.begin() as conn:
+            migrate(conn)
+            conn.execute(text('INSERT INTO schema_migrations (version, name, applied_at) '
+                              'VALUES (:version, :name, :applied_at)'),
+                         {'version': version, 'name': name, 'applied_at': datetime.utcnow()})
+        print(f"✅ Migration {version:04d} appliquée: {name}")
+        done.append((version, name))
+    return done
@@ -1,72 +1,389 @@
-
-import joblib
+import hashlib
 import os
-import pickle
+import threading
+import time
+
+from app.startup import lazy_import
+from app.artifact_bundle import read_bundle, current_bundle_dir, CURRENT_NAME, MANIFEST_NAME
+from config import Config
 
-# Chemins vers les artefacts du modèle
-ARTIFACTS_DIR = os.path.join('ml_models', 'artifacts')
+# Importés au premier chargement du modèle
+joblib = lazy_import('joblib')
+np = lazy_import('numpy')
+
+# Chemins vers les artefacts du modèle (relatifs au dépôt, pas au dossier courant)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARTIFACTS_DIR = os.path.join(ROOT_DIR, 'ml_models', 'artifacts')
+# Bundles versionnés (booster natif + scaler .npy + manifeste), prioritaires sur les pickles
+BUNDLES_DIR = os.path.join(ARTIFACTS_DIR, 'bundles')
 MODEL_PATH = os.path.join(ARTIFACTS_DIR, 'xgb_model.pkl')
 SCALER_PATH = os.path.join(ARTIFACTS_DIR, 'scaler.pkl')
 FEATURE_NAMES_PATH = os.path.join(ARTIFACTS_DIR, 'feature_names.pkl')
 METRICS_PATH = os.path.join(ARTIFACTS_DIR, 'metrics.pkl')
+TREES_PATH = os.path.join(ARTIFACTS_DIR, 'xgb_trees.npz')
+
+# Fichiers surveillés: une modification déclenche le rechargement du bundle
+WATCHED_PATHS = [os.path.join(BUNDLES_DIR, CURRENT_NAME), MODEL_PATH, SCALER_PATH, FEATURE_NAMES_PATH, METRICS_PATH, TREES_PATH]
+
+def file_digest(paths):
+    """SHA-256 tronqué du contenu d'une liste de fichiers"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def _artifacts_signature():
+    """(taille, date de modification) des artefacts surveillés, sans lire leur contenu"""
+    signature = []
+    for path in WATCHED_PATHS:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class ModelBundle:
+    """
+    Ensemble immuable des artefacts chargés ensemble: modèles, scaler commun, noms
+    de features et métriques, identifié par une version (empreinte du contenu)
+    Le bundle expose le modèle sélectionné (model, compiled, metrics); select()
+    retourne une vue du même bundle sur un autre modèle.
+    """
+
+    __slots__ = ('version', 'scaler', 'feature_names', 'models', 'default_model', 'loaded_at',
+                 'model_name', 'family', 'model', 'compiled', 'metrics')
+
+    def __init__(self, version, scaler, feature_names, models, default_model, loaded_at, model_name=None):
+        model_name = model_name or default_model
+        entry = models[model_name]
+        values = (version, scaler, feature_names, models, default_model, loaded_at,
+                  model_name, entry['family'], entry['model'], entry['compiled'], entry['metrics'])
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ModelBundle est immuable")
+
+    @property
+    def cache_version(self):
+        """Version utilisée dans les clés de cache: artefacts et modèle sélectionné"""
+        return f'{self.version}:{self.model_name}'
+
+    def select(self, model_name=None):
+        """Vue du bundle sur le modèle demandé (par défaut celui du bundle)"""
+        model_name = model_name or self.default_model
+        if model_name == self.model_name:
+            return self
+        if model_name not in self.models:
+            raise KeyError(model_name)
+        return ModelBundle(self.version, self.scaler, self.feature_names, self.models,
+                           self.default_model, self.loaded_at, model_name=model_name)
+
+    def use_compiled_engine(self, n_rows):
+        """Indique si un lot de n_rows lignes doit passer par l'évaluateur compilé"""
+        if self.compiled is None:
+            return False
+        # Forêt aléatoire: les tables compilées sont son seul moteur
+        if self.model is None:
+            return True
+        if Config.MODEL_ENGINE == 'booster':
+            return False
+        return Config.MODEL_ENGINE == 'compiled' or n_rows <= Config.COMPILED_ENGINE_MAX_ROWS
+
+    def warmup(self):
+        """Prédiction à blanc de chaque modèle avec chaque moteur: aucune requête ne paie le premier appel"""
+        import pandas as pd
+        frame = pd.DataFrame([[2025, 1, 1.0, 1.0, 100.0]] * 2, columns=self.feature_names)
+        for name in self.models:
+            bundle = self.select(name)
+            if bundle.model is not None:
+                bundle.model.predict(self.scaler.transform(frame))
+            if bundle.compiled is not None:
+                bundle.compiled.predict(frame.to_numpy(dtype=np.float64))
+
+    @classmethod
+    def load(cls, version=None):
+        """
+        Charge et valide tous les artefacts en un seul bundle
+        Bundle versionné (ml_models/artifacts/bundles/CURRENT) s'il existe, sinon pickles
+        version: bundle précis (ml_models/artifacts/bundles/<version>) au lieu du courant
+        """
+        if version is not None:
+            bundle_dir = os.path.join(BUNDLES_DIR, version)
+            if not os.path.isfile(os.path.join(bundle_dir, MANIFEST_NAME)):
+                raise RuntimeError(f"Version du modèle indisponible: {version}")
+        else:
+            bundle_dir = current_bundle_dir(BUNDLES_DIR)
+        if bundle_dir is not None:
+            data = read_bundle(bundle_dir)
+            default_model = Config.DEFAULT_MODEL or data['default_model']
+            if default_model not in data['models']:
+                print(f"Modèle par défaut inconnu: {default_model}, utilisation de {data['default_model']}")
+                default_model = data['default_model']
+            bundle = cls(version=data['version'], scaler=data['scaler'], feature_names=data['feature_names'],
+                         models=data['models'], default_model=default_model, loaded_at=time.time())
+        else:
+            bundle = cls._load_pickles()
+
+        n_expected = len(bundle.feature_names)
+        if bundle.scaler.n_features_in_ != n_expected:
+            raise ValueError(f"Scaler incohérent avec feature_names ({n_expected})")
+        for name, entry in bundle.models.items():
+            n_features = getattr(entry['model'], 'n_features_in_', None) or \
+                getattr(entry['compiled'], 'n_features', n_expected)
+            if n_features != n_expected:
+                raise ValueError(f"Modèle {name} incohérent avec feature_names ({n_expected})")
+            # Moteur 'booster' forcé: tables compilées ignorées sauf si elles sont le seul moteur
+            if Config.MODEL_ENGINE == 'booster' and entry['model'] is not None:
+                entry['compiled'] = None
+        # Nouvelle vue: celle construite avant le filtrage garde les tables écartées
+        return cls(bundle.version, bundle.scaler, bundle.feature_names, bundle.models,
+                   bundle.default_model, bundle.loaded_at)
+
+    @classmethod
+    def _load_pickles(cls):
+        """Ancien format: artefacts joblib (xgb_model.pkl, scaler.pkl, ...)"""
+        for path, label in ((MODEL_PATH, 'Modèle'), (SCALER_PATH, 'Scaler'), (FEATURE_NAMES_PATH, 'Features')):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"{label} non trouvé: {path}. Exécutez d'abord export_model.py")
+
+        # Version calculée avant le chargement: un fichier remplacé entre-temps
+        # sera détecté au prochain passage de la surveillance
+        version = file_digest([MODEL_PATH, SCALER_PATH, FEATURE_NAMES_PATH])
+        model = joblib.load(MODEL_PATH)
+        scaler = joblib.load(SCALER_PATH)
+        feature_names = list(joblib.load(FEATURE_NAMES_PATH))
+
+        models = {'xgboost': {'family': 'xgboost', 'model': model, 'compiled': _load_compiled(),
+                              'metrics': _load_metrics()}}
+        return cls(
+            version=version,
+            scaler=scaler,
+            feature_names=feature_names,
+            models=models,
+            default_model='xgboost',
+            loaded_at=time.time()
+        )
+
+def _load_metrics():
+    """Récupère les métriques du modèle (R², MSE, etc.)"""
+    try:
+        if os.path.exists(METRICS_PATH):
+            return joblib.load(METRICS_PATH)
+        print(f"Fichier de métriques non trouvé: {METRICS_PATH}")
+    except Exception as e:
+        print(f"Erreur lors du chargement des métriques: {e}")
+    return {'r2': 0.0, 'mse': 0.0}
+
+def _load_compiled():
+    """
+    Charge l'évaluateur NumPy compilé (ml_models/compile_trees.py)
+    Retourne None si les tables sont absentes, désactivées ou périmées
+    """
+    if Config.MODEL_ENGINE == 'booster' or not os.path.exists(TREES_PATH):
+        return None
+
+    from app.tree_engine import TreeEnsemble
+    ensemble = TreeEnsemble.load(TREES_PATH)
+    # Les tables doivent provenir du modèle et du scaler actuellement exportés
+    if ensemble.metadata.get('source_fingerprint') != file_digest([MODEL_PATH, SCALER_PATH]):
+        print(f"Tables compilées périmées: {TREES_PATH}. Exécutez ml_models/compile_trees.py")
+        return None
+    return ensemble
 
-# Cache pour éviter de recharger les artefacts à chaque prédiction
-_model_cache = None
-_scaler_cache = None
-_feature_names_cache = None
-_metrics_cache = None
+
+class ModelRegistry:
+    """
+    Registre thread-safe du bundle de modèle courant
+    - chargement unique même si plusieurs requêtes arrivent en même temps
+    - remplacement atomique: une requête garde le bundle qu'elle a obtenu jusqu'au bout
+    - surveillance optionnelle des artefacts pour recharger sans redémarrage
+    """
+
+    def __init__(self):
+        self._bundle = None
+        self._signature = None
+        self._load_lock = threading.Lock()
+        self._watcher = None
+        self._watch_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def current(self):
+        """Retourne le bundle courant (chargé au premier appel)"""
+        bundle = self._bundle
+        if bundle is None:
+            with self._load_lock:
+                if self._bundle is None:
+                    self._swap()
+                bundle = self._bundle
+        return bundle
+
+    @property
+    def loaded(self):
+        """Bundle chargé et préchauffé"""
+        return self._bundle is not None
+
+    def reload(self):
+        """Charge un nouveau bundle puis le substitue à l'ancien; l'ancien reste servi en cas d'échec"""
+        with self._load_lock:
+            return self._swap()
+
+    def _swap(self):
+        signature = _artifacts_signature()
+        bundle = ModelBundle.load()
+        bundle.warmup()
+        # Affectation d'un seul attribut: les lecteurs voient l'ancien ou le nouveau bundle
+        self._bundle = bundle
+        self._signature = signature
+        return bundle
+
+    def preload(self):
+        """Charge le bundle dans un thread démon; les requêtes arrivées avant attendent ce chargement"""
+        def load():
+            try:
+                from app.startup import timed
+                with timed('model', 'load + warmup (arrière-plan)'):
+                    bundle = self.current()
+                print(f"✅ Modèle préchargé: version {bundle.version}")
+            except Exception as e:
+                print(f"Erreur préchargement du modèle: {e}")
+
+        threading.Thread(target=load, name='model-registry-preload', daemon=True).start()
+
+    def watch(self, interval=10):
+        """Démarre la surveillance des artefacts (thread démon), une seule fois"""
+        watcher = self._watcher
+        if watcher is not None and watcher.is_alive():
+            return
+        with self._watch_lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch_loop, args=(interval,),
+                                             name='model-registry-watcher', daemon=True)
+            self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        with self._watch_lock:
+            if self._watcher is not None:
+                self._watcher.join()
+                self._watcher = None
+
+    def _watch_loop(self, interval):
+        pending = None
+        while not self._stop.wait(interval):
+            if self._bundle is None:
+                continue
+            signature = _artifacts_signature()
+            if signature == self._signature:
+                pending = None
+                continue
+            # Attendre deux relevés identiques: les fichiers peuvent être en cours d'écriture
+            if signature != pending:
+                pending = signature
+                continue
+            try:
+                bundle = self.reload()
+                print(f"✅ Modèle rechargé: version {bundle.version}")
+            except Exception as e:
+                print(f"Erreur rechargement du modèle (version précédente conservée): {e}")
+                self._signature = signature
+            pending = None
+
+
+registry = ModelRegistry()
+
+def get_bundle():
+    """Retourne le bundle de modèle courant"""
+    return registry.current()
+
+# Bundle d'une version qui n'est plus (ou pas encore) la courante, gardé pour les lots suivants
+_pinned = {}
+_pinned_lock = threading.Lock()
+
+def get_bundle_version(version, model_name=None):
+    """
+    Bundle d'une version précise, pour les processus du pool: tous les blocs d'un lot ou d'une
+    simulation sont scorés par la version du processus parent, même après un remplacement
+    - le bundle courant s'il a cette version
+    - sinon cette version relue depuis ml_models/artifacts/bundles/<version>
+    Lève RuntimeError si la version n'est plus disponible
+    """
+    bundle = registry.current()
+    if bundle.version != version:
+        with _pinned_lock:
+            bundle = _pinned.get(version)
+            if bundle is None:
+                bundle = ModelBundle.load(version=version)
+                if bundle.version != version:
+                    raise RuntimeError(f"Version du modèle indisponible: {version} (lu {bundle.version})")
+                _pinned.clear()
+                _pinned[version] = bundle
+    return bundle.select(model_name)
 
 def get_model():
     """Charge et retourne le modèle ML"""
-    global _model_cache
-    if _model_cache is None:
-        if not os.path.exists(MODEL_PATH):
-            raise FileNotFoundError(f"Modèle non trouvé: {MODEL_PATH}. Exécutez d'abord export_model.py")
-        _model_cache = joblib.load(MODEL_PATH)
-    return _model_cache
+    return registry.current().model
 
 def get_scaler():
     """Charge et retourne le scaler"""
-    global _scaler_cache
-    if _scaler_cache is None:
-        if not os.path.exists(SCALER_PATH):
-            raise FileNotFoundError(f"Scaler non trouvé: {SCALER_PATH}. Exécutez d'abord export_model.py")
-        _scaler_cache = joblib.load(SCALER_PATH)
-    return _scaler_cache
+    return registry.current().scaler
 
 def get_feature_names():
     """Charge et retourne la liste des noms de features"""
-    global _feature_names_cache
-    if _feature_names_cache is None:
-        if not os.path.exists(FEATURE_NAMES_PATH):
-            raise FileNotFoundError(f"Features non trouvées: {FEATURE_NAMES_PATH}. Exécutez d'abord export_model.py")
-        _feature_names_cache = joblib.load(FEATURE_NAMES_PATH)
-    return _feature_names_cache
+    return registry.current().feature_names
 
 def get_model_metrics():
     """
     Récupère les métriques du modèle (R², MSE, etc.)
     """
-    global _metrics_cache
+    return registry.current().metrics
 
-    if _metrics_cache is None:
-        try:
-            if os.path.exists(METRICS_PATH):
-                _metrics_cache = joblib.load(METRICS_PATH)
-            else:
-                print(f"Fichier de métriques non trouvé: {METRICS_PATH}")
-                _metrics_cache = {'r2': 0.0, 'mse': 0.0}
-        except Exception as e:
-            print(f"Erreur lors du chargement des métriques: {e}")
-            _metrics_cache = {'r2': 0.0, 'mse': 0.0}
+def parse_model_split(spec):
+    """
+    Répartition A/B "xgboost:90,linear:10" -> [('xgboost', 90), ('linear', 10)]
+    Les poids sont relatifs (pas forcément sur 100)
+    """
+    split = []
+    for part in filter(None, (part.strip() for part in (spec or '').split(','))):
+        name, _, weight = part.partition(':')
+        weight = float(weight) if weight else 1.0
+        if weight < 0:
+            raise ValueError(f"Poids négatif pour le modèle {name}")
+        split.append((name.strip(), weight))
+    return split
+
+def route_model(bundle, model_name=None, routing_key='', split=None):
+    """
+    Choisit le modèle servant une requête
+    - model_name explicite (KeyError s'il n'existe pas dans le bundle)
+    - sinon répartition A/B pondérée: une même clé de routage (scénario) tombe
+      toujours sur le même modèle, ce qui garde le cache efficace
+    - sinon le modèle par défaut du bundle
+    Retourne: vue du bundle sur le modèle choisi
+    """
+    if model_name:
+        return bundle.select(model_name)
+
+    split = [(name, weight) for name, weight in (split or []) if name in bundle.models and weight > 0]
+    if not split:
+        return bundle.select()
 
-    return _metrics_cache
+    total = sum(weight for _, weight in split)
+    digest = hashlib.sha256(routing_key.encode('utf-8')).digest()
+    point = int.from_bytes(digest[:8], 'big') / 2 ** 64 * total
+    for name, weight in split:
+        point -= weight
+        if point < 0:
+            return bundle.select(name)
+    return bundle.select(split[-1][0])
 
 def reload_model():
     """Force le rechargement de tous les artefacts (utile après un réentraînement)"""
-    global _model_cache, _scaler_cache, _feature_names_cache, _metrics_cache
-    _model_cache = None
-    _scaler_cache = None
-    _feature_names_cache = None
-    _metrics_cache = None
-    print("✅ Cache des modèles vidé. Prochain appel rechargera les artefacts.")
\ No newline at end of file
+    bundle = registry.reload()
+    print(f"✅ Modèle rechargé: version {bundle.version}")
+    return bundle
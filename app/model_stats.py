@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Nombre de latences conservées par modèle pour les percentiles
+LATENCY_WINDOW = 1000
+
+
+class ModelStats:
+    """
+    Compteurs par modèle servi: appels, lignes prédites, erreurs et latence
+    Les percentiles sont calculés sur les LATENCY_WINDOW derniers appels.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_name, rows, seconds, error=False):
+        with self._lock:
+            stats = self._stats.get(model_name)
+            if stats is None:
+                stats = self._stats[model_name] = {
+                    'calls': 0, 'rows': 0, 'errors': 0, 'total_seconds': 0.0,
+                    'latencies': deque(maxlen=self.window)
+                }
+            stats['calls'] += 1
+            stats['rows'] += rows
+            stats['errors'] += int(error)
+            stats['total_seconds'] += seconds
+            stats['latencies'].append(seconds)
+
+    @contextmanager
+    def timed(self, model_name, rows):
+        """Chronomètre une prédiction; une exception est comptée comme erreur"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record(model_name, rows, time.perf_counter() - start, error=True)
+            raise
+        self.record(model_name, rows, time.perf_counter() - start)
+
+    def snapshot(self):
+        """Compteurs de chaque modèle, latences en millisecondes"""
+        with self._lock:
+            items = [(name, dict(stats, latencies=sorted(stats['latencies'])))
+                     for name, stats in self._stats.items()]
+
+        result = {}
+        for name, stats in items:
+            latencies = stats['latencies']
+
+            def percentile(q):
+                return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 3)
+
+            result[name] = {
+                'calls': stats['calls'],
+                'rows': stats['rows'],
+                'errors': stats['errors'],
+                'latency_ms': {
+                    'mean': round(stats['total_seconds'] / stats['calls'] * 1000, 3),
+                    'p50': percentile(0.5),
+                    'p95': percentile(0.95),
+                    'max': round(latencies[-1] * 1000, 3)
+                }
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+model_stats = ModelStats()
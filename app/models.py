@@ -1,12 +1,36 @@
+import unicodedata
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import json
 from flask_login import UserMixin
 from app import db
 
 
+def normalize_departement(value):
+    """Forme de comparaison d'un département: sans espaces autour, en majuscules"""
+    value = (value or '').strip().upper()
+    return value or None
+
+def normalize_name(value):
+    """Forme de recherche d'un nom: minuscules, sans accents ni espaces superflus"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(value.casefold().split()) or None
+
+
 class Employee(db.Model):
     __tablename__ = 'employees'
+    __table_args__ = (
+        # Filtres de la liste des employés: département (+ statut), année d'entrée (+ statut)
+        db.Index('ix_employees_departement_norm', 'departement_norm', 'date_left'),
+        db.Index('ix_employees_join_year', 'join_year', 'date_left'),
+        db.Index('ix_employees_date_joined', 'date_joined'),
+        db.Index('ix_employees_date_left', 'date_left'),
+        # Recherche par préfixe du nom ou du prénom
+        db.Index('ix_employees_last_name_norm', 'last_name_norm'),
+        db.Index('ix_employees_first_name_norm', 'first_name_norm'),
+    )
 
     matricule = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
@@ -19,6 +43,14 @@ class Employee(db.Model):
     indemnite2 = db.Column(db.Numeric(10, 2))
     date_joined = db.Column(db.Date)
     date_left = db.Column(db.Date)
+
+    # Colonnes dérivées, tenues à jour par les événements ci-dessous: filtres indexables
+    # (pas de UPPER() ni d'EXTRACT() dans les requêtes)
+    departement_norm = db.Column(db.String(50))
+    join_year = db.Column(db.Integer)
+    first_name_norm = db.Column(db.String(50))
+    last_name_norm = db.Column(db.String(50))
+
     def to_dict(self):
         return {
             'matricule': self.matricule,
@@ -34,6 +66,23 @@ class Employee(db.Model):
             'date_left': self.date_left.isoformat() if self.date_left else None
         }
 
+def derived_columns(values):
+    """Colonnes dérivées d'un employé (à fournir aussi par les écritures en masse hors ORM)"""
+    date_joined = values.get('date_joined')
+    return {
+        'departement_norm': normalize_departement(values.get('departement')),
+        'join_year': date_joined.year if date_joined else None,
+        'first_name_norm': normalize_name(values.get('first_name')),
+        'last_name_norm': normalize_name(values.get('last_name'))
+    }
+
+@db.event.listens_for(Employee, 'before_insert')
+@db.event.listens_for(Employee, 'before_update')
+def _sync_employee_columns(mapper, connection, employee):
+    values = {key: getattr(employee, key) for key in ('departement', 'date_joined', 'first_name', 'last_name')}
+    for key, value in derived_columns(values).items():
+        setattr(employee, key, value)
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
 
@@ -72,6 +121,9 @@ class User(UserMixin, db.Model):
 
 class Recruitment(db.Model):
     __tablename__ = 'recruitment'
+    __table_args__ = (
+        db.Index('ix_recruitment_date', 'recruitment_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     matricule = db.Column(db.Integer, db.ForeignKey('employees.matricule'), nullable=False)
@@ -88,6 +140,9 @@ class Recruitment(db.Model):
 
 class Termination(db.Model):
     __tablename__ = 'termination'
+    __table_args__ = (
+        db.Index('ix_termination_date', 'termination_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     matricule = db.Column(db.Integer, db.ForeignKey('employees.matricule'), nullable=False)
@@ -102,8 +157,58 @@ class Termination(db.Model):
     employee = db.relationship('Employee', backref='termination_history')
 
 
+class HeadcountMonthly(db.Model):
+    """
+    Effectif et masse salariale par mois et département, dérivés de employees (app/headcount.py)
+    active: employés présents en fin de mois; joined / left: entrées et départs du mois
+    payroll: salaire + indemnités des employés présents en fin de mois
+    """
+    __tablename__ = 'headcount_monthly'
+
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    month = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # Département normalisé ('' pour les employés sans département)
+    departement = db.Column(db.String(50), primary_key=True)
+    active = db.Column(db.Integer, nullable=False, default=0)
+    joined = db.Column(db.Integer, nullable=False, default=0)
+    left = db.Column(db.Integer, nullable=False, default=0)
+    payroll = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+
+class TableVersion(db.Model):
+    """Compteur de changements d'une table (ETag de l'API, app/table_versions.py)"""
+    __tablename__ = 'table_versions'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PredictionResult(db.Model):
+    __tablename__ = 'prediction_results'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    # Adresse du résultat: hash des entrées et de la version du modèle (app/results_store.py)
+    result_key = db.Column(db.String(64), unique=True, nullable=False)
+    model_version = db.Column(db.String(64))
+
+    # Réponse JSON compressée (zlib), sans image
+    payload = db.Column(db.LargeBinary(length=16777215), nullable=False)
+    raw_size = db.Column(db.Integer, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        from app.results_store import decode_payload
+        return decode_payload(self.payload)
+
+
 class PredictionHistory(db.Model):
     __tablename__ = 'prediction_history'
+    __table_args__ = (
+        # Pagination par clé de l'historique d'un utilisateur (plus récent d'abord)
+        db.Index('ix_prediction_history_user_created', 'user_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -115,10 +220,27 @@ class PredictionHistory(db.Model):
     departures = db.Column(db.Integer, nullable=False)
     initial_employees = db.Column(db.Integer, nullable=False)
 
-    # Results (store as JSON string for flexibility)
-    result_json = db.Column(db.Text(length=4294967295), nullable=False)
+    # Results: partagés entre les exécutions d'un même scénario
+    result_id = db.Column(db.Integer, db.ForeignKey('prediction_results.id'))
+    # Ancien format (JSON complet), vidé par la migration 0001
+    result_json = db.Column(db.Text(length=4294967295))
+
+    # Résumé calculé à l'écriture: la liste de l'historique ne décode jamais les résultats
+    total_payroll = db.Column(db.Float)
+    horizon_years = db.Column(db.Integer)
+    end_employees = db.Column(db.Integer)
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationship back to User
-    user = db.relationship('User', backref='prediction_history')
\ No newline at end of file
+    user = db.relationship('User', backref='prediction_history')
+    result = db.relationship('PredictionResult')
+
+    def load_result(self):
+        """Résultat décodé (table prediction_results, ou ancien result_json)"""
+        try:
+            if self.result is not None:
+                return self.result.to_dict()
+            return json.loads(self.result_json) if self.result_json else {}
+        except Exception:
+            return {}
\ No newline at end of file
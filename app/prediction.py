@@ -1,6 +1,20 @@
-import pandas as pd
-import numpy as np
-from app.model_loader import get_model, get_scaler
+import calendar
+import time
+from functools import partial
+from app.startup import lazy_import
+from app.model_loader import get_bundle, get_bundle_version
+from config import Config
+from app.model_stats import model_stats
+from app.process_pool import get_process_pool, split_chunks
+
+# Importés au premier calcul: les pages sans prédiction ne chargent pas pandas/numpy
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+# Ordre des colonnes attendu par le scaler et le modèle
+FEATURE_COLUMNS = ['Year', 'Month', 'nb_departures', 'monthly_recruitment_effect', 'nbemp']
+MONTHS = list(range(1, 13))
+MONTH_NAMES = [calendar.month_name[month] for month in MONTHS]
 
 def validate_inputs(start_year, end_year, recruitments, departures, initial_employees):
     """Valide les paramètres d'entrée"""
@@ -21,86 +35,133 @@ def validate_inputs(start_year, end_year, recruitments, departures, initial_empl
 
     return True, None
 
-def predict_salaries(start_year, end_year, recruitments, departures, initial_employees):
+def _per_year(values, n_years):
+    """Convertit une valeur scalaire ou une série annuelle en tableau (..., n_years)"""
+    arr = np.asarray(values, dtype=float)
+    if arr.ndim == 0:
+        arr = arr.reshape(1)
+    return np.broadcast_to(arr, arr.shape[:-1] + (n_years,))
+
+def headcount_trajectory(initial_employees, recruitments, departures):
+    """
+    Calcule l'effectif de début et de fin de chaque année de l'horizon
+    recruitments / departures: tableaux (..., n_years), initial_employees: (...)
+    Retourne: (start_employees, end_employees) de forme (..., n_years)
+    """
+    batch_shape = np.broadcast_shapes(np.shape(initial_employees), recruitments.shape[:-1], departures.shape[:-1])
+    n_years = recruitments.shape[-1]
+    net = np.broadcast_to(recruitments - departures, batch_shape + (n_years,))
+
+    start_employees = np.empty(batch_shape + (n_years,))
+    end_employees = np.empty(batch_shape + (n_years,))
+    current = np.broadcast_to(np.asarray(initial_employees, dtype=float), batch_shape)
+    for k in range(n_years):
+        start_employees[..., k] = current
+        # L'effectif de fin d'année ne peut pas être négatif
+        current = np.maximum(0, current + net[..., k])
+        end_employees[..., k] = current
+
+    return start_employees, end_employees
+
+def build_features(start_year, end_year, recruitments, departures, initial_employees):
+    """
+    Construit la matrice de features de tous les mois de l'horizon en une seule passe
+    Les paramètres peuvent être des scalaires ou des tableaux (..., n_years) pour
+    évaluer plusieurs scénarios à la fois.
+    Retourne: (features (..., n_months, n_features), month_employees (..., n_months), end_employees (..., n_years))
+    """
+    years = np.arange(start_year, end_year + 1)
+    n_years = len(years)
+
+    recruitments = _per_year(recruitments, n_years)
+    departures = _per_year(departures, n_years)
+    start_employees, end_employees = headcount_trajectory(initial_employees, recruitments, departures)
+    batch_shape = start_employees.shape[:-1]
+
+    monthly_recruitment = np.broadcast_to(recruitments / 12, start_employees.shape)
+    monthly_departures = np.broadcast_to(departures / 12, start_employees.shape)
+
+    # Effectif de chaque mois (jamais inférieur à 1)
+    elapsed = np.arange(12, dtype=float)
+    month_employees = start_employees[..., None] + (monthly_recruitment - monthly_departures)[..., None] * elapsed
+    month_employees = np.maximum(1, month_employees)
+
+    features = np.empty(batch_shape + (n_years, 12, len(FEATURE_COLUMNS)))
+    features[..., 0] = years[:, None]
+    features[..., 1] = MONTHS
+    features[..., 2] = monthly_departures[..., None]
+    features[..., 3] = monthly_recruitment[..., None]
+    features[..., 4] = month_employees
+
+    n_months = n_years * 12
+    return (features.reshape(batch_shape + (n_months, len(FEATURE_COLUMNS))),
+            month_employees.reshape(batch_shape + (n_months,)),
+            end_employees)
+
+def _predict_rows(rows, bundle):
+    """Prédit des lignes de features brutes avec le moteur adapté à la taille du lot"""
+    if bundle.use_compiled_engine(len(rows)):
+        # Tables d'arbres compilées: le scaler est intégré aux seuils
+        return bundle.compiled.predict(rows)
+
+    frame = pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+    return bundle.model.predict(bundle.scaler.transform(frame))
+
+def score_features(features, bundle=None):
+    """
+    Normalise et prédit toutes les lignes de features en un seul appel au modèle
+    bundle: artefacts à utiliser (par défaut le bundle courant, lu une seule fois)
+    Retourne les prédictions (positives) avec la forme features.shape[:-1]
+    """
+    bundle = bundle or get_bundle()
+    rows = features.reshape(-1, len(FEATURE_COLUMNS))
+
+    with model_stats.timed(bundle.model_name, len(rows)):
+        # Grands lots: ne prédire qu'une ligne par combinaison d'intervalles de seuils,
+        # les autres lignes de la même combinaison ont exactement la même prédiction
+        compiled = bundle.compiled
+        keys = compiled.bin_keys(rows) if compiled is not None and len(rows) > Config.COMPILED_ENGINE_MAX_ROWS else None
+        if keys is not None:
+            _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            predictions = _predict_rows(rows[first], bundle)[inverse]
+        else:
+            predictions = _predict_rows(rows, bundle)
+
+    # S'assurer que les prédictions sont positives
+    return np.maximum(0, predictions.astype(float)).reshape(features.shape[:-1])
+
+def _to_frames(start_year, end_year, monthly_salaries, month_employees, end_employees):
+    """Agrège les prédictions mensuelles d'un scénario en (monthly_df, yearly_df)"""
+    years = np.arange(start_year, end_year + 1)
+    n_years = len(years)
+    yearly_salaries = monthly_salaries.reshape(n_years, 12).sum(axis=1)
+
+    monthly_df = pd.DataFrame({
+        'Year': np.repeat(years, 12),
+        'Month': np.tile(MONTHS, n_years),
+        'Month_Name': np.tile(MONTH_NAMES, n_years),
+        'Predicted_Salary': np.round(monthly_salaries, 2),
+        'Employees': np.rint(month_employees).astype(int)
+    })
+    yearly_df = pd.DataFrame({
+        'Year': years,
+        'Total_Salary': np.round(yearly_salaries, 2),
+        'End_Employees': np.rint(end_employees).astype(int)
+    })
+    return monthly_df, yearly_df
+
+def predict_salaries(start_year, end_year, recruitments, departures, initial_employees, bundle=None):
     """
     Prédit la masse salariale pour chaque année
     Retourne: (monthly_df, yearly_df)
     """
     try:
-        model = get_model()
-        scaler = get_scaler()
-
-        if model is None or scaler is None:
-            raise ValueError("Modèle ou scaler non chargé")
-
-        monthly_predictions = []
-        yearly_predictions = []
-        current_employees = float(initial_employees)
-
-        for year in range(start_year, end_year + 1):
-            yearly_salary = 0
-            year_start_employees = current_employees
-
-            # Prédire pour chaque mois
-            for month in range(1, 13):
-                # Calcul de l'effectif du mois
-                monthly_recruitment = recruitments / 12
-                monthly_departures = departures / 12
-                month_employees = year_start_employees + (monthly_recruitment * (month - 1)) - (monthly_departures * (month - 1))
-
-                # Empêcher les effectifs négatifs
-                month_employees = max(1, month_employees)
-
-                # Préparer les features pour le modèle
-                input_data = {
-                    'Year': year,
-                    'Month': month,
-                    'nb_departures': monthly_departures,
-                    'monthly_recruitment_effect': monthly_recruitment,
-                    'nbemp': month_employees
-                }
-
-                df = pd.DataFrame([input_data])
-                df = df[['Year', 'Month', 'nb_departures', 'monthly_recruitment_effect', 'nbemp']]
-
-                # Normaliser et prédire
-                scaled_data = scaler.transform(df)
-                monthly_prediction = model.predict(scaled_data)[0]
-
-                # S'assurer que la prédiction est positive
-                monthly_prediction = max(0, monthly_prediction)
-
-                yearly_salary += monthly_prediction
-
-                # Stocker les données mensuelles
-                monthly_predictions.append({
-                    'Year': year,
-                    'Month': month,
-                    'Month_Name': pd.to_datetime(f'{year}-{month:02d}-01').strftime('%B'),
-                    'Predicted_Salary': round(monthly_prediction, 2),
-                    'Employees': int(round(month_employees))
-                })
-
-            # Calculer l'effectif de fin d'année
-            end_year_employees = year_start_employees + recruitments - departures
-            end_year_employees = max(0, end_year_employees)
-
-            # Stocker le résumé annuel
-            yearly_predictions.append({
-                'Year': year,
-                'Total_Salary': round(yearly_salary, 2),
-                'End_Employees': int(round(end_year_employees))
-            })
-
-            # Mettre à jour l'effectif pour l'année suivante
-            current_employees = end_year_employees
-
-            print(f"Année {year}: Masse salariale totale = {yearly_salary:,.2f} €, Effectif fin = {int(end_year_employees)}")
+        features, month_employees, end_employees = build_features(
+            start_year, end_year, recruitments, departures, initial_employees
+        )
+        monthly_salaries = score_features(features, bundle)
 
-        monthly_df = pd.DataFrame(monthly_predictions)
-        yearly_df = pd.DataFrame(yearly_predictions)
-
-        return monthly_df, yearly_df
+        return _to_frames(start_year, end_year, monthly_salaries, month_employees, end_employees)
 
     except Exception as e:
         print(f"Erreur dans predict_salaries: {e}")
@@ -108,8 +169,197 @@ def predict_salaries(start_year, end_year, recruitments, departures, initial_emp
         traceback.print_exc()
         raise
 
-def generate_graph(monthly_df):
-    """Génère le graphique mensuel de prédiction"""
+def iter_salary_blocks(start_year, end_year, recruitments, departures, initial_employees, bundle=None):
+    """
+    Prédit l'horizon par blocs d'années de taille croissante (1, 2, 4, ...)
+    Le premier bloc arrive vite quel que soit l'horizon, les suivants amortissent
+    le coût de chaque appel au modèle.
+    Génère: (monthly_df, yearly_df) de chaque bloc
+    """
+    # Tous les blocs sont prédits par le même bundle, même s'il est remplacé entre-temps
+    bundle = bundle or get_bundle()
+    features, month_employees, end_employees = build_features(
+        start_year, end_year, recruitments, departures, initial_employees
+    )
+    n_years = end_year - start_year + 1
+
+    first = 0
+    size = 1
+    while first < n_years:
+        last = min(n_years, first + size)
+        months = slice(first * 12, last * 12)
+        monthly_salaries = score_features(features[months], bundle)
+        yield _to_frames(start_year + first, start_year + last - 1, monthly_salaries,
+                         month_employees[months], end_employees[first:last])
+        first = last
+        size *= 2
+
+def _worker_bundle(bundle, version, model_name):
+    """Bundle fourni, sinon celui de la version et du modèle du processus parent (processus du pool)"""
+    if bundle is not None:
+        return bundle
+    if version is None:
+        return get_bundle().select(model_name)
+    return get_bundle_version(version, model_name)
+
+def predict_batch(scenarios, bundle=None, model_name=None, version=None):
+    """
+    Prédit plusieurs scénarios avec un seul appel au modèle
+    scenarios: liste de tuples (start_year, end_year, recruitments, departures, initial_employees)
+    model_name, version: modèle et version du bundle à utiliser si bundle n'est pas fourni
+    (processus du pool)
+    Retourne: liste de (monthly_df, yearly_df) dans l'ordre des scénarios
+    """
+    bundle = _worker_bundle(bundle, version, model_name)
+
+    # Regrouper les scénarios de même horizon pour construire leurs features ensemble
+    horizons = {}
+    for index, scenario in enumerate(scenarios):
+        horizons.setdefault((scenario[0], scenario[1]), []).append(index)
+
+    blocks = []
+    for (start_year, end_year), indexes in horizons.items():
+        params = np.array([scenarios[i][2:] for i in indexes], dtype=float)
+        features, month_employees, end_employees = build_features(
+            start_year, end_year, params[:, 0:1], params[:, 1:2], params[:, 2]
+        )
+        blocks.append((start_year, end_year, indexes, features, month_employees, end_employees))
+
+    # Empiler toutes les lignes mensuelles de tous les scénarios dans une seule matrice
+    rows = np.concatenate([block[3].reshape(-1, len(FEATURE_COLUMNS)) for block in blocks])
+    predictions = score_features(rows, bundle)
+
+    results = [None] * len(scenarios)
+    offset = 0
+    for start_year, end_year, indexes, features, month_employees, end_employees in blocks:
+        n_rows = features.shape[0] * features.shape[1]
+        monthly_salaries = predictions[offset:offset + n_rows].reshape(features.shape[:-1])
+        offset += n_rows
+        for row, index in enumerate(indexes):
+            results[index] = _to_frames(start_year, end_year, monthly_salaries[row],
+                                        month_employees[row], end_employees[row])
+
+    return results
+
+def predict_batch_parallel(scenarios, chunk_size, max_workers=None, bundle=None):
+    """
+    Répartit un grand lot de scénarios sur le pool de processus
+    Les petits lots sont calculés directement dans le processus courant.
+    """
+    bundle = bundle or get_bundle()
+    if len(scenarios) <= chunk_size or (max_workers or 0) == 1:
+        return predict_batch(scenarios, bundle)
+
+    # Les processus du pool chargent leur propre bundle: le nom du modèle et la version leur
+    # sont transmis pour qu'un remplacement du modèle en cours de lot ne mélange pas les versions
+    pool = get_process_pool(max_workers)
+    results = []
+    n_rows = sum((scenario[1] - scenario[0] + 1) * 12 for scenario in scenarios)
+    with model_stats.timed(bundle.model_name, n_rows):
+        for chunk_results in pool.map(partial(predict_batch, model_name=bundle.model_name, version=bundle.version),
+                                      split_chunks(scenarios, chunk_size)):
+            results.extend(chunk_results)
+    return results
+
+def _draw_paths(rng, mean, std, shape):
+    """Tire des trajectoires annuelles: loi de Poisson par défaut, normale tronquée si un écart-type est fourni"""
+    if std is None:
+        return rng.poisson(mean, size=shape).astype(float)
+    return np.maximum(0, rng.normal(mean, std, size=shape))
+
+def _simulate_chunk(start_year, end_year, recruitments, departures, initial_employees,
+                    n_samples, recruitments_std, departures_std, seed_sequence, bundle=None, model_name=None,
+                    version=None):
+    """
+    Simule un bloc de trajectoires et les score en un seul appel au modèle
+    Retourne: (monthly_salaries (n_samples, n_months), end_employees (n_samples, n_years))
+    """
+    rng = np.random.default_rng(seed_sequence)
+    n_years = end_year - start_year + 1
+    recruitment_paths = _draw_paths(rng, recruitments, recruitments_std, (n_samples, n_years))
+    departure_paths = _draw_paths(rng, departures, departures_std, (n_samples, n_years))
+
+    features, _, end_employees = build_features(start_year, end_year, recruitment_paths,
+                                                departure_paths, initial_employees)
+    return score_features(features, _worker_bundle(bundle, version, model_name)), end_employees
+
+def simulate_salaries(start_year, end_year, recruitments, departures, initial_employees,
+                      n_samples=1000, recruitments_std=None, departures_std=None, seed=None,
+                      quantiles=(10, 50, 90), chunk_size=500, max_workers=None, bundle=None):
+    """
+    Simulation Monte Carlo de la masse salariale (incertitude sur recrutements et départs)
+    Les tirages sont faits par blocs de chunk_size trajectoires, chacun avec sa propre
+    graine dérivée de seed: le résultat ne dépend pas du nombre de processus utilisés.
+    Retourne: dict avec les quantiles mensuels et annuels
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    sizes = [min(chunk_size, n_samples - start) for start in range(0, n_samples, chunk_size)]
+    chunks = [(start_year, end_year, recruitments, departures, initial_employees,
+               size, recruitments_std, departures_std, child)
+              for size, child in zip(sizes, seed_sequence.spawn(len(sizes)))]
+
+    bundle = bundle or get_bundle()
+    if len(chunks) > 1 and (max_workers or 0) != 1:
+        pool = get_process_pool(max_workers)
+        with model_stats.timed(bundle.model_name, n_samples * (end_year - start_year + 1) * 12):
+            results = list(pool.map(partial(_simulate_chunk, model_name=bundle.model_name, version=bundle.version),
+                                    *zip(*chunks)))
+    else:
+        results = [_simulate_chunk(*chunk, bundle=bundle) for chunk in chunks]
+
+    monthly_salaries = np.concatenate([monthly for monthly, _ in results])
+    end_employees = np.concatenate([employees for _, employees in results])
+
+    years = np.arange(start_year, end_year + 1)
+    yearly_salaries = monthly_salaries.reshape(n_samples, len(years), 12).sum(axis=2)
+
+    monthly_bands = np.percentile(monthly_salaries, quantiles, axis=0)
+    yearly_bands = np.percentile(yearly_salaries, quantiles, axis=0)
+    employee_bands = np.percentile(end_employees, quantiles, axis=0)
+    labels = [f'P{q:g}' for q in quantiles]
+
+    yearly = []
+    for i, year in enumerate(years):
+        record = {'Year': int(year)}
+        record.update({label: round(float(band[i]), 2) for label, band in zip(labels, yearly_bands)})
+        record.update({f'End_Employees_{label}': int(round(band[i])) for label, band in zip(labels, employee_bands)})
+        yearly.append(record)
+
+    monthly = []
+    for i in range(len(years) * 12):
+        record = {'Year': int(years[i // 12]), 'Month': i % 12 + 1}
+        record.update({label: round(float(band[i]), 2) for label, band in zip(labels, monthly_bands)})
+        monthly.append(record)
+
+    return {
+        'n_samples': n_samples,
+        'seed': seed_sequence.entropy,
+        'quantiles': labels,
+        'yearly': yearly,
+        'monthly': monthly
+    }
+
+def sensitivity_grid(start_year, end_year, recruitments_values, departures_values, initial_values, bundle=None):
+    """
+    Évalue toute la grille cartésienne initial_employees x recruitments x departures
+    avec une seule construction de features et un seul appel au modèle
+    Retourne: (yearly_salaries (nI, nR, nD, n_years), end_employees (nI, nR, nD, n_years))
+    """
+    initial, recruitments, departures = np.meshgrid(
+        np.asarray(initial_values, dtype=float),
+        np.asarray(recruitments_values, dtype=float),
+        np.asarray(departures_values, dtype=float),
+        indexing='ij'
+    )
+    features, _, end_employees = build_features(
+        start_year, end_year, recruitments[..., None], departures[..., None], initial
+    )
+    monthly_salaries = score_features(features, bundle)
+    yearly_salaries = monthly_salaries.reshape(monthly_salaries.shape[:-1] + (-1, 12)).sum(axis=-1)
+    return yearly_salaries, end_employees
+
+def generate_heatmap(matrix, recruitments_values, departures_values, title):
+    """Génère la carte de chaleur (recrutements x départs) de la masse salariale"""
     try:
         import matplotlib
         matplotlib.use('Agg')
@@ -117,47 +367,136 @@ def generate_graph(monthly_df):
         import io
         import base64
 
-        plt.figure(figsize=(14, 6))
-
-        # Créer les labels de l'axe X (format Année-Mois)
-        monthly_df['Period'] = monthly_df['Year'].astype(str) + '-' + monthly_df['Month'].astype(str).str.zfill(2)
-
-        # Tracer les prédictions mensuelles
-        plt.plot(range(len(monthly_df)),
-                 monthly_df['Predicted_Salary'],
-                 marker='o', linewidth=2, markersize=6,
-                 label='Masse Salariale Mensuelle', color='#4CAF50')
-
-        plt.xlabel('Période (Année-Mois)', fontsize=12)
-        plt.ylabel('Masse Salariale (€)', fontsize=12)
-        plt.title('Prédiction Mensuelle de la Masse Salariale', fontsize=14, fontweight='bold')
-        plt.grid(True, alpha=0.3, linestyle='--')
-        plt.legend(fontsize=10)
-
-        # Formater l'axe Y
-        ax = plt.gca()
-        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x:,.0f} €'))
+        fig, ax = plt.subplots(figsize=(10, 8))
+        image = ax.imshow(matrix, origin='lower', aspect='auto', cmap='viridis')
+        colorbar = fig.colorbar(image, ax=ax)
+        colorbar.ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x:,.0f} €'))
 
-        # Afficher moins de labels sur l'axe X (tous les 3 mois)
-        step = max(1, len(monthly_df) // 12)  # Ajuster selon le nombre de points
-        tick_positions = range(0, len(monthly_df), step)
-        tick_labels = [monthly_df['Period'].iloc[i] if i < len(monthly_df) else ''
-                       for i in tick_positions]
-        plt.xticks(tick_positions, tick_labels, rotation=45, ha='right', fontsize=9)
+        # Limiter le nombre de graduations sur chaque axe
+        for values, set_ticks, set_labels in ((departures_values, ax.set_xticks, ax.set_xticklabels),
+                                              (recruitments_values, ax.set_yticks, ax.set_yticklabels)):
+            step = max(1, len(values) // 10)
+            positions = range(0, len(values), step)
+            set_ticks(list(positions))
+            set_labels([f'{values[i]:g}' for i in positions], fontsize=9)
 
-        plt.tight_layout()
+        ax.set_xlabel('Départs par an', fontsize=12)
+        ax.set_ylabel('Recrutements par an', fontsize=12)
+        ax.set_title(title, fontsize=14, fontweight='bold')
+        fig.tight_layout()
 
         # Convertir en base64
         buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
+        fig.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
         buffer.seek(0)
-        graph_base64 = base64.b64encode(buffer.read()).decode()
-        plt.close()
+        heatmap_base64 = base64.b64encode(buffer.read()).decode()
+        plt.close(fig)
 
-        return f'data:image/png;base64,{graph_base64}'
+        return f'data:image/png;base64,{heatmap_base64}'
 
     except Exception as e:
-        print(f"Erreur génération graphique: {e}")
+        print(f"Erreur génération carte de chaleur: {e}")
         import traceback
         traceback.print_exc()
-        raise ValueError(f"Erreur graphique: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Erreur graphique: {str(e)}")
+
+def _schedule_fitness(yearly_salaries, end_employees, budget, total_budget):
+    """
+    Score des calendriers candidats: effectif final si le budget est respecté,
+    sinon pénalité proportionnelle au dépassement (toujours inférieure à un score faisable)
+    Retourne: (fitness, feasible)
+    """
+    if total_budget is not None:
+        overrun = np.maximum(0, yearly_salaries.sum(axis=-1) - total_budget) / total_budget
+    else:
+        overrun = (np.maximum(0, yearly_salaries - budget) / budget).sum(axis=-1)
+
+    feasible = overrun == 0
+    # Départager à effectif final égal par l'effectif cumulé sur l'horizon
+    headcount = end_employees[..., -1] + end_employees.sum(axis=-1) * 1e-6
+    return np.where(feasible, headcount, -1.0 - overrun), feasible
+
+def optimize_recruitments(start_year, end_year, departures, initial_employees, budget=None, total_budget=None,
+                          min_recruitments=0, max_recruitments=None, population=200, iterations=30,
+                          elite_fraction=0.1, seed=None, bundle=None):
+    """
+    Recherche le calendrier de recrutements annuels qui maximise l'effectif final
+    sous contrainte de budget (par année via budget, ou sur l'horizon via total_budget)
+    Méthode de l'entropie croisée: à chaque itération toute la population de
+    calendriers candidats est évaluée en un seul appel au modèle.
+    Retourne un dictionnaire sérialisable en JSON
+    """
+    started = time.perf_counter()
+    years = np.arange(start_year, end_year + 1)
+    n_years = len(years)
+
+    if max_recruitments is None:
+        max_recruitments = initial_employees
+    low = np.broadcast_to(np.asarray(min_recruitments, dtype=float), (n_years,))
+    high = np.broadcast_to(np.asarray(max_recruitments, dtype=float), (n_years,))
+    if budget is not None:
+        budget = np.broadcast_to(np.asarray(budget, dtype=float), (n_years,))
+
+    bundle = bundle or get_bundle()
+
+    def evaluate(candidates):
+        features, _, end_employees = build_features(start_year, end_year, candidates, departures, initial_employees)
+        monthly_salaries = score_features(features, bundle)
+        yearly_salaries = monthly_salaries.reshape(monthly_salaries.shape[:-1] + (n_years, 12)).sum(axis=-1)
+        fitness, feasible = _schedule_fitness(yearly_salaries, end_employees, budget, total_budget)
+        return fitness, feasible, yearly_salaries, end_employees
+
+    rng = np.random.default_rng(seed)
+    mean = (low + high) / 2
+    std = np.maximum((high - low) / 2, 1.0)
+    n_elite = max(2, int(population * elite_fraction))
+
+    best = None
+    evaluations = 0
+    iteration = 0
+    for iteration in range(1, iterations + 1):
+        candidates = np.clip(np.round(rng.normal(mean, std, size=(population, n_years))), low, high)
+        if iteration == 1:
+            # Bornes incluses dès la première itération (calendriers minimal et maximal)
+            candidates[0] = low
+            candidates[1] = high
+        elif best is not None:
+            candidates[0] = best[0]
+
+        fitness, feasible, yearly_salaries, end_employees = evaluate(candidates)
+        evaluations += population
+
+        top = int(np.argmax(fitness))
+        if best is None or fitness[top] > best[1]:
+            best = (candidates[top].copy(), fitness[top], feasible[top], yearly_salaries[top], end_employees[top])
+
+        # Resserrer la distribution autour des meilleurs candidats (avec lissage)
+        elite = candidates[np.argsort(fitness)[-n_elite:]]
+        mean = 0.3 * mean + 0.7 * elite.mean(axis=0)
+        std = 0.3 * std + 0.7 * elite.std(axis=0)
+        if (std < 0.5).all():
+            break
+
+    schedule, _, feasible, yearly_salaries, end_employees = best
+    yearly = []
+    for k, year in enumerate(years):
+        entry = {
+            'Year': int(year),
+            'Recruitments': int(schedule[k]),
+            'Total_Salary': round(float(yearly_salaries[k]), 2),
+            'End_Employees': int(end_employees[k])
+        }
+        if budget is not None:
+            entry['Budget'] = float(budget[k])
+        yearly.append(entry)
+
+    return {
+        'feasible': bool(feasible),
+        'recruitments': [int(r) for r in schedule],
+        'end_employees': int(end_employees[-1]),
+        'total_salary': round(float(yearly_salaries.sum()), 2),
+        'yearly': yearly,
+        'iterations': iteration,
+        'evaluations': evaluations,
+        'wall_time_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
@@ -1,22 +1,385 @@
-from flask import Blueprint, render_template, request, jsonify, current_app
-from app.prediction import predict_salaries, generate_graph, validate_inputs
-from app.model_loader import get_model, get_scaler, get_model_metrics
+from flask import Blueprint, render_template, request, jsonify, current_app, Response, stream_with_context, url_for, abort
+from app.prediction import (predict_salaries, predict_batch_parallel, simulate_salaries, sensitivity_grid,
+                            optimize_recruitments, iter_salary_blocks, generate_heatmap, validate_inputs)
+from app.model_loader import get_bundle, parse_model_split, route_model
+from app.model_stats import model_stats
+from app.scenario_cache import get_scenario_cache
+from app.rendering import get_graph_renderer, digest_from_url, GRAPH_FORMATS
 from flask_login import login_required, current_user
-import pandas as pd
-from app import db
-from app.models import PredictionHistory
+from app.startup import lazy_import
+from app.history_writer import get_history_writer, history_record
+from app.results_store import result_key, content_key, load_result
+from app.headcount import current_headcount
 import json
 
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
 
 
 # Créer le blueprint
 prediction_bp = Blueprint('prediction', __name__, url_prefix='/prediction')
 
+REQUIRED_FIELDS = ['start_year', 'end_year', 'recruitments', 'departures', 'initial_employees']
+
+def _parse_scenario(data):
+    """
+    Convertit et valide un scénario reçu en JSON
+    Retourne: (scenario, None) ou (None, message d'erreur)
+    """
+    if not isinstance(data, dict):
+        return None, 'Objet JSON attendu'
+    # Valider les champs requis
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in data or data[field] is None]
+    if missing_fields:
+        return None, f'Champs manquants: {", ".join(missing_fields)}'
+
+    # Convertir avec gestion d'erreur
+    try:
+        scenario = tuple(int(data[field]) for field in REQUIRED_FIELDS)
+    except (ValueError, TypeError) as ve:
+        current_app.logger.error(f"Erreur de conversion: {ve}")
+        return None, 'Valeurs numériques invalides'
+
+    # Validation métier
+    is_valid, error_msg = validate_inputs(*scenario)
+    if not is_valid:
+        return None, error_msg
+
+    return scenario, None
+
+def _parse_simulation(data):
+    """
+    Options de la simulation Monte Carlo (simulate=true)
+    Retourne: (options, None) ou (None, message d'erreur)
+    """
+    try:
+        n_samples = int(data.get('n_samples', 1000))
+        seed = int(data['seed']) if data.get('seed') is not None else None
+        recruitments_std = float(data['recruitments_std']) if data.get('recruitments_std') is not None else None
+        departures_std = float(data['departures_std']) if data.get('departures_std') is not None else None
+        quantiles = [float(q) for q in data.get('quantiles', [10, 50, 90])]
+    except (ValueError, TypeError):
+        return None, 'Paramètres de simulation invalides'
+
+    max_samples = current_app.config['SIMULATION_MAX_SAMPLES']
+    if not 1 <= n_samples <= max_samples:
+        return None, f"Nombre de tirages invalide (1-{max_samples})"
+
+    if seed is not None and seed < 0:
+        return None, "La graine doit être positive"
+
+    if (recruitments_std is not None and recruitments_std < 0) or (departures_std is not None and departures_std < 0):
+        return None, "Les écarts-types doivent être positifs"
+
+    if not quantiles or any(q < 0 or q > 100 for q in quantiles):
+        return None, "Quantiles invalides (0-100)"
+
+    return {
+        'n_samples': n_samples,
+        'seed': seed,
+        'recruitments_std': recruitments_std,
+        'departures_std': departures_std,
+        'quantiles': quantiles
+    }, None
+
+def _compute_simulation(scenario, options, bundle):
+    """Bandes de quantiles Monte Carlo d'un scénario"""
+    return simulate_salaries(
+        *scenario,
+        **options,
+        chunk_size=current_app.config['SIMULATION_CHUNK_SIZE'],
+        max_workers=current_app.config['PROCESS_POOL_WORKERS'],
+        bundle=bundle
+    )
+
+def _parse_axis(value, name):
+    """
+    Valeurs d'un axe de la grille de sensibilité
+    Accepte une liste de nombres ou une plage {"start", "stop", "step"} (stop inclus)
+    Retourne: (valeurs, None) ou (None, message d'erreur)
+    """
+    try:
+        if isinstance(value, dict):
+            start = int(value['start'])
+            stop = int(value['stop'])
+            step = int(value.get('step', 1))
+            if step <= 0 or stop < start:
+                return None, f'Plage invalide pour {name}'
+            values = list(range(start, stop + 1, step))
+        elif isinstance(value, list):
+            values = [int(v) for v in value]
+        else:
+            values = [int(value)]
+    except (KeyError, ValueError, TypeError):
+        return None, f'Valeurs invalides pour {name}'
+
+    if not values:
+        return None, f'Aucune valeur pour {name}'
+    return values, None
+
+def _parse_sensitivity(data):
+    """
+    Convertit et valide une demande de grille de sensibilité
+    Retourne: (grille, None) ou (None, message d'erreur)
+    """
+    if not isinstance(data, dict):
+        return None, 'Objet JSON attendu'
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in data or data[field] is None]
+    if missing_fields:
+        return None, f'Champs manquants: {", ".join(missing_fields)}'
+
+    try:
+        start_year = int(data['start_year'])
+        end_year = int(data['end_year'])
+    except (ValueError, TypeError):
+        return None, 'Valeurs numériques invalides'
+
+    axes = {}
+    for field in ('recruitments', 'departures', 'initial_employees'):
+        axes[field], error_msg = _parse_axis(data[field], field)
+        if error_msg:
+            return None, error_msg
+
+    n_cells = len(axes['recruitments']) * len(axes['departures']) * len(axes['initial_employees'])
+    max_cells = current_app.config['SENSITIVITY_MAX_CELLS']
+    if n_cells > max_cells:
+        return None, f'Grille trop grande: {n_cells} cellules (maximum {max_cells})'
+
+    # Les bornes de chaque axe suffisent à valider toute la grille
+    is_valid, error_msg = validate_inputs(
+        start_year, end_year,
+        min(axes['recruitments']), min(axes['departures']), min(axes['initial_employees'])
+    )
+    if not is_valid:
+        return None, error_msg
+
+    return {'start_year': start_year, 'end_year': end_year, **axes}, None
+
+def _compute_sensitivity(grid, include_heatmap, bundle):
+    """Masse salariale annuelle et effectif de fin d'année sur toute la grille"""
+    yearly_salaries, end_employees = sensitivity_grid(
+        grid['start_year'], grid['end_year'],
+        grid['recruitments'], grid['departures'], grid['initial_employees'],
+        bundle=bundle
+    )
+
+    grids = []
+    for i, initial_employees in enumerate(grid['initial_employees']):
+        for y, year in enumerate(range(grid['start_year'], grid['end_year'] + 1)):
+            entry = {
+                'initial_employees': initial_employees,
+                'year': year,
+                # Lignes: recrutements, colonnes: départs
+                'total_payroll': yearly_salaries[i, :, :, y].round(2).tolist(),
+                'end_employees': end_employees[i, :, :, y].astype(int).tolist()
+            }
+            if include_heatmap and year == grid['end_year']:
+                entry['heatmap'] = generate_heatmap(
+                    yearly_salaries[i, :, :, y], grid['recruitments'], grid['departures'],
+                    f'Masse salariale {year} (effectif initial {initial_employees})'
+                )
+            grids.append(entry)
+
+    return {
+        'start_year': grid['start_year'],
+        'end_year': grid['end_year'],
+        'recruitments': grid['recruitments'],
+        'departures': grid['departures'],
+        'initial_employees': grid['initial_employees'],
+        'grids': grids
+    }
+
+def _per_year_values(value, n_years, name):
+    """
+    Valeur unique ou liste d'une valeur par année de l'horizon
+    Retourne: (valeur ou liste, None) ou (None, message d'erreur)
+    """
+    try:
+        if isinstance(value, list):
+            if len(value) != n_years:
+                return None, f'{name}: {n_years} valeurs attendues (une par année)'
+            return [float(v) for v in value], None
+        return float(value), None
+    except (ValueError, TypeError):
+        return None, f'Valeurs invalides pour {name}'
+
+def _parse_optimization(data):
+    """
+    Convertit et valide une demande d'optimisation des recrutements
+    Retourne: (paramètres, None) ou (None, message d'erreur)
+    """
+    if not isinstance(data, dict):
+        return None, 'Objet JSON attendu'
+    required = ['start_year', 'end_year', 'departures', 'initial_employees']
+    missing_fields = [field for field in required if field not in data or data[field] is None]
+    if missing_fields:
+        return None, f'Champs manquants: {", ".join(missing_fields)}'
+
+    if (data.get('budget') is None) == (data.get('total_budget') is None):
+        return None, 'Indiquer soit budget (par année), soit total_budget (sur l\'horizon)'
+
+    try:
+        start_year = int(data['start_year'])
+        end_year = int(data['end_year'])
+        initial_employees = int(data['initial_employees'])
+        population = int(data.get('population', 200))
+        iterations = int(data.get('iterations', 30))
+        seed = int(data['seed']) if data.get('seed') is not None else None
+    except (ValueError, TypeError):
+        return None, 'Valeurs numériques invalides'
+
+    is_valid, error_msg = validate_inputs(start_year, end_year, 0, 0, initial_employees)
+    if not is_valid:
+        return None, error_msg
+    n_years = end_year - start_year + 1
+
+    params = {}
+    for field, default in (('departures', None), ('budget', None), ('total_budget', None),
+                           ('min_recruitments', 0), ('max_recruitments', initial_employees)):
+        value = data.get(field, default)
+        if value is None:
+            params[field] = None
+            continue
+        params[field], error_msg = _per_year_values(value, n_years, field)
+        if error_msg:
+            return None, error_msg
+
+    if params['total_budget'] is not None and isinstance(params['total_budget'], list):
+        return None, 'total_budget doit être une valeur unique'
+
+    if any(min(np.atleast_1d(params[field])) < 0 for field in ('departures', 'min_recruitments')):
+        return None, 'Les valeurs doivent être positives'
+
+    for field in ('budget', 'total_budget'):
+        if params[field] is not None and min(np.atleast_1d(params[field])) <= 0:
+            return None, 'Le budget doit être strictement positif'
+
+    if (np.atleast_1d(params['max_recruitments']) < np.atleast_1d(params['min_recruitments'])).any():
+        return None, 'max_recruitments doit être supérieur ou égal à min_recruitments'
+
+    max_population = current_app.config['OPTIMIZE_MAX_POPULATION']
+    max_iterations = current_app.config['OPTIMIZE_MAX_ITERATIONS']
+    if not 10 <= population <= max_population:
+        return None, f'Taille de population invalide (10-{max_population})'
+    if not 1 <= iterations <= max_iterations:
+        return None, f"Nombre d'itérations invalide (1-{max_iterations})"
+
+    if seed is not None and seed < 0:
+        return None, "La graine doit être positive"
+
+    return {
+        'start_year': start_year,
+        'end_year': end_year,
+        'initial_employees': initial_employees,
+        'population': population,
+        'iterations': iterations,
+        'seed': seed,
+        **params
+    }, None
+
+def _select_model(data, routing_inputs):
+    """
+    Modèle servant la requête: champ "model" explicite, sinon répartition A/B
+    (MODEL_AB_SPLIT, stable pour des entrées identiques), sinon modèle par défaut
+    Un seul bundle sert toute la requête, même s'il est remplacé entre-temps
+    Retourne: (bundle, None) ou (None, message d'erreur)
+    """
+    bundle = get_bundle()
+    model_name = data.get('model')
+    if model_name is not None and not isinstance(model_name, str):
+        return None, 'Nom de modèle invalide'
+
+    split = parse_model_split(current_app.config['MODEL_AB_SPLIT'])
+    routing_key = json.dumps(routing_inputs, sort_keys=True, default=str)
+    try:
+        return route_model(bundle, model_name, routing_key, split), None
+    except KeyError:
+        return None, f"Modèle inconnu: {model_name} (disponibles: {', '.join(bundle.models)})"
+
+def _metrics_payload(bundle):
+    """Métriques du modèle au format de la réponse JSON"""
+    try:
+        model_metrics = bundle.metrics
+        return {
+            'r2_score': round(model_metrics.get('r2', 0.0), 4),
+            'mse': round(model_metrics.get('mse', 0.0), 2)
+        }
+    except Exception as me:
+        current_app.logger.warning(f"Impossible de récupérer les métriques: {me}")
+        return {
+            'r2_score': 0.0,
+            'mse': 0.0
+        }
+
+def _graph_url(monthly_df):
+    """Lance le rendu du graphique mensuel et retourne son URL (adressée par le contenu)"""
+    digest = get_graph_renderer().submit(monthly_df)
+    return url_for('prediction.graph_image', digest=digest, fmt='png')
+
+def _graph_available(url):
+    """Le graphique d'un résultat réutilisé existe encore (le balayage du dossier a pu le supprimer)"""
+    digest = digest_from_url(url)
+    return digest is not None and get_graph_renderer().keep(digest)
+
+def _compute_forecast(scenario, bundle):
+    """Calcule les prédictions annuelles et le graphique mensuel d'un scénario"""
+    # Obtenir les prédictions (retourne DEUX dataframes)
+    monthly_df, yearly_df = predict_salaries(*scenario, bundle=bundle)
+
+    return {
+        # Convertir le dataframe annuel en liste de dictionnaires
+        'predictions': yearly_df.to_dict('records'),
+        # URL du graphique des données MENSUELLES (rendu en arrière-plan)
+        'graph': _graph_url(monthly_df)
+    }
+
+def _compute_response(scenario, simulation_options, bundle):
+    """Réponse de /predict: prévisions, graphique, métriques et simulation éventuelle"""
+    # Prédictions et graphique, mémorisés par scénario et version du modèle
+    cache = get_scenario_cache()
+    cache_key = cache.make_key('forecast', list(scenario), bundle.cache_version)
+    forecast = cache.get(cache_key)
+    if forecast is None or not _graph_available(forecast['graph']):
+        # Graphique supprimé: recalculé à la même adresse (même spécification, même URL)
+        forecast = _compute_forecast(scenario, bundle)
+        cache.set(cache_key, forecast)
+
+    # Construire la réponse JSON
+    response = {
+        'status': 'success',
+        'predictions': forecast['predictions'],
+        'graph': forecast['graph'],
+        'metrics': _metrics_payload(bundle),
+        'model': bundle.model_name,
+        'model_version': bundle.version
+    }
+
+    # Bandes d'incertitude (P10/P50/P90...) par simulation Monte Carlo
+    if simulation_options is not None:
+        if simulation_options['seed'] is None:
+            response['simulation'] = _compute_simulation(scenario, simulation_options, bundle)
+        else:
+            # Une simulation avec graine est reproductible: elle peut être mise en cache
+            simulation_key = cache.make_key('simulation', [list(scenario), simulation_options], bundle.cache_version)
+            response['simulation'] = cache.get_or_compute(
+                simulation_key, lambda: _compute_simulation(scenario, simulation_options, bundle)
+            )
+    return response
+
 @prediction_bp.route('/')
 @login_required
 def prediction_page():
-    """Page d'accueil avec le formulaire de prédiction"""
-    return render_template('prediction.html')
+    """Page d'accueil avec le formulaire de prédiction (effectif initial prérempli depuis la base)"""
+    return render_template('prediction.html', headcount=current_headcount())
+
+@prediction_bp.route('/headcount')
+@login_required
+def headcount():
+    """Effectif courant (table headcount_monthly), tous départements ou ?departement="""
+    current = current_headcount(request.args.get('departement'))
+    if current is None:
+        return jsonify({'status': 'error', 'message': 'Aucun effectif enregistré'}), 404
+    return jsonify({'status': 'success', **current})
 
 @prediction_bp.route('/predict', methods=['POST'])
 def predict():
@@ -34,86 +397,329 @@ def predict():
                 'message': 'Aucune donnée JSON reçue'
             }), 400
 
-        # Valider les champs requis
-        required_fields = ['start_year', 'end_year', 'recruitments', 'departures', 'initial_employees']
-        missing_fields = [field for field in required_fields if field not in data or data[field] is None]
+        scenario, error_msg = _parse_scenario(data)
+        if error_msg:
+            return jsonify({
+                'status': 'error',
+                'message': error_msg
+            }), 400
 
-        if missing_fields:
+        simulation_options = None
+        if data.get('simulate'):
+            simulation_options, error_msg = _parse_simulation(data)
+            if error_msg:
+                return jsonify({
+                    'status': 'error',
+                    'message': error_msg
+                }), 400
+
+        bundle, error_msg = _select_model(data, list(scenario))
+        if error_msg:
             return jsonify({
                 'status': 'error',
-                'message': f'Champs manquants: {", ".join(missing_fields)}'
+                'message': error_msg
             }), 400
 
-        # Convertir avec gestion d'erreur
+        # Résultat reproductible (sans simulation aléatoire): déjà stocké si le scénario est connu
+        reproducible = simulation_options is None or simulation_options['seed'] is not None
+        stored_key = result_key('predict', [list(scenario), simulation_options], bundle.cache_version) \
+            if reproducible else None
+        response = load_result(stored_key) if stored_key else None
+        if response is not None and not _graph_available(response.get('graph')):
+            response = None
+
+        if response is None:
+            response = _compute_response(scenario, simulation_options, bundle)
+
+        if current_user.is_authenticated:
+            # Écrit en différé par le thread d'historique: la réponse n'attend pas la base
+            get_history_writer().submit(history_record(
+                current_user.id, scenario, stored_key or content_key(response), bundle.version, response
+            ))
+
+        return jsonify(response), 200
+
+    except Exception as e:
+        current_app.logger.error(f"Erreur API: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'status': 'error',
+            'message': f'Erreur serveur: {str(e)}'
+        }), 500
+
+def _stream_event(event, payload, sse):
+    """Sérialise un événement du flux: ligne NDJSON ou message Server-Sent Events"""
+    data = json.dumps({'event': event, **payload})
+    if sse:
+        return f'event: {event}\ndata: {data}\n\n'
+    return data + '\n'
+
+@prediction_bp.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    """
+    Variante en flux de /predict: chaque année est émise dès qu'elle est prédite
+    Format NDJSON par défaut, Server-Sent Events si Accept: text/event-stream ou ?format=sse
+    Événements: year (une par année), graph, history (si connecté, ligne mise en file), done ou error
+    """
+    data = request.get_json(silent=True)
+
+    if not data:
+        return jsonify({
+            'status': 'error',
+            'message': 'Aucune donnée JSON reçue'
+        }), 400
+
+    scenario, error_msg = _parse_scenario(data)
+    if error_msg:
+        return jsonify({
+            'status': 'error',
+            'message': error_msg
+        }), 400
+
+    bundle, error_msg = _select_model(data, list(scenario))
+    if error_msg:
+        return jsonify({
+            'status': 'error',
+            'message': error_msg
+        }), 400
+
+    sse = request.args.get('format') == 'sse' or request.accept_mimetypes.best == 'text/event-stream'
+
+    def generate():
         try:
-            start_year = int(data['start_year'])
-            end_year = int(data['end_year'])
-            recruitments = int(data['recruitments'])
-            departures = int(data['departures'])
-            initial_employees = int(data['initial_employees'])
-        except (ValueError, TypeError) as ve:
-            current_app.logger.error(f"Erreur de conversion: {ve}")
+            monthly_frames = []
+            predictions_list = []
+            for monthly_df, yearly_df in iter_salary_blocks(*scenario, bundle=bundle):
+                monthly_frames.append(monthly_df)
+                for record in yearly_df.to_dict('records'):
+                    predictions_list.append(record)
+                    months = monthly_df[monthly_df['Year'] == record['Year']]
+                    yield _stream_event('year', {
+                        'year': record['Year'],
+                        'yearly': record,
+                        'monthly': months.to_dict('records')
+                    }, sse)
+
+            # Événements de fin: graphique, historique puis métriques
+            graph_url = _graph_url(pd.concat(monthly_frames, ignore_index=True))
+            yield _stream_event('graph', {'graph': graph_url}, sse)
+
+            # Le flux complet alimente aussi le cache de /predict
+            cache = get_scenario_cache()
+            cache.set(cache.make_key('forecast', list(scenario), bundle.cache_version),
+                      {'predictions': predictions_list, 'graph': graph_url})
+
+            metrics_data = _metrics_payload(bundle)
+
+            if current_user.is_authenticated:
+                # Même adresse que /predict sans simulation: le résultat est partagé
+                response = {
+                    'status': 'success',
+                    'predictions': predictions_list,
+                    'graph': graph_url,
+                    'metrics': metrics_data,
+                    'model': bundle.model_name,
+                    'model_version': bundle.version
+                }
+                get_history_writer().submit(history_record(
+                    current_user.id, scenario, result_key('predict', [list(scenario), None], bundle.cache_version),
+                    bundle.version, response
+                ))
+                yield _stream_event('history', {'queued': True}, sse)
+
+            yield _stream_event('done', {
+                'status': 'success',
+                'metrics': metrics_data,
+                'model': bundle.model_name,
+                'model_version': bundle.version
+            }, sse)
+
+        except Exception as e:
+            current_app.logger.error(f"Erreur API flux: {e}")
+            import traceback
+            traceback.print_exc()
+            yield _stream_event('error', {'status': 'error', 'message': f'Erreur serveur: {str(e)}'}, sse)
+
+    response = Response(stream_with_context(generate()),
+                        mimetype='text/event-stream' if sse else 'application/x-ndjson')
+    # Désactiver la mise en tampon des proxys (nginx) pour émettre chaque année aussitôt
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@prediction_bp.route('/batch', methods=['POST'])
+def predict_batch_route():
+    """
+    Prédit un lot de scénarios en un seul passage du modèle
+    Corps JSON: {"scenarios": [{...}, ...], "include_graph": false}
+    """
+    try:
+        data = request.get_json()
+
+        if not isinstance(data, dict) or not isinstance(data.get('scenarios'), list) or not data['scenarios']:
+            return jsonify({
+                'status': 'error',
+                'message': 'Liste de scénarios manquante'
+            }), 400
+
+        max_scenarios = current_app.config['BATCH_MAX_SCENARIOS']
+        if len(data['scenarios']) > max_scenarios:
             return jsonify({
                 'status': 'error',
-                'message': 'Valeurs numériques invalides'
+                'message': f'Maximum {max_scenarios} scénarios par lot'
             }), 400
 
-        # Validation métier
-        is_valid, error_msg = validate_inputs(start_year, end_year, recruitments, departures, initial_employees)
-        if not is_valid:
+        include_graph = bool(data.get('include_graph', False))
+
+        # Valider tous les scénarios avant de lancer le calcul
+        results = []
+        scenarios = []
+        for index, item in enumerate(data['scenarios']):
+            scenario, error_msg = _parse_scenario(item) if isinstance(item, dict) else (None, 'Scénario invalide')
+            if error_msg:
+                results.append({'index': index, 'status': 'error', 'message': error_msg})
+            else:
+                results.append({'index': index, 'status': 'success'})
+                scenarios.append((index, scenario))
+
+        bundle, error_msg = _select_model(data, data['scenarios'])
+        if error_msg:
             return jsonify({
                 'status': 'error',
                 'message': error_msg
             }), 400
 
-        # Obtenir les prédictions (retourne DEUX dataframes)
-        monthly_df, yearly_df = predict_salaries(start_year, end_year, recruitments, departures, initial_employees)
+        if scenarios:
+            predictions = predict_batch_parallel(
+                [scenario for _, scenario in scenarios],
+                chunk_size=current_app.config['BATCH_CHUNK_SIZE'],
+                max_workers=current_app.config['PROCESS_POOL_WORKERS'],
+                bundle=bundle
+            )
+            for (index, _), (monthly_df, yearly_df) in zip(scenarios, predictions):
+                results[index]['predictions'] = yearly_df.to_dict('records')
+                if include_graph:
+                    results[index]['graph'] = _graph_url(monthly_df)
 
-        # Générer le graphique à partir des données MENSUELLES
-        graph_base64 = generate_graph(monthly_df)
+        return jsonify({
+            'status': 'success',
+            'count': len(results),
+            'results': results,
+            'metrics': _metrics_payload(bundle),
+            'model': bundle.model_name,
+            'model_version': bundle.version
+        }), 200
 
-        # Obtenir les métriques du modèle
-        try:
-            model_metrics = get_model_metrics()
-            metrics_data = {
-                'r2_score': round(model_metrics.get('r2', 0.0), 4),
-                'mse': round(model_metrics.get('mse', 0.0), 2)
-            }
-        except Exception as me:
-            current_app.logger.warning(f"Impossible de récupérer les métriques: {me}")
-            metrics_data = {
-                'r2_score': 0.0,
-                'mse': 0.0
-            }
+    except Exception as e:
+        current_app.logger.error(f"Erreur API batch: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'status': 'error',
+            'message': f'Erreur serveur: {str(e)}'
+        }), 500
 
-        # Convertir le dataframe annuel en liste de dictionnaires
-        predictions_list = yearly_df.to_dict('records')
+@prediction_bp.route('/sensitivity', methods=['POST'])
+def sensitivity():
+    """
+    Grille de sensibilité de la masse salariale aux recrutements et aux départs
+    Corps JSON: {"start_year", "end_year",
+                 "recruitments": {"start", "stop", "step"} ou [...],
+                 "departures": {"start", "stop", "step"} ou [...],
+                 "initial_employees": nombre, plage ou liste,
+                 "include_heatmap": false}
+    """
+    try:
+        data = request.get_json()
 
-        # Construire la réponse JSON
-        response = {
+        if not data:
+            return jsonify({
+                'status': 'error',
+                'message': 'Aucune donnée JSON reçue'
+            }), 400
+
+        grid, error_msg = _parse_sensitivity(data)
+        if error_msg:
+            return jsonify({
+                'status': 'error',
+                'message': error_msg
+            }), 400
+
+        include_heatmap = bool(data.get('include_heatmap', False))
+
+        bundle, error_msg = _select_model(data, grid)
+        if error_msg:
+            return jsonify({
+                'status': 'error',
+                'message': error_msg
+            }), 400
+
+        cache = get_scenario_cache()
+        cache_key = cache.make_key('sensitivity', [grid, include_heatmap], bundle.cache_version)
+        result = cache.get_or_compute(cache_key, lambda: _compute_sensitivity(grid, include_heatmap, bundle))
+
+        return jsonify({
             'status': 'success',
-            'predictions': predictions_list,
-            'graph': graph_base64,
-            'metrics': metrics_data
-        }
+            **result,
+            'metrics': _metrics_payload(bundle),
+            'model': bundle.model_name,
+            'model_version': bundle.version
+        }), 200
 
-        if current_user.is_authenticated:
-            history = PredictionHistory(
-                user_id=current_user.id,
-                start_year=start_year,
-                end_year=end_year,
-                recruitments=recruitments,
-                departures=departures,
-                initial_employees=initial_employees,
-                result_json=json.dumps(response)
-            )
-            db.session.add(history)
-            db.session.commit()
+    except Exception as e:
+        current_app.logger.error(f"Erreur API sensibilité: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'status': 'error',
+            'message': f'Erreur serveur: {str(e)}'
+        }), 500
 
-        return jsonify(response), 200
+@prediction_bp.route('/optimize', methods=['POST'])
+def optimize():
+    """
+    Recherche le calendrier de recrutements annuels qui maximise l'effectif sous budget
+    Corps JSON: {"start_year", "end_year", "departures", "initial_employees",
+                 "budget": valeur ou liste par année | "total_budget": valeur,
+                 "min_recruitments", "max_recruitments" (valeur ou liste par année),
+                 "population": 200, "iterations": 30, "seed": null}
+    """
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({
+                'status': 'error',
+                'message': 'Aucune donnée JSON reçue'
+            }), 400
+
+        params, error_msg = _parse_optimization(data)
+        if error_msg:
+            return jsonify({
+                'status': 'error',
+                'message': error_msg
+            }), 400
+
+        bundle, error_msg = _select_model(data, params)
+        if error_msg:
+            return jsonify({
+                'status': 'error',
+                'message': error_msg
+            }), 400
+
+        result = optimize_recruitments(**params, bundle=bundle)
+
+        return jsonify({
+            'status': 'success',
+            **result,
+            'metrics': _metrics_payload(bundle),
+            'model': bundle.model_name,
+            'model_version': bundle.version
+        }), 200
 
     except Exception as e:
-        current_app.logger.error(f"Erreur API: {e}")
+        current_app.logger.error(f"Erreur API optimisation: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({
@@ -121,6 +727,26 @@ def predict():
             'message': f'Erreur serveur: {str(e)}'
         }), 500
 
+@prediction_bp.route('/graph/<digest>.<fmt>')
+def graph_image(digest, fmt):
+    """
+    Image d'un graphique adressée par le contenu (PNG ou SVG)
+    Le contenu d'une URL ne change jamais: ETag et cache navigateur longue durée
+    """
+    if fmt not in GRAPH_FORMATS or len(digest) != 32 or any(c not in '0123456789abcdef' for c in digest):
+        abort(404)
+
+    image = get_graph_renderer().get(digest, fmt)
+    if image is None:
+        abort(404)
+
+    response = Response(image, mimetype=GRAPH_FORMATS[fmt])
+    response.set_etag(f'{digest}-{fmt}')
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
 @prediction_bp.route('/api/predict', methods=['POST'])
 def api_predict():
     """Endpoint API alternatif (identique à /predict)"""
@@ -130,19 +756,27 @@ def api_predict():
 def health():
     """Endpoint de vérification de santé de l'API"""
     try:
-        model = get_model()
-        scaler = get_scaler()
-        model_loaded = model is not None and scaler is not None
+        bundle = get_bundle()
+        model_loaded = (bundle.model is not None or bundle.compiled is not None) and bundle.scaler is not None
+        compiled = bundle.compiled
 
         response = {
             'status': 'ok',
             'message': 'API opérationnelle',
-            'model_loaded': model_loaded
+            'model_loaded': model_loaded,
+            'model': bundle.model_name,
+            'models': list(bundle.models),
+            'model_version': bundle.version,
+            'loaded_at': bundle.loaded_at,
+            'engine': _engine_name(bundle)
         }
 
+        if compiled is not None:
+            response['compiled_report'] = compiled.metadata.get('report')
+
         if model_loaded:
             try:
-                model_metrics = get_model_metrics()
+                model_metrics = bundle.metrics
                 response['metrics'] = {
                     'r2_score': round(model_metrics.get('r2', 0.0), 4),
                     'mse': round(model_metrics.get('mse', 0.0), 2)
@@ -159,13 +793,58 @@ def health():
             'message': str(e)
         }), 500
 
+def _engine_name(bundle):
+    """Moteur d'inférence principal d'un modèle: 'compiled', 'booster' ou 'linear'"""
+    if bundle.family == 'linear':
+        return 'linear'
+    return 'compiled' if bundle.compiled is not None else 'booster'
+
+@prediction_bp.route('/models', methods=['GET'])
+def models_route():
+    """
+    Modèles servis côte à côte: famille, moteur, métriques mesurées à l'entraînement
+    (jeu de test, pas de précision en service) et compteurs de service
+    (appels, lignes, erreurs, latence) depuis le démarrage
+    """
+    try:
+        bundle = get_bundle()
+        stats = model_stats.snapshot()
+        models = []
+        for name in bundle.models:
+            view = bundle.select(name)
+            models.append({
+                'name': name,
+                'family': view.family,
+                'engine': _engine_name(view),
+                'default': name == bundle.default_model,
+                'training_metrics': _metrics_payload(view),
+                'stats': stats.get(name)
+            })
+
+        return jsonify({
+            'status': 'success',
+            'model_version': bundle.version,
+            'default_model': bundle.default_model,
+            'split': [{'model': name, 'weight': weight}
+                      for name, weight in parse_model_split(current_app.config['MODEL_AB_SPLIT'])],
+            'models': models
+        }), 200
+    except Exception as e:
+        current_app.logger.error(f"Erreur liste des modèles: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
 @prediction_bp.route('/metrics', methods=['GET'])
 def get_metrics_route():
     """Obtenir les métriques du modèle"""
     try:
-        model_metrics = get_model_metrics()
+        bundle = get_bundle()
+        model_metrics = bundle.metrics
         return jsonify({
             'status': 'success',
+            'model_version': bundle.version,
             'metrics': {
                 'r2_score': round(model_metrics.get('r2', 0.0), 4),
                 'mse': round(model_metrics.get('mse', 0.0), 2)
@@ -176,4 +855,35 @@ def get_metrics_route():
         return jsonify({
             'status': 'error',
             'message': str(e)
-        }), 500
\ No newline at end of file
+        }), 500
+
+@prediction_bp.route('/cache', methods=['GET'])
+def cache_stats():
+    """Compteurs du cache de scénarios (hits mémoire/disque, misses, taille)"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'model_version': get_bundle().version,
+            'cache': get_scenario_cache().stats()
+        }), 200
+    except Exception as e:
+        current_app.logger.error(f"Erreur statistiques cache: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@prediction_bp.route('/history/queue', methods=['GET'])
+def history_queue_stats():
+    """File d'écriture de l'historique: profondeur, lignes écrites, contre-pression, durée des écritures"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'history_queue': get_history_writer().stats()
+        }), 200
+    except Exception as e:
+        current_app.logger.error(f"Erreur statistiques historique: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
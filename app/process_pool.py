@@ -0,0 +1,38 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Pool de processus partagé pour les calculs lourds (lots de scénarios, simulations)
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+def get_process_pool(max_workers=None):
+    """Retourne le pool de processus partagé (créé au premier appel)"""
+    global _pool, _pool_workers
+    max_workers = max_workers or os.cpu_count() or 1
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # 'spawn' évite de dupliquer les threads et connexions du serveur
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = max_workers
+        return _pool
+
+def split_chunks(items, chunk_size):
+    """Découpe une liste en morceaux de taille chunk_size"""
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+def shutdown_process_pool():
+    """Arrête le pool de processus (appelé à la fermeture du serveur)"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+            _pool_workers = None
+
+atexit.register(shutdown_process_pool)
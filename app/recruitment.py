@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from app import db
-from app.models import Recruitment, Employee
+from app.models import Recruitment
 from flask_login import login_required
 from datetime import datetime
 
@@ -31,5 +31,5 @@ def add_recruitment():
         flash('Recrutement ajouté avec succès!', 'success')
         return redirect(url_for('recruitment.list_recruitments'))
 
-    employees = Employee.query.all()
-    return render_template('recruitment/add.html', employees=employees)
\ No newline at end of file
+    # Employé choisi par autocomplétion (/employees/lookup, static/js/employee_lookup.js)
+    return render_template('recruitment/add.html')
\ No newline at end of file
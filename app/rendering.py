@@ -0,0 +1,291 @@
+import atexit
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+
+# Formats d'image servis par /prediction/graph/<hash>.<format>
+# 'thumb': vignette PNG basse résolution (liste de l'historique)
+GRAPH_FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml', 'thumb': 'image/png'}
+
+# À incrémenter quand le dessin change: les anciennes URLs ne sont plus réutilisées
+RENDER_VERSION = 1
+
+# Balayage du dossier après chaque écriture de cette fraction de la taille maximale;
+# il redescend alors à SWEEP_TARGET de la taille maximale (pas un balayage par graphique)
+SWEEP_EVERY = 0.1
+SWEEP_TARGET = 0.9
+
+# Gabarit de figure propre à chaque processus de rendu: (fig, ax, line)
+_template = None
+
+def _monthly_template():
+    """Crée une seule fois la figure du graphique mensuel (axes, titres, légende)"""
+    global _template
+    if _template is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots(figsize=(14, 6))
+        line, = ax.plot([], [], marker='o', linewidth=2, markersize=6,
+                        label='Masse Salariale Mensuelle', color='#4CAF50')
+
+        ax.set_xlabel('Période (Année-Mois)', fontsize=12)
+        ax.set_ylabel('Masse Salariale (€)', fontsize=12)
+        ax.set_title('Prédiction Mensuelle de la Masse Salariale', fontsize=14, fontweight='bold')
+        ax.grid(True, alpha=0.3, linestyle='--')
+        ax.legend(fontsize=10)
+
+        # Formater l'axe Y
+        ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x:,.0f} €'))
+        _template = (fig, ax, line)
+    return _template
+
+def _init_renderer():
+    """Initialisation d'un processus de rendu: matplotlib chargé avant la première requête"""
+    _monthly_template()
+
+def render_monthly_graph(spec, fmt):
+    """Dessine le graphique mensuel d'une spécification {periods, salaries} au format demandé"""
+    fig, ax, line = _monthly_template()
+    periods = spec['periods']
+
+    line.set_data(range(len(periods)), spec['salaries'])
+    ax.relim()
+    ax.autoscale_view()
+
+    # Afficher moins de labels sur l'axe X (une douzaine au maximum)
+    step = max(1, len(periods) // 12)
+    tick_positions = list(range(0, len(periods), step))
+    ax.set_xticks(tick_positions)
+    ax.set_xticklabels([periods[i] for i in tick_positions], rotation=45, ha='right', fontsize=9)
+
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    # Sans date dans les métadonnées: même spécification, même fichier
+    if fmt == 'thumb':
+        fig.savefig(buffer, format='png', dpi=24, bbox_inches='tight')
+    else:
+        fig.savefig(buffer, format=fmt, dpi=100, bbox_inches='tight',
+                    metadata={'Date': None} if fmt == 'svg' else None)
+    return buffer.getvalue()
+
+def monthly_graph_spec(monthly_df):
+    """Données du graphique mensuel (sans modifier monthly_df)"""
+    periods = monthly_df['Year'].astype(str) + '-' + monthly_df['Month'].astype(str).str.zfill(2)
+    return {
+        'kind': 'monthly',
+        'version': RENDER_VERSION,
+        'periods': periods.tolist(),
+        'salaries': [round(float(s), 2) for s in monthly_df['Predicted_Salary']]
+    }
+
+def digest_from_url(url):
+    """Hash d'un graphique à partir de son URL /prediction/graph/<hash>.<format>, ou None"""
+    match = re.search(r'/graph/([0-9a-f]{32})\.', url or '')
+    return match.group(1) if match else None
+
+def spec_digest(spec):
+    """Adresse de contenu d'un graphique: hash de sa spécification"""
+    payload = json.dumps(spec, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class GraphRenderer:
+    """
+    Rendu des graphiques hors du cycle de la requête
+    - pool de processus de rendu persistants (matplotlib chargé, figure réutilisée)
+    - fichiers adressés par le contenu: {hash}.json (spécification), {hash}.png / {hash}.svg
+    - dossier borné à max_bytes (0 = sans limite): les graphiques les moins récemment
+      utilisés sont supprimés, tous formats ensemble
+    Le PNG est lancé dès submit() s'il n'existe pas encore; les autres formats sont rendus à la demande.
+    """
+
+    def __init__(self, graph_dir, workers=2, max_bytes=0):
+        self.graph_dir = graph_dir
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self._pool = None
+        self._pending = {}
+        self._written = 0
+        self._lock = threading.Lock()
+        # Rendu dans le processus du serveur (workers=0): la figure partagée impose un verrou
+        self._inline_lock = threading.Lock()
+
+        os.makedirs(graph_dir, exist_ok=True)
+
+    def submit(self, monthly_df):
+        """Enregistre la spécification, lance le rendu PNG et retourne le hash du graphique"""
+        spec = monthly_graph_spec(monthly_df)
+        digest = spec_digest(spec)
+
+        if not self.keep(digest):
+            self._write(digest, 'json', json.dumps(spec).encode('utf-8'))
+
+        # PNG déjà rendu (même scénario, cache vidé ou autre worker): pas de nouveau rendu
+        if self.workers > 0 and not os.path.exists(self._path(digest, 'png')):
+            self._render_async(digest, 'png', spec)
+        return digest
+
+    def keep(self, digest):
+        """
+        Marque un graphique comme utilisé (date de modification de sa spécification)
+        Retourne False s'il est inconnu ou a été supprimé par le balayage
+        """
+        try:
+            os.utime(self._path(digest, 'json'))
+            return True
+        except OSError:
+            return False
+
+    def get(self, digest, fmt):
+        """Retourne l'image (bytes) ou None si le graphique est inconnu"""
+        path = self._path(digest, fmt)
+        try:
+            with open(path, 'rb') as f:
+                image = f.read()
+            self.keep(digest)
+            return image
+        except OSError:
+            pass
+
+        try:
+            with open(self._path(digest, 'json'), 'r', encoding='utf-8') as f:
+                spec = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self.workers > 0:
+            return self._render_async(digest, fmt, spec).result()
+
+        with self._inline_lock:
+            image = render_monthly_graph(spec, fmt)
+        self._write(digest, fmt, image)
+        return image
+
+    def sweep(self):
+        """
+        Supprime les graphiques les moins récemment utilisés jusqu'à SWEEP_TARGET de max_bytes
+        Retourne le nombre de graphiques supprimés
+        """
+        if self.max_bytes <= 0:
+            return 0
+
+        # Par graphique: taille de tous ses fichiers et dernière utilisation
+        graphs, total = {}, 0
+        for entry in os.scandir(self.graph_dir):
+            digest, _, ext = entry.name.partition('.')
+            if ext == 'tmp':
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            size, used = graphs.get(digest, (0, 0.0))
+            graphs[digest] = (size + stat.st_size, max(used, stat.st_mtime))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return 0
+
+        with self._lock:
+            rendering = {digest for digest, _ in self._pending}
+        removed = 0
+        for digest, (size, _) in sorted(graphs.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes * SWEEP_TARGET:
+                break
+            if digest in rendering:
+                continue
+            for ext in ('json', *GRAPH_FORMATS):
+                try:
+                    os.remove(self._path(digest, ext))
+                except OSError:
+                    pass
+            total -= size
+            removed += 1
+        return removed
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def _render_async(self, digest, fmt, spec):
+        """Futur du rendu (partagé si le même graphique est déjà en cours)"""
+        key = (digest, fmt)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            if self._pool is None:
+                # 'spawn' évite de dupliquer les threads et connexions du serveur
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_renderer)
+            future = self._pool.submit(render_monthly_graph, spec, fmt)
+            self._pending[key] = future
+
+        def store(done):
+            try:
+                self._write(digest, fmt, done.result())
+            except Exception as e:
+                print(f"Erreur génération graphique: {e}")
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+
+        future.add_done_callback(store)
+        return future
+
+    def _path(self, digest, ext):
+        return os.path.join(self.graph_dir, f'{digest}.{ext}')
+
+    def _write(self, digest, ext, content):
+        # Écriture atomique: fichier temporaire puis renommage
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.graph_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, self._path(digest, ext))
+        except OSError as e:
+            print(f"Erreur écriture graphique: {e}")
+            return
+
+        with self._lock:
+            self._written += len(content)
+            due = self.max_bytes > 0 and self._written >= self.max_bytes * SWEEP_EVERY
+            if due:
+                self._written = 0
+        if due:
+            self.sweep()
+
+
+_graph_renderer = None
+_graph_renderer_lock = threading.Lock()
+
+def get_graph_renderer():
+    """Retourne le moteur de rendu configuré pour l'application courante"""
+    global _graph_renderer
+    with _graph_renderer_lock:
+        if _graph_renderer is None:
+            config = current_app.config
+            graph_dir = config.get('GRAPH_DIR') or os.path.join(current_app.instance_path, 'graphs')
+            _graph_renderer = GraphRenderer(graph_dir, workers=config['RENDER_POOL_WORKERS'],
+                                            max_bytes=config['GRAPH_DIR_MAX_MB'] * 1024 * 1024)
+        return _graph_renderer
+
+def shutdown_graph_renderer():
+    """Arrête les processus de rendu (appelé à la fermeture du serveur)"""
+    if _graph_renderer is not None:
+        _graph_renderer.shutdown()
+
+atexit.register(shutdown_graph_renderer)
@@ -0,0 +1,53 @@
+import hashlib
+import json
+import zlib
+
+from app.models import PredictionResult
+
+# Niveau de compression zlib des résultats stockés
+COMPRESSION_LEVEL = 6
+
+
+def result_key(kind, inputs, model_version):
+    """Adresse d'un résultat reproductible: hash du type, des entrées et de la version du modèle"""
+    payload = json.dumps({'kind': kind, 'inputs': inputs, 'model_version': model_version},
+                         sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def content_key(payload):
+    """Adresse d'un résultat non reproductible (simulation sans graine, ancien format): hash du contenu"""
+    return hashlib.sha256(_dumps(payload)).hexdigest()
+
+def strip_images(payload):
+    """Retire les images encodées en base64 (data:image/...) d'un résultat"""
+    if isinstance(payload, dict):
+        return {key: strip_images(value) for key, value in payload.items()
+                if not (isinstance(value, str) and value.startswith('data:image/'))}
+    if isinstance(payload, list):
+        return [strip_images(value) for value in payload]
+    return payload
+
+def summarize(payload, start_year, end_year):
+    """Colonnes de résumé de l'historique: masse salariale totale, horizon, effectif final"""
+    predictions = payload.get('predictions') or []
+    return {
+        'total_payroll': round(sum(float(p.get('Total_Salary') or 0) for p in predictions), 2) if predictions else None,
+        'horizon_years': len(predictions) or end_year - start_year + 1,
+        'end_employees': predictions[-1].get('End_Employees') if predictions else None
+    }
+
+def _dumps(payload):
+    return json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+
+def encode_payload(payload):
+    """JSON compact puis zlib; retourne (octets compressés, taille non compressée)"""
+    raw = _dumps(payload)
+    return zlib.compress(raw, COMPRESSION_LEVEL), len(raw)
+
+def decode_payload(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+def load_result(key):
+    """Résultat déjà stocké pour cette adresse, ou None"""
+    stored = PredictionResult.query.filter_by(result_key=key).first()
+    return stored.to_dict() if stored is not None else None
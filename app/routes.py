@@ -1,74 +1,202 @@
-from flask import Blueprint, request, jsonify
+import hashlib
+
+from flask import Blueprint, Response, request, jsonify
+from flask_login import current_user
 from app.models import db, Employee
+from app.employees import parse_employee, filter_employees
+from app.exports import json_value
+from app.table_versions import table_version
 from datetime import datetime
 
-employees_bp = Blueprint('employees', __name__, url_prefix='/api/employees')
-
-# GET tous les employés
+employees_bp = Blueprint('employees_api', __name__, url_prefix='/api/employees')
+
+# Taille de page par défaut et maximale de la liste
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+# Matricules demandés au plus par requête groupée (?matricules=)
+API_MAX_BULK = 1000
+
+# Champs exposés par l'API (sans les colonnes dérivées internes)
+API_FIELDS = ('matricule', 'first_name', 'last_name', 'birth_date', 'position', 'salary',
+              'departement', 'indemnite1', 'indemnite2', 'date_joined', 'date_left')
+
+
+@employees_bp.before_request
+def require_login():
+    if not current_user.is_authenticated:
+        return jsonify({'status': 'error', 'message': 'Authentification requise'}), 401
+
+@employees_bp.errorhandler(ValueError)
+def invalid_request(e):
+    return jsonify({'status': 'error', 'message': str(e)}), 400
+
+
+def _parse_fields(value):
+    """Projection ?fields=a,b: colonnes lues en base; le matricule est toujours inclus"""
+    if not value:
+        return list(API_FIELDS)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in API_FIELDS]
+    if unknown:
+        raise ValueError(f"Champs inconnus: {', '.join(unknown)} ({', '.join(API_FIELDS)})")
+    return ['matricule'] + [field for field in fields if field != 'matricule']
+
+def _parse_matricules(value):
+    try:
+        matricules = sorted({int(item) for item in value.split(',') if item.strip()})
+    except ValueError:
+        raise ValueError("matricules: liste d'entiers séparés par des virgules attendue")
+    if len(matricules) > API_MAX_BULK:
+        raise ValueError(f"matricules: {API_MAX_BULK} au plus par requête")
+    return matricules
+
+def _rows(query, fields):
+    return [{field: json_value(value) for field, value in zip(fields, row)} for row in query]
+
+def _employee_json(employee):
+    return {field: json_value(getattr(employee, field)) for field in API_FIELDS}
+
+def _etag(version):
+    """ETag d'une réponse: compteur de la table + requête (chemin et paramètres)"""
+    digest = hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:16]
+    return f'employees-{version}-{digest}'
+
+def _conditional(build):
+    """
+    Réponse conditionnelle (If-None-Match): 304 sans requête sur les employés
+    si la table n'a pas changé depuis l'ETag du client
+    Le compteur est lu avant les données: au pire le client relit une réponse inchangée
+    """
+    etag = _etag(table_version('employees'))
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def _json_body():
+    """Corps JSON de la requête: un objet attendu"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValueError('Corps JSON (objet) attendu')
+    return data
+
+def _parse_date_left(value):
+    """Date de départ 'AAAA-MM-JJ' d'un corps JSON (None ou '' -> pas de date)"""
+    if value is None or value == '':
+        return None
+    try:
+        if not isinstance(value, str):
+            raise TypeError
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError("date_left: date AAAA-MM-JJ attendue")
+
+def _apply_fields(employee, data, fields):
+    """
+    Valide les champs fournis (règles du formulaire d'ajout) et les reporte sur l'employé
+    date_left (hors formulaire d'ajout) est validée à part; null la retire
+    """
+    date_left = _parse_date_left(data['date_left']) if 'date_left' in fields else None
+    merged = {key: '' if value is None else str(value) for key, value in {**_employee_json(employee), **data}.items()}
+    values = parse_employee(merged)
+    for field in fields:
+        if field in values and field != 'matricule':
+            setattr(employee, field, values[field])
+    if 'date_left' in fields:
+        employee.date_left = date_left
+
+
+# GET les employés: page par clé (?after=&limit=), filtres, projection (?fields=)
+# ou groupe de matricules (?matricules=1,2,3) en une requête
 @employees_bp.route('', methods=['GET'])
 def get_employees():
-    employees = Employee.query.all()
-    return jsonify([emp.to_dict() for emp in employees]), 200
+    fields = _parse_fields(request.args.get('fields'))
+    columns = [getattr(Employee, field) for field in fields]
+
+    if request.args.get('matricules') is not None:
+        matricules = _parse_matricules(request.args['matricules'])
+
+        def build():
+            employees = _rows(db.session.query(*columns).filter(Employee.matricule.in_(matricules))
+                              .order_by(Employee.matricule), fields)
+            found = {employee['matricule'] for employee in employees}
+            return jsonify({'status': 'success', 'employees': employees,
+                            'missing': [matricule for matricule in matricules if matricule not in found]})
+        return _conditional(build)
+
+    limit = min(max(request.args.get('limit', API_PAGE_SIZE, type=int), 1), API_MAX_PAGE_SIZE)
+    after = request.args.get('after', type=int)
+    year = request.args.get('year', type=int)
+
+    def build():
+        query = filter_employees(db.session.query(*columns), request.args.get('departement'),
+                                 request.args.get('status'), year)
+        if after is not None:
+            query = query.filter(Employee.matricule > after)
+        employees = _rows(query.order_by(Employee.matricule).limit(limit + 1), fields)
+        has_next = len(employees) > limit
+        employees = employees[:limit]
+        return jsonify({'status': 'success', 'employees': employees,
+                        'next_cursor': employees[-1]['matricule'] if has_next else None})
+    return _conditional(build)
 
 # GET un employé par matricule
 @employees_bp.route('/<int:matricule>', methods=['GET'])
 def get_employee(matricule):
-    employee = Employee.query.get_or_404(matricule)
-    return jsonify(employee.to_dict()), 200
+    fields = _parse_fields(request.args.get('fields'))
+
+    def build():
+        row = db.session.query(*(getattr(Employee, field) for field in fields)) \
+            .filter(Employee.matricule == matricule).first()
+        if row is None:
+            response = jsonify({'status': 'error', 'message': 'Employé introuvable'})
+            response.status_code = 404
+            return response
+        return jsonify(_rows([row], fields)[0])
+    return _conditional(build)
 
 # POST créer un employé
 @employees_bp.route('', methods=['POST'])
 def create_employee():
-    data = request.get_json()
-
-    employee = Employee(
-        matricule=data.get('matricule'),
-        first_name=data['first_name'],
-        last_name=data['last_name'],
-        age=data.get('age'),
-        position=data.get('position'),
-        salary=data.get('salary'),
-        departement=data.get('departement'),
-        indemnite1=data.get('indemnite1', 0),
-        indemnite2=data.get('indemnite2', 0),
-        date_joined=datetime.strptime(data['date_joined'], '%Y-%m-%d').date() if data.get('date_joined') else None
-    )
+    data = _json_body()
+    values = parse_employee({key: '' if value is None else str(value) for key, value in data.items()})
+    if values['matricule'] is not None and db.session.get(Employee, values['matricule']) is not None:
+        return jsonify({'status': 'error', 'message': 'matricule déjà existant'}), 409
 
+    employee = Employee(**values)
     db.session.add(employee)
     db.session.commit()
 
-    return jsonify(employee.to_dict()), 201
+    return jsonify(_employee_json(employee)), 201
 
-# PUT mettre à jour un employé
+# PUT mettre à jour un employé (seuls les champs fournis sont modifiés)
 @employees_bp.route('/<int:matricule>', methods=['PUT'])
 def update_employee(matricule):
     employee = Employee.query.get_or_404(matricule)
-    data = request.get_json()
-
-    employee.first_name = data.get('first_name', employee.first_name)
-    employee.last_name = data.get('last_name', employee.last_name)
-    employee.age = data.get('age', employee.age)
-    employee.position = data.get('position', employee.position)
-    employee.salary = data.get('salary', employee.salary)
-    employee.departement = data.get('departement', employee.departement)
-    employee.indemnite1 = data.get('indemnite1', employee.indemnite1)
-    employee.indemnite2 = data.get('indemnite2', employee.indemnite2)
+    data = _json_body()
 
+    _apply_fields(employee, data, [field for field in data if field in API_FIELDS])
     db.session.commit()
 
-    return jsonify(employee.to_dict()), 200
+    return jsonify(_employee_json(employee)), 200
 
 # PATCH terminer un employé (date de départ)
 @employees_bp.route('/<int:matricule>/terminate', methods=['PATCH'])
 def terminate_employee(matricule):
     employee = Employee.query.get_or_404(matricule)
-    data = request.get_json()
+    data = _json_body()
 
-    employee.date_left = datetime.strptime(data['date_left'], '%Y-%m-%d').date() if data.get('date_left') else datetime.now().date()
+    employee.date_left = _parse_date_left(data.get('date_left')) or datetime.now().date()
 
     db.session.commit()
 
-    return jsonify(employee.to_dict()), 200
+    return jsonify(_employee_json(employee)), 200
 
 # DELETE supprimer un employé
 @employees_bp.route('/<int:matricule>', methods=['DELETE'])
@@ -77,4 +205,4 @@ def delete_employee(matricule):
     db.session.delete(employee)
     db.session.commit()
 
-    return jsonify({'message': 'Employé supprimé'}), 200
\ No newline at end of file
+    return jsonify({'message': 'Employé supprimé'}), 200
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+# Balayage du niveau disque après chaque écriture de cette fraction de la taille maximale;
+# il redescend alors à SWEEP_TARGET de la taille maximale
+SWEEP_EVERY = 0.1
+SWEEP_TARGET = 0.9
+
+
+class ScenarioCache:
+    """
+    Cache à deux niveaux pour les résultats de scénarios
+    - niveau 1: LRU en mémoire (taille bornée + TTL), propre au processus
+    - niveau 2: fichiers JSON sur disque, partagés entre les workers du serveur,
+      bornés à max_disk_bytes (0 = sans limite): expirés puis moins récemment écrits supprimés
+    """
+
+    def __init__(self, maxsize=256, ttl=3600, cache_dir=None, max_disk_bytes=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._written = 0
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'disk_evictions': 0}
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(namespace, inputs, model_version):
+        """Clé de cache: entrées normalisées + version des artefacts du modèle"""
+        payload = json.dumps({'ns': namespace, 'inputs': inputs, 'model': model_version},
+                             sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Retourne la valeur en cache ou None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return value
+                del self._entries[key]
+
+        value, expires_at = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+            self._store_memory(key, value, expires_at)
+        return value
+
+    def set(self, key, value):
+        """Enregistre une valeur (sérialisable en JSON) dans les deux niveaux"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store_memory(key, value, expires_at)
+        self._write_disk(key, value, expires_at)
+
+    def get_or_compute(self, key, compute):
+        """Retourne la valeur en cache, sinon la calcule avec compute() et la stocke"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        """Vide les deux niveaux du cache"""
+        with self._lock:
+            self._entries.clear()
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
+
+    def sweep(self):
+        """
+        Supprime les fichiers les plus anciens jusqu'à SWEEP_TARGET de max_disk_bytes
+        Retourne le nombre de fichiers supprimés
+        """
+        if not self.cache_dir or self.max_disk_bytes <= 0:
+            return 0
+
+        files, total = [], 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        if total <= self.max_disk_bytes:
+            return 0
+
+        # Date de modification = date d'écriture: les premiers écrits expirent les premiers (même TTL)
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes * SWEEP_TARGET:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._stats['disk_evictions'] += removed
+        return removed
+
+    def stats(self):
+        """Compteurs de hits/misses et taille du cache mémoire"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['maxsize'] = self.maxsize
+        stats['ttl'] = self.ttl
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _store_memory(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def _read_disk(self, key, now):
+        if not self.cache_dir:
+            return None, None
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None, None
+
+        if entry.get('expires_at', 0) <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None, None
+        return entry.get('value'), entry['expires_at']
+
+    def _write_disk(self, key, value, expires_at):
+        if not self.cache_dir:
+            return
+        # Écriture atomique: fichier temporaire puis renommage
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'expires_at': expires_at, 'value': value}, f)
+                size = f.tell()
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Erreur écriture cache disque: {e}")
+            return
+
+        with self._lock:
+            self._written += size
+            due = self.max_disk_bytes > 0 and self._written >= self.max_disk_bytes * SWEEP_EVERY
+            if due:
+                self._written = 0
+        if due:
+            self.sweep()
+
+
+_scenario_cache = None
+_scenario_cache_lock = threading.Lock()
+
+def get_scenario_cache():
+    """Retourne le cache de scénarios configuré pour l'application courante"""
+    global _scenario_cache
+    with _scenario_cache_lock:
+        if _scenario_cache is None:
+            config = current_app.config
+            cache_dir = config.get('SCENARIO_CACHE_DIR') or os.path.join(current_app.instance_path, 'scenario_cache')
+            _scenario_cache = ScenarioCache(
+                maxsize=config['SCENARIO_CACHE_SIZE'],
+                ttl=config['SCENARIO_CACHE_TTL'],
+                cache_dir=cache_dir if config['SCENARIO_CACHE_DISK'] else None,
+                max_disk_bytes=config['SCENARIO_CACHE_DISK_MAX_MB'] * 1024 * 1024
+            )
+        return _scenario_cache
@@ -0,0 +1,93 @@
+import importlib
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+
+# Modules lourds qui ne doivent pas être importés par create_app()
+HEAVY_MODULES = ['numpy', 'pandas', 'matplotlib', 'xgboost', 'sklearn', 'joblib']
+
+# Étapes chronométrées du démarrage et imports différés: (type, nom, secondes)
+_timings = []
+_timings_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """
+    Module importé au premier accès à l'un de ses attributs
+    Après le chargement, les attributs du vrai module sont recopiés: les accès
+    suivants ne passent plus par __getattr__.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def _load(self):
+        module = self.__dict__.get('_lazy_module')
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__.get('_lazy_module')
+                if module is None:
+                    already_loaded = self.__name__ in sys.modules
+                    start = time.perf_counter()
+                    module = importlib.import_module(self.__name__)
+                    if not already_loaded:
+                        record('lazy-import', self.__name__, time.perf_counter() - start)
+                    self.__dict__.update(module.__dict__)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+def lazy_import(name):
+    """Retourne le module s'il est déjà chargé, sinon un module importé au premier usage"""
+    return sys.modules.get(name) or LazyModule(name)
+
+def begin_startup():
+    """Début d'un create_app(): efface les étapes du démarrage précédent (pas les imports différés)"""
+    with _timings_lock:
+        _timings[:] = [entry for entry in _timings if entry[0] == 'lazy-import']
+
+def record(kind, name, seconds):
+    with _timings_lock:
+        _timings.append((kind, name, seconds))
+
+@contextmanager
+def timed(kind, name):
+    """Chronomètre une étape du démarrage (extension, blueprint, modèle...)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, time.perf_counter() - start)
+
+def startup_report():
+    """
+    Rapport de démarrage: durée de chaque étape chronométrée, imports différés
+    déjà déclenchés et modules lourds actuellement chargés
+    """
+    with _timings_lock:
+        timings = list(_timings)
+
+    steps = [{'kind': kind, 'name': name, 'ms': round(seconds * 1000, 2)}
+             for kind, name, seconds in timings]
+    return {
+        'create_app_ms': round(sum(s for kind, _, s in timings if kind == 'create_app') * 1000, 2),
+        'steps': [step for step in steps if step['kind'] != 'create_app'],
+        'heavy_modules_loaded': [name for name in HEAVY_MODULES if name in sys.modules]
+    }
+
+def format_startup_report(report):
+    """Rapport de démarrage en texte (une ligne par étape, triées par durée)"""
+    lines = [f"Démarrage: create_app() {report['create_app_ms']:.1f} ms"]
+    for step in sorted(report['steps'], key=lambda s: s['ms'], reverse=True):
+        lines.append(f"  {step['ms']:>9.1f} ms  {step['kind']:<12} {step['name']}")
+    loaded = ', '.join(report['heavy_modules_loaded']) or 'aucun'
+    lines.append(f"Modules lourds chargés: {loaded}")
+    return '\n'.join(lines)
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from sqlalchemy import event, select, update
+
+from app import db
+from app.models import TableVersion
+
+# Tables dont les changements sont comptés
+VERSIONED_TABLES = ('employees', 'recruitment', 'termination')
+
+
+def bump_version(connection, table_name):
+    """
+    Incrémente le compteur d'une table dans la transaction de l'écriture:
+    le compteur n'avance que si l'écriture est validée
+    Ligne absente (base créée sans la migration 0005): créée par le même upsert, sans
+    course entre deux premières écritures concurrentes
+    """
+    table = TableVersion.__table__
+    increment = {'version': table.c.version + 1, 'updated_at': datetime.utcnow()}
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        connection.execute(insert(table).values(table_name=table_name, version=1)
+                           .on_duplicate_key_update(**increment))
+    elif dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        connection.execute(insert(table).values(table_name=table_name, version=1)
+                           .on_conflict_do_update(index_elements=[table.c.table_name], set_=increment))
+    else:
+        result = connection.execute(
+            update(table).where(table.c.table_name == table_name).values(version=table.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(table_name=table_name, version=1))
+
+def table_version(table_name):
+    """Compteur courant d'une table (0 si elle n'a jamais changé)"""
+    version = db.session.execute(
+        select(TableVersion.version).where(TableVersion.table_name == table_name)
+    ).scalar()
+    return version or 0
+
+
+@event.listens_for(db.session, 'after_flush')
+def _bump_flushed_tables(session, flush_context):
+    tables = set()
+    for instance in session.new | session.deleted:
+        tables.add(getattr(instance, '__tablename__', None))
+    for instance in session.dirty:
+        if session.is_modified(instance, include_collections=False):
+            tables.add(getattr(instance, '__tablename__', None))
+
+    connection = session.connection()
+    for table_name in sorted(tables.intersection(VERSIONED_TABLES)):
+        bump_version(connection, table_name)
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from app import db
-from app.models import Termination, Employee
+from app.models import Termination
 from flask_login import login_required
 from datetime import datetime
 
@@ -31,5 +31,5 @@ def add_termination():
         flash('Départ enregistré avec succès!', 'success')
         return redirect(url_for('termination.list_terminations'))
 
-    employees = Employee.query.all()
-    return render_template('termination/add.html', employees=employees)
\ No newline at end of file
+    # Employé choisi par autocomplétion (/employees/lookup, static/js/employee_lookup.js)
+    return render_template('termination/add.html')
\ No newline at end of file
@@ -0,0 +1,295 @@
+import json
+
+from app.startup import lazy_import
+
+np = lazy_import('numpy')
+
+
+class TreeEnsemble:
+    """
+    Évaluateur NumPy d'un ensemble d'arbres exporté en tables plates
+    Chaque nœud est décrit par: feature, seuil, enfant gauche (l'enfant droit
+    le suit immédiatement), direction par défaut (valeurs manquantes) et valeur
+    de feuille. Les feuilles pointent sur elles-mêmes avec un seuil infini.
+    Les seuils sont exprimés dans l'espace des features brutes (scaler intégré),
+    predict() prend donc directement les features non normalisées.
+    """
+
+    # Nombre maximal de couples (ligne, arbre) traités à la fois (mémoire bornée)
+    MAX_CELLS = 1 << 14
+    # Évaluation par groupes (voir _predict_grouped) au-delà de ce nombre de lignes,
+    # si les lignes forment au moins GROUP_MIN_RATIO fois moins de groupes
+    GROUP_MIN_ROWS = 4096
+    GROUP_MIN_RATIO = 8
+    # Nombre maximal de couples (groupe, arbre) parcourus à la fois
+    MAX_GROUP_CELLS = 1 << 18
+
+    def __init__(self, roots, feature, threshold, left, default_left, value,
+                 base_score, max_depth, n_features, metadata=None):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.default_left = default_left
+        self.value = value
+        self.base_score = float(base_score)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.metadata = metadata or {}
+        self._split_points = None
+        self._node_bins = None
+        self._tree_bin_counts = None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def load(cls, path):
+        """Charge les tables depuis un fichier .npz produit par ml_models/compile_trees.py"""
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata'])) if 'metadata' in data else {}
+            return cls(
+                roots=data['roots'],
+                feature=data['feature'],
+                threshold=data['threshold'],
+                left=data['left'],
+                default_left=data['default_left'],
+                value=data['value'],
+                base_score=data['base_score'],
+                max_depth=data['max_depth'],
+                n_features=data['n_features'],
+                metadata=metadata
+            )
+
+    def save(self, path):
+        """Enregistre les tables dans un fichier .npz"""
+        np.savez(
+            path,
+            roots=self.roots,
+            feature=self.feature,
+            threshold=self.threshold,
+            left=self.left,
+            default_left=self.default_left,
+            value=self.value,
+            base_score=np.float64(self.base_score),
+            max_depth=np.int32(self.max_depth),
+            n_features=np.int32(self.n_features),
+            metadata=np.array(json.dumps(self.metadata))
+        )
+
+    def predict(self, X):
+        """Prédit pour une matrice (n_rows, n_features) de features brutes"""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Features attendues: {self.n_features}, reçues: {X.shape}")
+
+        if len(X) >= self.GROUP_MIN_ROWS and not np.isnan(X).any():
+            predictions = self._predict_grouped(X)
+            if predictions is not None:
+                return predictions
+
+        predictions = np.empty(len(X))
+        chunk_rows = max(1, self.MAX_CELLS // self.n_trees)
+        for start in range(0, len(X), chunk_rows):
+            chunk = X[start:start + chunk_rows]
+            predictions[start:start + chunk_rows] = self._predict_chunk(chunk)
+        return predictions
+
+    def split_points(self):
+        """Seuils distincts utilisés par chaque feature, triés"""
+        if self._split_points is None:
+            internal = np.isfinite(self.threshold)
+            self._split_points = [np.unique(self.threshold[internal & (self.feature == f)])
+                                  for f in range(self.n_features)]
+        return self._split_points
+
+    def bin_keys(self, X):
+        """
+        Code entier de l'intervalle de seuils où tombe chaque feature d'une ligne
+        Deux lignes de même code suivent le même chemin dans tous les arbres et ont
+        donc exactement la même prédiction. Retourne None si le code déborde 63 bits.
+        """
+        split_points = self.split_points()
+        radixes = [len(points) + 1 for points in split_points]
+        if np.prod(np.asarray(radixes, dtype=float)) >= 2 ** 62:
+            return None
+
+        X = np.asarray(X, dtype=np.float64)
+        keys = np.zeros(len(X), dtype=np.int64)
+        for f, (points, radix) in enumerate(zip(split_points, radixes)):
+            # x >= seuil va à droite: l'intervalle est le nombre de seuils <= x
+            keys = keys * radix + np.searchsorted(points, X[:, f], side='right')
+        return keys
+
+    def node_bins(self):
+        """Seuil de chaque nœud en intervalles de split_points: x >= seuil <=> intervalle de x >= node_bins"""
+        if self._node_bins is None:
+            node_bins = np.zeros(len(self.threshold), dtype=np.int32)
+            internal = np.isfinite(self.threshold)
+            for f, points in enumerate(self.split_points()):
+                nodes = internal & (self.feature == f)
+                node_bins[nodes] = np.searchsorted(points, self.threshold[nodes], side='left') + 1
+            self._node_bins = node_bins
+        return self._node_bins
+
+    def tree_bin_counts(self):
+        """
+        Pour chaque feature: tableau (n_trees, intervalles) du nombre de seuils de chaque arbre
+        au plus égaux au début de l'intervalle. Deux intervalles de même compte sont
+        indiscernables pour cet arbre.
+        """
+        if self._tree_bin_counts is None:
+            internal = np.isfinite(self.threshold)
+            node_bins = self.node_bins()
+            tree = np.searchsorted(self.roots, np.arange(len(self.threshold)), side='right') - 1
+            counts = []
+            for f, points in enumerate(self.split_points()):
+                nodes = internal & (self.feature == f)
+                histogram = np.zeros((self.n_trees, len(points) + 2), dtype=np.int32)
+                np.add.at(histogram, (tree[nodes], node_bins[nodes]), 1)
+                counts.append(np.cumsum(histogram, axis=1)[:, :len(points) + 1])
+            self._tree_bin_counts = counts
+        return self._tree_bin_counts
+
+    def _predict_grouped(self, X):
+        """
+        Évaluation par groupes pour les grands lots dont une feature varie finement (l'effectif):
+        les lignes sont groupées par intervalles de seuils des autres features. Dans un groupe,
+        chaque arbre se réduit à une fonction en escalier de la feature fine, obtenue en un seul
+        parcours (les deux branches des nœuds sur cette feature, bornées aux valeurs présentes).
+        Les feuilles atteintes s'ajoutent sur leurs intervalles; chaque ligne lit ensuite sa valeur
+        dans la table cumulée de son groupe.
+        Retourne None si les lignes forment trop de groupes (parcours ligne par ligne plus court).
+        """
+        split_points = self.split_points()
+        bins = np.empty(X.shape, dtype=np.int64)
+        for f, points in enumerate(split_points):
+            bins[:, f] = np.searchsorted(points, X[:, f], side='right')
+
+        # Feature fine: celle dont les lignes occupent le plus d'intervalles
+        fine = int(np.argmax([len(np.unique(bins[:, f])) for f in range(self.n_features)]))
+        others = [f for f in range(self.n_features) if f != fine]
+        # Clés entières des groupes et des classes de groupes par arbre (_group_table) sur 63 bits
+        radixes = [max(len(split_points[f]) + 1, int(self.tree_bin_counts()[f][:, -1].max()) + 1) for f in others]
+        if np.prod(np.asarray(radixes, dtype=float)) * self.n_trees >= 2 ** 62:
+            return None
+
+        keys = np.zeros(len(X), dtype=np.int64)
+        for f in others:
+            keys = keys * (len(split_points[f]) + 1) + bins[:, f]
+        _, first, group = np.unique(keys, return_index=True, return_inverse=True)
+        n_groups = len(first)
+        if n_groups * self.GROUP_MIN_RATIO > len(X):
+            return None
+
+        n_bins = len(split_points[fine]) + 1
+        fine_bins = bins[:, fine]
+        low = np.full(n_groups, n_bins, dtype=np.int64)
+        np.minimum.at(low, group, fine_bins)
+        high = np.zeros(n_groups, dtype=np.int64)
+        np.maximum.at(high, group, fine_bins)
+        group_bins = bins[first]
+
+        # Groupes traités par blocs (mémoire bornée); lignes triées par groupe
+        order = np.argsort(group, kind='stable')
+        chunk_groups = max(1, self.MAX_GROUP_CELLS // self.n_trees)
+        starts = np.arange(0, n_groups, chunk_groups)
+        bounds = np.searchsorted(group[order], np.append(starts, n_groups))
+        predictions = np.empty(len(X))
+        for i, start in enumerate(starts):
+            stop = min(start + chunk_groups, n_groups)
+            table = self._group_table(group_bins[start:stop], low[start:stop], high[start:stop] + 1,
+                                      fine, others, n_bins)
+            rows = order[bounds[i]:bounds[i + 1]]
+            predictions[rows] = table.take((group[rows] - start) * (n_bins + 1) + fine_bins[rows])
+        return predictions + self.base_score
+
+    def _group_table(self, group_bins, low, high, fine, others, n_bins):
+        """
+        Somme des arbres pour chaque groupe et chaque intervalle de la feature fine
+        Un arbre n'est parcouru qu'une fois pour les groupes qu'il ne distingue pas (mêmes
+        intervalles de ses propres seuils), sur la réunion de leurs plages de la feature fine.
+        Retourne: table aplatie (n_groups, n_bins + 1)
+        """
+        n_groups = len(group_bins)
+        counts = self.tree_bin_counts()
+
+        # Classes (arbre, groupes indiscernables pour cet arbre)
+        keys = np.zeros((self.n_trees, n_groups), dtype=np.int64)
+        for f in others:
+            keys = keys * (int(counts[f][:, -1].max()) + 1) + counts[f][:, group_bins[:, f]]
+        keys += np.arange(self.n_trees, dtype=np.int64)[:, None] * (int(keys.max()) + 1)
+        _, first, pair_class = np.unique(keys.ravel(), return_index=True, return_inverse=True)
+        n_classes = len(first)
+        class_low = np.full(n_classes, n_bins, dtype=np.int64)
+        np.minimum.at(class_low, pair_class, np.tile(low, self.n_trees))
+        class_high = np.zeros(n_classes, dtype=np.int64)
+        np.maximum.at(class_high, pair_class, np.tile(high, self.n_trees))
+
+        internal = np.isfinite(self.threshold)
+        node_bins = self.node_bins()
+        splits_fine = internal & (self.feature == fine)
+        flat_bins = group_bins.astype(np.int32).ravel()
+
+        # Frontière: (classe, groupe représentant, nœud, intervalle [lo, hi) de la feature fine)
+        klass = np.arange(n_classes, dtype=np.int32)
+        offset = (first % n_groups * self.n_features).astype(np.int32)
+        node = self.roots.astype(np.int32)[first // n_groups]
+        lo, hi = class_low.astype(np.int32), class_high.astype(np.int32)
+        leaves = []
+        while len(node):
+            at_leaf = ~internal.take(node)
+            if at_leaf.any():
+                leaves.append((klass[at_leaf], lo[at_leaf], hi[at_leaf], node[at_leaf]))
+                inner = ~at_leaf
+                klass, offset, node, lo, hi = klass[inner], offset[inner], node[inner], lo[inner], hi[inner]
+
+            threshold_bin = node_bins.take(node)
+            left = self.left.take(node)
+            on_fine = splits_fine.take(node)
+            # Autres features: une seule branche, fixée par le groupe
+            other = ~on_fine
+            go_right = flat_bins.take(offset[other] + self.feature.take(node[other])) >= threshold_bin[other]
+            # Feature fine: les deux branches, chacune sur sa part de l'intervalle
+            fine_class, fine_offset, fine_lo, fine_hi = klass[on_fine], offset[on_fine], lo[on_fine], hi[on_fine]
+            fine_bin, fine_left = threshold_bin[on_fine], left[on_fine]
+            to_left, to_right = fine_lo < fine_bin, fine_bin < fine_hi
+
+            klass = np.concatenate([klass[other], fine_class[to_left], fine_class[to_right]])
+            offset = np.concatenate([offset[other], fine_offset[to_left], fine_offset[to_right]])
+            node = np.concatenate([left[other] + go_right, fine_left[to_left], fine_left[to_right] + 1])
+            lo = np.concatenate([lo[other], fine_lo[to_left], np.maximum(fine_lo, fine_bin)[to_right]])
+            hi = np.concatenate([hi[other], np.minimum(fine_hi, fine_bin)[to_left], fine_hi[to_right]])
+
+        # Chaque feuille s'applique à tous les groupes de sa classe
+        klass, lo, hi, node = (np.concatenate(parts) for parts in zip(*leaves))
+        members = np.argsort(pair_class, kind='stable') % n_groups
+        sizes = np.bincount(pair_class, minlength=n_classes)
+        repeats = sizes[klass]
+        member_index = np.repeat(np.cumsum(sizes)[klass] - sizes[klass] - np.cumsum(repeats) + repeats, repeats) \
+            + np.arange(repeats.sum())
+        offsets = members[member_index].astype(np.int64) * (n_bins + 1)
+        values = np.repeat(self.value.take(node), repeats)
+        size = n_groups * (n_bins + 1)
+        steps = (np.bincount(offsets + np.repeat(lo, repeats), weights=values, minlength=size)
+                 - np.bincount(offsets + np.repeat(hi, repeats), weights=values, minlength=size))
+        return np.cumsum(steps.reshape(n_groups, n_bins + 1), axis=1).ravel()
+
+    def _predict_chunk(self, X):
+        n_rows = len(X)
+        # Indice global du nœud courant pour chaque couple (ligne, arbre)
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        row_offsets = (np.arange(n_rows, dtype=np.int32) * self.n_features)[:, None]
+        flat_X = X.ravel()
+
+        # Les feuilles bouclent sur elles-mêmes: max_depth itérations suffisent
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offsets + self.feature.take(nodes))
+            go_right = x >= self.threshold.take(nodes)
+            missing = np.isnan(x)
+            if missing.any():
+                go_right |= missing & ~self.default_left.take(nodes)
+            nodes = self.left.take(nodes) + go_right
+
+        return self.value.take(nodes).sum(axis=1) + self.base_score
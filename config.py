@@ -9,4 +9,75 @@ class Config:
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
-    }
\ No newline at end of file
+    }
+
+    # Pool de processus partagé par les lots et les simulations
+    PROCESS_POOL_WORKERS = int(os.environ.get('PROCESS_POOL_WORKERS', os.cpu_count() or 1))
+
+    # Prédictions par lot (/prediction/batch)
+    BATCH_MAX_SCENARIOS = int(os.environ.get('BATCH_MAX_SCENARIOS', 1000))
+    BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 200))
+
+    # Cache des scénarios: LRU en mémoire + fichiers partagés entre workers
+    SCENARIO_CACHE_SIZE = int(os.environ.get('SCENARIO_CACHE_SIZE', 256))
+    SCENARIO_CACHE_TTL = int(os.environ.get('SCENARIO_CACHE_TTL', 3600))
+    SCENARIO_CACHE_DISK = os.environ.get('SCENARIO_CACHE_DISK', '1') == '1'
+    SCENARIO_CACHE_DIR = os.environ.get('SCENARIO_CACHE_DIR')
+    # Taille maximale des fichiers du cache (Mo, 0 = sans limite)
+    SCENARIO_CACHE_DISK_MAX_MB = int(os.environ.get('SCENARIO_CACHE_DISK_MAX_MB', 200))
+
+    # Chargement, validation et préchauffage du modèle au démarrage: 'sync', 'background' ou 'off'
+    # 'sync': create_app() rend un modèle prêt (aucune première requête à froid)
+    # 'background': démarrage rapide, les premières requêtes attendent la fin du chargement
+    PRELOAD_MODEL = os.environ.get('PRELOAD_MODEL', 'sync')
+
+    # Afficher le rapport de temps de démarrage à la fin de create_app()
+    STARTUP_REPORT = os.environ.get('STARTUP_REPORT', '0') == '1'
+
+    # Surveillance des artefacts du modèle (secondes, 0 = désactivée): rechargement à chaud,
+    # démarrée à la première requête servie (jamais par les commandes flask)
+    MODEL_WATCH_INTERVAL = int(os.environ.get('MODEL_WATCH_INTERVAL', 10))
+
+    # Moteur d'inférence: 'auto' (tables compilées pour les petits lots), 'compiled' ou 'booster'
+    # Lus aussi hors contexte d'application (processus du pool): app/model_loader.py
+    MODEL_ENGINE = os.environ.get('MODEL_ENGINE', 'auto')
+    # Au-delà de ce nombre de lignes, le booster XGBoost est plus rapide que l'évaluateur NumPy
+    COMPILED_ENGINE_MAX_ROWS = int(os.environ.get('COMPILED_ENGINE_MAX_ROWS', 96))
+    # Modèle servi par défaut (nom dans le bundle); vide = celui désigné par le manifeste
+    DEFAULT_MODEL = os.environ.get('DEFAULT_MODEL', '')
+
+    # Répartition A/B des requêtes sans champ "model" entre les modèles du bundle,
+    # poids relatifs: "xgboost:90,linear:10" (vide = modèle par défaut du bundle)
+    MODEL_AB_SPLIT = os.environ.get('MODEL_AB_SPLIT', '')
+
+    # Rendu des graphiques: processus de rendu persistants (0 = dans le processus du serveur)
+    RENDER_POOL_WORKERS = int(os.environ.get('RENDER_POOL_WORKERS', 2))
+    GRAPH_DIR = os.environ.get('GRAPH_DIR')
+    # Taille maximale du dossier des graphiques (Mo, 0 = sans limite): les moins récemment
+    # utilisés sont supprimés, puis rendus à nouveau si un résultat stocké les redemande
+    GRAPH_DIR_MAX_MB = int(os.environ.get('GRAPH_DIR_MAX_MB', 500))
+
+    # Facettes de la liste des employés (départements, années): durée de validité en secondes,
+    # borne l'écart avec les écritures des autres workers (0 = jamais expirées)
+    FACET_CACHE_TTL = int(os.environ.get('FACET_CACHE_TTL', 300))
+    # Index d'autocomplétion des employés (/employees/lookup): même principe
+    EMPLOYEE_INDEX_TTL = int(os.environ.get('EMPLOYEE_INDEX_TTL', 300))
+
+    # Historique des prédictions: écriture différée par lots dans un thread (0 = écriture dans la requête)
+    HISTORY_WRITE_BEHIND = os.environ.get('HISTORY_WRITE_BEHIND', '1') == '1'
+    HISTORY_QUEUE_SIZE = int(os.environ.get('HISTORY_QUEUE_SIZE', 1000))
+    HISTORY_BATCH_SIZE = int(os.environ.get('HISTORY_BATCH_SIZE', 200))
+    HISTORY_FLUSH_INTERVAL = float(os.environ.get('HISTORY_FLUSH_INTERVAL', 0.5))
+    # Attente maximale d'une requête quand la file est pleine avant d'écrire elle-même sa ligne
+    HISTORY_PUT_TIMEOUT = float(os.environ.get('HISTORY_PUT_TIMEOUT', 2.0))
+
+    # Simulations Monte Carlo (/prediction/predict avec simulate=true)
+    SIMULATION_MAX_SAMPLES = int(os.environ.get('SIMULATION_MAX_SAMPLES', 20000))
+    SIMULATION_CHUNK_SIZE = int(os.environ.get('SIMULATION_CHUNK_SIZE', 500))
+
+    # Grilles de sensibilité (/prediction/sensitivity): nombre maximal de cellules
+    SENSITIVITY_MAX_CELLS = int(os.environ.get('SENSITIVITY_MAX_CELLS', 10000))
+
+    # Optimisation des recrutements sous budget (/prediction/optimize)
+    OPTIMIZE_MAX_POPULATION = int(os.environ.get('OPTIMIZE_MAX_POPULATION', 2000))
+    OPTIMIZE_MAX_ITERATIONS = int(os.environ.get('OPTIMIZE_MAX_ITERATIONS', 100))
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import joblib
+
+# Permet d'importer le package app depuis ml_models/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.artifact_bundle import write_bundle
+from app.model_loader import file_digest
+from app.tree_engine import TreeEnsemble
+from compile_trees import (compile_and_save, compile_forest_checked,
+                           MODEL_PATH, SCALER_PATH, FEATURES_PATH, TREES_PATH, ARTIFACTS_DIR)
+
+# Définir les chemins
+METRICS_PATH = os.path.join(ARTIFACTS_DIR, "metrics.pkl")
+BUNDLES_DIR = os.path.join(ARTIFACTS_DIR, "bundles")
+
+# Modèle servi quand une requête n'en désigne aucun
+DEFAULT_MODEL = "xgboost"
+
+def build_bundle(models, scaler, feature_names, default_model=DEFAULT_MODEL):
+    """
+    Écrit le bundle versionné (modèles, scaler .npy, tables compilées, manifeste)
+    models: {nom: {'family', 'model', 'metrics', 'compiled' (optionnel)}}
+    Les arbres XGBoost et les forêts sont compilés s'ils ne l'ont pas déjà été.
+    """
+    entries = {}
+    for name, entry in models.items():
+        entry = dict(entry)
+        if entry.get('compiled') is None:
+            if entry['family'] == 'xgboost':
+                entry['compiled'], _ = compile_and_save(entry['model'], scaler, feature_names)
+            elif entry['family'] == 'random_forest':
+                entry['compiled'], _ = compile_forest_checked(entry['model'], scaler, feature_names)
+        entries[name] = entry
+
+    version, bundle_dir = write_bundle(BUNDLES_DIR, entries, scaler, feature_names, default_model)
+    print(f"   ✅ Bundle sauvegardé: {bundle_dir} (version {version}, modèles: {', '.join(entries)})")
+    return version, bundle_dir
+
+if __name__ == "__main__":
+    # Convertit les artefacts pickle déjà exportés par export_model.py (XGBoost seul)
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    feature_names = list(joblib.load(FEATURES_PATH))
+    metrics = joblib.load(METRICS_PATH) if os.path.exists(METRICS_PATH) else {'r2': 0.0, 'mse': 0.0}
+
+    # Réutiliser les tables compilées si elles proviennent de ces pickles
+    compiled = None
+    if os.path.exists(TREES_PATH):
+        compiled = TreeEnsemble.load(TREES_PATH)
+        if compiled.metadata.get('source_fingerprint') != file_digest([MODEL_PATH, SCALER_PATH]):
+            compiled = None
+    build_bundle({'xgboost': {'family': 'xgboost', 'model': model, 'metrics': metrics, 'compiled': compiled}},
+                 scaler, feature_names)
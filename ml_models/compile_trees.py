@@ -0,0 +1,292 @@
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Permet d'importer le package app depuis ml_models/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.tree_engine import TreeEnsemble
+from app.model_loader import file_digest
+
+# Définir les chemins
+ARTIFACTS_DIR = os.path.join(os.path.dirname(__file__), "artifacts")
+MODEL_PATH = os.path.join(ARTIFACTS_DIR, "xgb_model.pkl")
+SCALER_PATH = os.path.join(ARTIFACTS_DIR, "scaler.pkl")
+FEATURES_PATH = os.path.join(ARTIFACTS_DIR, "feature_names.pkl")
+TREES_PATH = os.path.join(ARTIFACTS_DIR, "xgb_trees.npz")
+
+# Écart relatif maximal toléré entre le booster et les tables compilées
+TOLERANCE = 1e-5
+
+def _tree_depth(left, right):
+    """Profondeur maximale d'un arbre (nombre de décisions jusqu'à la feuille)"""
+    depth = 0
+    stack = [(0, 0)]
+    while stack:
+        node, level = stack.pop()
+        if left[node] == -1:
+            depth = max(depth, level)
+        else:
+            stack.append((left[node], level + 1))
+            stack.append((right[node], level + 1))
+    return depth
+
+def fold_thresholds(thresholds, mean, scale, inclusive=False):
+    """
+    Ramène des seuils de l'espace normalisé vers l'espace brut
+    XGBoost compare float32((x - mean) / scale) < t (seuils float32), scikit-learn
+    float32((x - mean) / scale) <= t (inclusive=True, seuils float64): on cherche par
+    dichotomie le plus petit x brut (float64) qui ne va plus à gauche, afin que
+    x < seuil_brut reproduise exactement la décision du modèle, égalités comprises.
+    """
+    if inclusive:
+        thresholds = thresholds.astype(np.float64)
+    else:
+        thresholds = thresholds.astype(np.float32)
+
+    def goes_left(x):
+        scaled = ((x - mean) / scale).astype(np.float32)
+        if inclusive:
+            return scaled.astype(np.float64) <= thresholds
+        return scaled < thresholds
+
+    guess = thresholds.astype(np.float64) * scale + mean
+    width = np.maximum(np.abs(guess), 1.0) * 1e-6 + scale * 1e-6
+    lo = guess - width
+    hi = guess + width
+    while not (goes_left(lo).all() and not goes_left(hi).any()):
+        width *= 2
+        lo = np.where(goes_left(lo), lo, guess - width)
+        hi = np.where(goes_left(hi), guess + width, hi)
+
+    # lo va toujours à gauche, hi jamais: resserrer jusqu'à deux flottants adjacents
+    for _ in range(128):
+        mid = lo + (hi - lo) / 2
+        left = goes_left(mid)
+        lo = np.where(left, mid, lo)
+        hi = np.where(left, hi, mid)
+        if (np.nextafter(lo, np.inf) >= hi).all():
+            break
+    return hi
+
+def _flatten_tree(left, right, split_index, thresholds, default_left, leaf_value, mean, scale, offset, inclusive=False):
+    """
+    Renumérote un arbre en largeur (l'enfant droit suit toujours l'enfant gauche)
+    et ramène ses seuils dans l'espace brut
+    Retourne: (feature, threshold, left, default_left, value) avec des indices globaux
+    """
+    is_leaf = left == -1
+
+    order = [0]
+    for node in order:
+        if not is_leaf[node]:
+            order.extend((left[node], right[node]))
+    order = np.asarray(order)
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = np.arange(len(order))
+
+    leaf = is_leaf[order]
+    feature = np.where(leaf, 0, split_index[order])
+    folded = fold_thresholds(thresholds[order], mean[feature], scale[feature], inclusive=inclusive)
+
+    return (
+        feature,
+        np.where(leaf, np.inf, folded),
+        np.where(leaf, np.arange(len(order)), position[np.where(leaf, 0, left[order])]) + offset,
+        default_left[order],
+        np.where(leaf, leaf_value[order], 0.0)
+    )
+
+def _ensemble(tables, roots, base_score, max_depth, n_features, metadata):
+    features, thresholds, lefts, defaults, values = zip(*tables)
+    return TreeEnsemble(
+        roots=np.asarray(roots, dtype=np.int32),
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts).astype(np.int32),
+        default_left=np.concatenate(defaults),
+        value=np.concatenate(values),
+        base_score=base_score,
+        max_depth=max_depth,
+        n_features=n_features,
+        metadata=metadata
+    )
+
+def compile_booster(model, scaler):
+    """
+    Convertit un XGBRegressor en tables de nœuds plates
+    Les seuils sont ramenés dans l'espace des features brutes (scaler intégré)
+    """
+    dump = json.loads(model.get_booster().save_raw("json"))
+    learner = dump["learner"]
+
+    objective = learner["objective"]["name"]
+    if objective != "reg:squarederror":
+        raise ValueError(f"Objectif non supporté: {objective}")
+
+    base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+    trees = learner["gradient_booster"]["model"]["trees"]
+    n_features = int(learner["learner_model_param"]["num_feature"])
+
+    mean = np.asarray(scaler.mean_, dtype=np.float64)
+    scale = np.asarray(scaler.scale_, dtype=np.float64)
+
+    roots, tables = [], []
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        left = np.asarray(tree["left_children"], dtype=np.int64)
+        right = np.asarray(tree["right_children"], dtype=np.int64)
+        # Les seuils et valeurs de feuilles sont stockés en float32 par XGBoost
+        split_condition = np.asarray(tree["split_conditions"], dtype=np.float32)
+
+        roots.append(offset)
+        tables.append(_flatten_tree(
+            left, right,
+            np.asarray(tree["split_indices"], dtype=np.int64),
+            split_condition,
+            np.asarray(tree["default_left"], dtype=bool),
+            split_condition.astype(np.float64),
+            mean, scale, offset
+        ))
+
+        max_depth = max(max_depth, _tree_depth(left, right))
+        offset += len(left)
+
+    return _ensemble(tables, roots, base_score, max_depth, n_features,
+                     {"objective": objective, "n_trees": len(trees), "n_nodes": offset})
+
+def compile_forest(model, scaler):
+    """
+    Convertit un RandomForestRegressor scikit-learn en tables de nœuds plates
+    La prédiction est la moyenne des arbres: chaque feuille est divisée par leur nombre
+    """
+    mean = np.asarray(scaler.mean_, dtype=np.float64)
+    scale = np.asarray(scaler.scale_, dtype=np.float64)
+    n_trees = len(model.estimators_)
+
+    roots, tables = [], []
+    max_depth = 0
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        default_left = getattr(tree, "missing_go_to_left", np.ones(tree.node_count, dtype=np.uint8)).astype(bool)
+
+        roots.append(offset)
+        tables.append(_flatten_tree(
+            left, right,
+            np.maximum(tree.feature, 0).astype(np.int64),
+            tree.threshold,
+            default_left,
+            tree.value[:, 0, 0] / n_trees,
+            mean, scale, offset, inclusive=True
+        ))
+
+        max_depth = max(max_depth, _tree_depth(left, right))
+        offset += len(left)
+
+    return _ensemble(tables, roots, 0.0, max_depth, model.n_features_in_,
+                     {"objective": "random_forest", "n_trees": n_trees, "n_nodes": offset})
+
+def _sample_features(n_rows, feature_names, seed=42):
+    """Génère des features réalistes (années, mois, effectifs) pour la vérification"""
+    rng = np.random.default_rng(seed)
+    sample = {
+        "Year": rng.integers(2010, 2046, n_rows),
+        "Month": rng.integers(1, 13, n_rows),
+        "nb_departures": rng.uniform(0, 50, n_rows),
+        "monthly_recruitment_effect": rng.uniform(0, 150, n_rows),
+        "nbemp": rng.uniform(1, 10000, n_rows)
+    }
+    return pd.DataFrame(sample)[list(feature_names)]
+
+def _median_latency(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def benchmark(model, scaler, ensemble, feature_names, batch_sizes=(1, 12, 240, 2400), repeats=30):
+    """
+    Compare précision et latence du booster (scaler + predict) et des tables compilées
+    Retourne un rapport sérialisable en JSON
+    """
+    frame = _sample_features(max(batch_sizes), feature_names)
+    expected = model.predict(scaler.transform(frame)).astype(np.float64)
+    actual = ensemble.predict(frame.to_numpy(dtype=np.float64))
+
+    abs_error = np.abs(actual - expected)
+    report = {
+        "max_abs_error": float(abs_error.max()),
+        "max_rel_error": float((abs_error / np.maximum(np.abs(expected), 1.0)).max()),
+        "latency_ms": []
+    }
+
+    for size in batch_sizes:
+        rows = frame.iloc[:size]
+        raw = rows.to_numpy(dtype=np.float64)
+        booster_s = _median_latency(lambda: model.predict(scaler.transform(rows)), repeats)
+        compiled_s = _median_latency(lambda: ensemble.predict(raw), repeats)
+        report["latency_ms"].append({
+            "rows": size,
+            "booster": round(booster_s * 1000, 4),
+            "compiled": round(compiled_s * 1000, 4)
+        })
+
+    return report
+
+def compile_and_save(model, scaler, feature_names, path=TREES_PATH, model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    """Compile le modèle, vérifie la fidélité des prédictions et enregistre les tables"""
+    ensemble = compile_booster(model, scaler)
+    report = benchmark(model, scaler, ensemble, feature_names)
+
+    if report["max_rel_error"] > TOLERANCE:
+        raise ValueError(f"Tables compilées infidèles au booster (écart relatif {report['max_rel_error']:.2e})")
+
+    ensemble.metadata.update({
+        "feature_names": list(feature_names),
+        "source_fingerprint": file_digest([model_path, scaler_path]),
+        "report": report
+    })
+    ensemble.save(path)
+
+    print(f"   ✅ Tables compilées sauvegardées: {path}")
+    print(f"   Arbres: {ensemble.n_trees}, nœuds: {ensemble.metadata['n_nodes']}, profondeur: {ensemble.max_depth}")
+    print(f"   Écart max: {report['max_abs_error']:.4f} (relatif {report['max_rel_error']:.2e})")
+    for entry in report["latency_ms"]:
+        print(f"   {entry['rows']:>5} lignes: booster {entry['booster']:.3f} ms | compilé {entry['compiled']:.3f} ms")
+
+    return ensemble, report
+
+def compile_forest_checked(model, scaler, feature_names):
+    """
+    Compile une forêt aléatoire et vérifie la fidélité de ses prédictions
+    Les tables ne sont pas sauvegardées ici: elles sont le moteur de la forêt dans le bundle
+    """
+    ensemble = compile_forest(model, scaler)
+    report = benchmark(model, scaler, ensemble, feature_names, repeats=5)
+
+    if report["max_rel_error"] > TOLERANCE:
+        raise ValueError(f"Tables compilées infidèles à la forêt (écart relatif {report['max_rel_error']:.2e})")
+
+    ensemble.metadata.update({"feature_names": list(feature_names), "report": report})
+
+    print(f"   Forêt: {ensemble.n_trees} arbres, nœuds: {ensemble.metadata['n_nodes']}, profondeur: {ensemble.max_depth}")
+    print(f"   Écart max: {report['max_abs_error']:.4f} (relatif {report['max_rel_error']:.2e})")
+    return ensemble, report
+
+if __name__ == "__main__":
+    # Compile les artefacts déjà exportés par export_model.py
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    feature_names = joblib.load(FEATURES_PATH)
+    compile_and_save(model, scaler, feature_names)
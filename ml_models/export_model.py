@@ -1,10 +1,19 @@
 import os
+import sys
 import joblib
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import r2_score, mean_squared_error
-from xgboost import XGBRegressor
+from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models"))
+from compile_trees import compile_and_save, TREES_PATH
+from build_bundle import build_bundle
+# Entraîneurs du projet: features et estimateurs construits au même endroit
+from gxboost import build_features, make_xgboost
+from random_forest import make_random_forest
+from linear_regression1 import make_linear_regression
 
 # Définir les chemins
 ARTIFACTS_DIR = os.path.join(os.path.dirname(__file__), "artifacts")
@@ -44,20 +53,47 @@ def load_data():
     return merged
 
 def preprocess(df):
-    """Prétraite les données avec l'effet de recrutement mensuel"""
-    df = df.sort_values(["Year", "Month"])
-    df["cumulative_recruitments"] = df.groupby("Year")["Recruitments"].transform("sum")
-    df["monthly_recruitment_effect"] = df["cumulative_recruitments"] / 12
+    """Prétraite les données avec l'effet de recrutement mensuel (features de gxboost.py)"""
+    X, y, _ = build_features(df)
+    return X, y, list(X.columns)
 
-    feature_cols = ["Year", "Month", "nb_departures", "monthly_recruitment_effect", "nbemp"]
-    X = df[feature_cols]
-    y = df["mass_salary"]
+def make_models():
+    """
+    Les trois familles de modèles du projet (gxboost.py, random_forest.py,
+    linear_regression1.py), entraînées sur les mêmes features normalisées
+    """
+    return {
+        "xgboost": ("xgboost", make_xgboost()),
+        "random_forest": ("random_forest", make_random_forest()),
+        "linear": ("linear", make_linear_regression())
+    }
 
-    return X, y, feature_cols
+def train_models(X_train, X_test, y_train, y_test):
+    """
+    Entraîne et évalue chaque famille sur le même découpage train/test
+    Retourne: {nom: {'family', 'model', 'metrics'}}
+    """
+    models = {}
+    for name, (family, model) in make_models().items():
+        print(f"Entraînement du modèle {name}...")
+        model.fit(X_train, y_train)
+
+        y_pred = model.predict(X_test)
+        metrics = {
+            'r2': r2_score(y_test, y_pred),
+            'mse': mean_squared_error(y_test, y_pred),
+            'mae': mean_absolute_error(y_test, y_pred)
+        }
+        print(f"   R² Score: {metrics['r2']:.4f}")
+        print(f"   MSE: {metrics['mse']:.2f}")
+
+        models[name] = {'family': family, 'model': model, 'metrics': metrics}
+    return models
 
 def export_model():
     """
-    Entraîne et exporte le modèle XGBoost + scaler + métriques
+    Entraîne et exporte les modèles (XGBoost, forêt aléatoire, régression linéaire)
+    + scaler + métriques
     """
     try:
         ensure_dir()
@@ -80,35 +116,19 @@ def export_model():
             X_scaled, y, test_size=0.2, random_state=42, shuffle=False
         )
 
-        # Entraîner le modèle
-        print("Entraînement du modèle XGBoost...")
-        model = XGBRegressor(
-            n_estimators=300,
-            learning_rate=0.05,
-            max_depth=6,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            random_state=42,
-            n_jobs=-1
-        )
-        model.fit(X_train, y_train)
-
-        # Évaluer le modèle
-        y_pred = model.predict(X_test)
-        r2 = r2_score(y_test, y_pred)
-        mse = mean_squared_error(y_test, y_pred)
+        # Entraîner les modèles
+        models = train_models(X_train, X_test, y_train, y_test)
+        model = models["xgboost"]["model"]
+        metrics = {key: models["xgboost"]["metrics"][key] for key in ('r2', 'mse')}
+        r2, mse = metrics['r2'], metrics['mse']
 
-        print("\nModèle entraîné avec succès!")
-        print(f"   R² Score: {r2:.4f}")
-        print(f"   MSE: {mse:.2f}")
+        print("\nModèles entraînés avec succès!")
 
-        # Sauvegarder les artefacts
+        # Sauvegarder les artefacts (pickles: XGBoost seul, format historique)
         print("\nSauvegarde des artefacts...")
         joblib.dump(model, MODEL_PATH)
         joblib.dump(scaler, SCALER_PATH)
         joblib.dump(feature_names, FEATURES_PATH)
-
-        metrics = {'r2': r2, 'mse': mse}
         joblib.dump(metrics, METRICS_PATH)
 
         print(f"   ✅ Modèle sauvegardé: {MODEL_PATH}")
@@ -116,12 +136,26 @@ def export_model():
         print(f"   ✅ Features sauvegardées: {FEATURES_PATH}")
         print(f"   ✅ Métriques sauvegardées: {METRICS_PATH}")
 
+        # Compiler les arbres en tables NumPy (scaler intégré aux seuils)
+        print("\nCompilation des arbres...")
+        compiled, compiled_report = compile_and_save(model, scaler, feature_names)
+        models["xgboost"]["compiled"] = compiled
+
+        # Bundle versionné chargé par l'application (sans pickle): toutes les familles côte à côte
+        print("\nÉcriture du bundle d'artefacts...")
+        version, bundle_dir = build_bundle(models, scaler, feature_names)
+
         return {
             "status": "success",
             "model_path": MODEL_PATH,
             "scaler_path": SCALER_PATH,
             "features_path": FEATURES_PATH,
             "metrics_path": METRICS_PATH,
+            "trees_path": TREES_PATH,
+            "bundle_path": bundle_dir,
+            "model_version": version,
+            "compiled_report": compiled_report,
+            "models": {name: entry["metrics"] for name, entry in models.items()},
             "r2_score": r2,
             "mse": mse
         }
@@ -76,7 +76,7 @@ def load_data():
 # -----------------------------
 # Step 2: Preprocess Data
 # -----------------------------
-def preprocess(df):
+def build_features(df):
     # Create features including cumulative recruitments for the year
     df = df.sort_values(["Year", "Month"])
 
@@ -90,6 +90,10 @@ def preprocess(df):
     feature_cols = ["Year", "Month", "nb_departures", "monthly_recruitment_effect", "nbemp"]
     X = df[feature_cols]
     y = df["mass_salary"]
+    return X, y, df
+
+def preprocess(df):
+    X, y, df = build_features(df)
 
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
@@ -99,8 +103,8 @@ def preprocess(df):
 # -----------------------------
 # Step 3: Train XGBoost
 # -----------------------------
-def train_xgboost(X_train, y_train):
-    model = XGBRegressor(
+def make_xgboost():
+    return XGBRegressor(
         n_estimators=300,
         learning_rate=0.05,
         max_depth=6,
@@ -109,6 +113,9 @@ def train_xgboost(X_train, y_train):
         random_state=42,
         n_jobs=-1
     )
+
+def train_xgboost(X_train, y_train):
+    model = make_xgboost()
     model.fit(X_train, y_train)
     return model
 
@@ -76,13 +76,16 @@ def preprocess(dataset):
 # -----------------------------
 # Step 4: Train Random Forest
 # -----------------------------
-def train_random_forest(X_train, y_train):
-    model = RandomForestRegressor(
+def make_random_forest():
+    return RandomForestRegressor(
         n_estimators=200,
         max_depth=None,
         random_state=42,
         n_jobs=-1
     )
+
+def train_random_forest(X_train, y_train):
+    model = make_random_forest()
     model.fit(X_train, y_train)
     return model
 
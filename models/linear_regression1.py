@@ -63,8 +63,11 @@ def preprocess(df):
 # -----------------------------
 # Step 3: Train Model
 # -----------------------------
+def make_linear_regression():
+    return LinearRegression()
+
 def train_model(X_train, y_train):
-    model = LinearRegression()
+    model = make_linear_regression()
     model.fit(X_train, y_train)
     return model
 
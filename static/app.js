@@ -8,4 +8,42 @@ async function postData(url, data, csrfToken) {
     body: JSON.stringify(data)
   });
   return res.json();
-}
\ No newline at end of file
+}
+
+// Lit une réponse NDJSON au fil de l'eau et appelle onEvent pour chaque événement
+async function streamData(url, data, onEvent, csrfToken) {
+  const headers = {
+    'Content-Type': 'application/json',
+    'Accept': 'application/x-ndjson'
+  };
+  if (csrfToken) headers['X-CSRFToken'] = csrfToken;
+
+  const res = await fetch(url, {
+    method: 'POST',
+    headers: headers,
+    body: JSON.stringify(data)
+  });
+
+  // Erreurs de validation: réponse JSON classique
+  if (!res.ok) {
+    const error = await res.json();
+    onEvent({ event: 'error', ...error });
+    return;
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.filter(line => line.trim()).forEach(line => onEvent(JSON.parse(line)));
+  }
+
+  if (buffer.trim()) onEvent(JSON.parse(buffer));
+}
@@ -0,0 +1,99 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Autocomplétion des employés: remplace les listes déroulantes de tous les employés
+    // <input data-employee-lookup data-target="matricule" [data-status="active"]>
+    // Le champ désigné par data-target (name) reçoit le matricule choisi; les champs
+    // first_name, last_name, departement et position du formulaire sont remplis s'ils existent
+    const DEBOUNCE_MS = 200;
+    const FILLED_FIELDS = ['first_name', 'last_name', 'departement', 'position'];
+
+    document.querySelectorAll('input[data-employee-lookup]').forEach(function(input) {
+        const form = input.closest('form');
+        const list = document.createElement('div');
+        list.className = 'list-group position-absolute w-100 shadow-sm';
+        list.style.zIndex = 1000;
+        input.parentElement.classList.add('position-relative');
+        input.insertAdjacentElement('afterend', list);
+        input.setAttribute('autocomplete', 'off');
+
+        let timer = null;
+        let controller = null;
+
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const query = input.value.trim();
+            if (!query) {
+                list.innerHTML = '';
+                return;
+            }
+            timer = setTimeout(function() { search(query); }, DEBOUNCE_MS);
+        });
+
+        input.addEventListener('blur', function() {
+            // Laisser le clic sur une suggestion aboutir avant de masquer la liste
+            setTimeout(function() { list.innerHTML = ''; }, 150);
+        });
+
+        async function search(query) {
+            // Seule la dernière saisie compte: la requête précédente est annulée
+            if (controller) controller.abort();
+            controller = new AbortController();
+
+            const params = new URLSearchParams({q: query, limit: 10});
+            if (input.dataset.status) params.set('status', input.dataset.status);
+
+            try {
+                const response = await fetch(`/employees/lookup?${params}`, {
+                    credentials: 'same-origin',
+                    signal: controller.signal
+                });
+                const data = await response.json();
+                if (!response.ok || data.status !== 'success') {
+                    throw new Error(data.message || `Erreur HTTP ${response.status}`);
+                }
+                displayResults(data.results);
+            } catch (error) {
+                if (error.name === 'AbortError') return;
+                console.error('Erreur:', error);
+                list.innerHTML = '';
+            }
+        }
+
+        function displayResults(results) {
+            list.innerHTML = '';
+            if (results.length === 0) {
+                const empty = document.createElement('div');
+                empty.className = 'list-group-item text-muted';
+                empty.textContent = 'Aucun employé trouvé';
+                list.appendChild(empty);
+                return;
+            }
+
+            results.forEach(function(employee) {
+                const item = document.createElement('button');
+                item.type = 'button';
+                item.className = 'list-group-item list-group-item-action';
+                item.textContent = `${employee.matricule} - ${employee.first_name} ${employee.last_name}`
+                    + (employee.departement ? ` (${employee.departement})` : '')
+                    + (employee.active ? '' : ' - parti');
+                item.addEventListener('mousedown', function(event) {
+                    event.preventDefault();
+                    select(employee);
+                });
+                list.appendChild(item);
+            });
+        }
+
+        function select(employee) {
+            input.value = `${employee.first_name} ${employee.last_name}`;
+            list.innerHTML = '';
+            if (!form) return;
+
+            const target = form.querySelector(`[name="${input.dataset.target || 'matricule'}"]`);
+            if (target) target.value = employee.matricule;
+            FILLED_FIELDS.forEach(function(name) {
+                const field = form.querySelector(`[name="${name}"]`);
+                if (field && field !== input && employee[name] != null) field.value = employee[name];
+            });
+        }
+    });
+});
@@ -0,0 +1,70 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Le résultat complet d'une prédiction n'est chargé qu'à la demande
+    document.querySelectorAll('.history-details').forEach(function(button) {
+        button.addEventListener('click', async function() {
+            const detailsRow = button.closest('tr').nextElementSibling;
+            const cell = detailsRow.querySelector('td');
+
+            if (detailsRow.style.display !== 'none') {
+                detailsRow.style.display = 'none';
+                return;
+            }
+            detailsRow.style.display = '';
+
+            if (cell.dataset.loaded) return;
+            cell.textContent = 'Chargement...';
+
+            try {
+                const response = await fetch(button.dataset.url, {credentials: 'same-origin'});
+                const data = await response.json();
+                if (!response.ok || data.status !== 'success') {
+                    throw new Error(data.message || `Erreur HTTP ${response.status}`);
+                }
+                displayResult(cell, data.result);
+                cell.dataset.loaded = '1';
+            } catch (error) {
+                console.error('Erreur:', error);
+                cell.textContent = 'Résultat indisponible';
+            }
+        });
+    });
+
+    function displayResult(cell, result) {
+        const predictions = result.predictions || [];
+        if (predictions.length === 0) {
+            cell.textContent = 'Aucune prédiction enregistrée';
+            return;
+        }
+
+        const table = document.createElement('table');
+        table.className = 'table table-sm mb-0';
+        table.innerHTML = '<thead><tr><th>Year</th><th>Total Salary</th><th>End Employees</th></tr></thead>';
+
+        const tbody = document.createElement('tbody');
+        predictions.forEach(function(pred) {
+            const row = document.createElement('tr');
+            [pred.Year, formatCurrency(pred.Total_Salary), pred.End_Employees].forEach(function(value) {
+                const td = document.createElement('td');
+                td.textContent = value;
+                row.appendChild(td);
+            });
+            tbody.appendChild(row);
+        });
+        table.appendChild(tbody);
+
+        cell.textContent = '';
+        if (result.graph) {
+            const link = document.createElement('a');
+            link.href = result.graph;
+            link.target = '_blank';
+            link.textContent = 'Graph';
+            link.className = 'd-inline-block mb-2';
+            cell.appendChild(link);
+        }
+        cell.appendChild(table);
+    }
+
+    function formatCurrency(value) {
+        return new Intl.NumberFormat('fr-FR', {style: 'currency', currency: 'EUR', maximumFractionDigits: 0}).format(value);
+    }
+});
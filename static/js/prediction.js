@@ -34,29 +34,28 @@ document.addEventListener('DOMContentLoaded', function() {
         console.log('Données envoyées:', formData);
 
         try {
-            // Fixed URL - use relative path to /predict endpoint
-            const url = '/prediction/predict';
+            // Flux NDJSON: chaque année est affichée dès qu'elle est prédite
+            const url = '/prediction/predict/stream';
             console.log('URL appelée:', url);
 
-            const response = await fetch(url, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify(formData)
+            resetResults();
+            let failed = false;
+
+            await streamData(url, formData, function(event) {
+                if (event.event === 'year') {
+                    appendYear(event.yearly);
+                    if (loadingSpinner) loadingSpinner.style.display = 'none';
+                } else if (event.event === 'graph') {
+                    displayGraph(event.graph);
+                } else if (event.event === 'done') {
+                    displayMetrics(event.metrics);
+                } else if (event.event === 'error') {
+                    failed = true;
+                    showError(event.message || 'Erreur de prédiction');
+                }
             });
 
-            console.log('Réponse reçue:', response.status);
-
-            const data = await response.json();
-            console.log('Données reçues:', data);
-
-            if (!response.ok || data.status === 'error') {
-                showError(data.message || 'Erreur de prédiction');
-                return;
-            }
-
-            displayResults(data);
+            if (failed && resultsSection) resultsSection.style.display = 'none';
 
         } catch (error) {
             console.error('Erreur détaillée:', error);
@@ -76,53 +75,53 @@ function showError(message) {
     }
 }
 
-function displayResults(data) {
-    console.log('Affichage des résultats...');
+function resetResults() {
+    const tbody = document.getElementById('predictionsTable');
+    if (tbody) tbody.innerHTML = '';
+
+    const graphImage = document.getElementById('graphImage');
+    if (graphImage) graphImage.removeAttribute('src');
+
+    const metricsDiv = document.getElementById('modelMetrics');
+    if (metricsDiv) metricsDiv.textContent = '';
+}
+
+function appendYear(pred) {
     const resultsSection = document.getElementById('resultsSection');
-    if (!resultsSection) {
-        console.error('Section results introuvable');
+    const tbody = document.getElementById('predictionsTable');
+    if (!resultsSection || !tbody) {
+        console.error('Section results ou tableau introuvable');
         return;
     }
 
-    // Afficher le graphique
+    const row = tbody.insertRow();
+    row.innerHTML = `
+        <td>${pred.Year}</td>
+        <td>${pred.Total_Salary.toLocaleString('fr-FR', {
+            minimumFractionDigits: 2,
+            maximumFractionDigits: 2
+        })}</td>
+        <td>${pred.End_Employees}</td>
+    `;
+
+    resultsSection.style.display = 'block';
+}
+
+function displayGraph(graph) {
     const graphImage = document.getElementById('graphImage');
-    if (graphImage && data.graph) {
-        graphImage.src = data.graph;
+    if (graphImage && graph) {
+        graphImage.src = graph;
         console.log('Graphique affiché');
     } else {
         console.warn('Pas de graphique ou élément img manquant');
     }
+}
 
-    // Afficher les métriques si disponibles
+function displayMetrics(metrics) {
     const metricsDiv = document.getElementById('modelMetrics');
-    if (metricsDiv && data.metrics) {
-        metricsDiv.textContent = `R2 Score: ${data.metrics.r2_score} | MSE: ${data.metrics.mse.toFixed(2)}`;
+    if (metricsDiv && metrics) {
+        metricsDiv.textContent = `R2 Score: ${metrics.r2_score} | MSE: ${metrics.mse.toFixed(2)}`;
         metricsDiv.style.display = 'block';
         console.log('Métriques affichées');
     }
-
-    // Remplir le tableau
-    const tbody = document.getElementById('predictionsTable');
-    if (tbody && data.predictions) {
-        tbody.innerHTML = '';
-
-        data.predictions.forEach(pred => {
-            const row = tbody.insertRow();
-            row.innerHTML = `
-                <td>${pred.Year}</td>
-                <td>${pred.Total_Salary.toLocaleString('fr-FR', {
-                    minimumFractionDigits: 2,
-                    maximumFractionDigits: 2
-                })}</td>
-                <td>${pred.End_Employees}</td>
-            `;
-        });
-
-        console.log(`${data.predictions.length} lignes ajoutées au tableau`);
-    } else {
-        console.error('Pas de prédictions ou tableau manquant');
-    }
-
-    resultsSection.style.display = 'block';
-    console.log('Section results affichée');
-}
\ No newline at end of file
+}
@@ -0,0 +1,357 @@
+import os
+from datetime import date
+
+# Base SQLite en mémoire (jamais la base configurée), schéma construit par les migrations
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('PRELOAD_MODEL', 'off')
+os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+os.environ.setdefault('STARTUP_REPORT', '0')
+
+import io
+import json
+
+import pytest
+
+from app import create_app, db, employee_index, facet_cache
+from app.employee_import import import_employees, iter_csv
+from app.employee_index import EmployeePrefixIndex
+from app.exports import stream_export
+from app.facet_cache import FacetCache
+from app.migrations import upgrade
+from app.models import Employee, TableVersion, User
+from app.table_versions import bump_version, table_version
+
+_app = None
+
+def _get_app():
+    global _app
+    if _app is None:
+        _app = create_app()
+        _app.config['WTF_CSRF_ENABLED'] = False
+        with _app.app_context():
+            db.create_all()
+            upgrade()
+            # Matricule sans employé: les tests vident et recréent la table employees
+            db.session.add(User(id=1, username='admin', email_adress='admin@example.com', password_hash='x',
+                                matricule=99999))
+            db.session.commit()
+    return _app
+
+def _employee(matricule, first_name, last_name, departement='IT', date_joined=date(2020, 1, 6), date_left=None):
+    return Employee(matricule=matricule, first_name=first_name, last_name=last_name, birth_date=date(1990, 1, 1),
+                    departement=departement, date_joined=date_joined, date_left=date_left, salary=2000)
+
+def _client():
+    client = _get_app().test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+    return client
+
+@pytest.fixture
+def app():
+    """Table employees vidée avant chaque test"""
+    app = _get_app()
+    with app.app_context():
+        for employee in Employee.query.all():
+            db.session.delete(employee)
+        db.session.commit()
+    return app
+
+
+def _facets(cache):
+    snapshot = cache.snapshot()
+    snapshot.pop('loaded_at')
+    return snapshot
+
+def test_facets_follow_employee_changes(app, monkeypatch):
+    cache = FacetCache(ttl=0)
+    monkeypatch.setattr(facet_cache, '_facet_cache', cache)
+    with app.app_context():
+        db.session.add_all([_employee(1, 'Amal', 'Ben Ali'), _employee(2, 'Sami', 'Trabelsi', 'Finance')])
+        db.session.commit()
+        cache.rebuild()
+
+        db.session.add_all([_employee(3, 'Léna', 'Gharbi', ' it ', date(2021, 3, 1)),
+                            _employee(4, 'Youssef', 'Mansour', None, None)])
+        db.session.commit()
+        amal, sami = db.session.get(Employee, 1), db.session.get(Employee, 2)
+        amal.departement = 'Finance'
+        sami.date_left = date(2024, 6, 30)
+        db.session.delete(db.session.get(Employee, 3))
+        db.session.commit()
+
+        # Mises à jour incrémentales (sans requête) == recomptage complet
+        rebuilt = FacetCache(ttl=0)
+        rebuilt.rebuild()
+        assert _facets(cache) == _facets(rebuilt)
+        assert _facets(cache)['departments'] == [{'name': 'FINANCE', 'active': 1, 'terminated': 1}]
+        assert _facets(cache)['status'] == {'active': 2, 'terminated': 1}
+        assert cache.count('FINANCE', 2020, 'active') == 1
+        assert cache.count(year=2020) == 2 and cache.count(status='terminated') == 1
+
+def test_facets_endpoint(app, monkeypatch):
+    monkeypatch.setattr(facet_cache, '_facet_cache', FacetCache(ttl=0))
+    with app.app_context():
+        db.session.add(_employee(1, 'Amal', 'Ben Ali'))
+        db.session.commit()
+
+    client = _client()
+    body = client.get('/employees/facets').get_json()
+    assert body['facets']['years'] == [{'year': 2020, 'active': 1, 'terminated': 0}]
+    assert client.post('/employees/facets/rebuild').get_json()['facets']['status'] == {'active': 1, 'terminated': 0}
+
+IMPORT_CSV = (
+    '\ufeffmatricule;first_name;last_name;birth_date;departement;salary;date_joined\n'
+    '10;Amal;Ben Ali;1990-01-01; it ;2500;2019-03-04\n'
+    ';Léna;Gharbi;1995-11-20;Finance;;2021-09-01\n'
+    '11;Sami;Trabelsi;15/06/1985;IT;;\n'
+    '10;Amal;Doublon;1990-01-01;IT;;\n'
+    '\n'
+    '12;Youssef;Mansour;1988-04-10;IT;-1;\n'
+)
+
+def test_import_csv_reports_rows_and_keeps_caches(app, monkeypatch):
+    facets, index = FacetCache(ttl=0), EmployeePrefixIndex(ttl=0)
+    monkeypatch.setattr(facet_cache, '_facet_cache', facets)
+    monkeypatch.setattr(employee_index, '_employee_index', index)
+    with app.app_context():
+        facets.rebuild()
+        index.rebuild()
+        report = import_employees(iter_csv(io.BytesIO(IMPORT_CSV.encode('utf-8'))), chunk_size=2).to_dict()
+
+        assert (report['rows'], report['inserted'], report['updated'], report['failed'], report['chunks']) == (5, 2, 0, 3, 3)
+        # Numéros de ligne du fichier (ligne vide ignorée)
+        assert [(error['line'], error['matricule']) for error in report['errors']] == [(4, '11'), (5, 10), (7, '12')]
+
+        amal = db.session.get(Employee, 10)
+        assert (amal.departement, amal.departement_norm, amal.join_year, float(amal.salary)) == ('IT', 'IT', 2019, 2500.0)
+        lena = Employee.query.filter_by(last_name='Gharbi').one()
+        assert lena.matricule is not None and lena.join_year == 2021
+
+        # Écritures hors ORM publiées: facettes et autocomplétion à jour
+        rebuilt = FacetCache(ttl=0)
+        rebuilt.rebuild()
+        assert _facets(facets) == _facets(rebuilt)
+        assert [entry['matricule'] for entry in index.lookup('gharbi')] == [lena.matricule]
+
+def test_import_upsert_updates_present_columns_only(app):
+    with app.app_context():
+        employee = _employee(10, 'Amal', 'Ben Ali')
+        employee.position = 'Analyste'
+        db.session.add(employee)
+        db.session.commit()
+
+        rows = 'matricule,first_name,last_name,birth_date,departement\n10,Amal,Ben Ali,1990-01-01,finance\n'
+        report = import_employees(iter_csv(io.BytesIO(rows.encode('utf-8')))).to_dict()
+        assert (report['inserted'], report['failed']) == (0, 1)
+        assert report['errors'][0]['error'] == 'matricule déjà existant'
+
+        report = import_employees(iter_csv(io.BytesIO(rows.encode('utf-8'))), mode='upsert').to_dict()
+        assert (report['inserted'], report['updated'], report['failed']) == (0, 1, 0)
+        db.session.expire_all()
+        employee = db.session.get(Employee, 10)
+        assert (employee.departement, employee.departement_norm, employee.position) == ('FINANCE', 'FINANCE', 'Analyste')
+
+def test_import_endpoint(app):
+    client = _client()
+    rows = 'first_name,last_name,birth_date\nAmal,Ben Ali,1990-01-01\n'
+
+    def post(filename, **form):
+        return client.post('/employees/import', data={'file': (io.BytesIO(rows.encode('utf-8')), filename), **form})
+
+    response = post('employees.csv')
+    assert response.status_code == 200 and response.get_json()['inserted'] == 1
+    assert post('employees.txt').status_code == 400
+    assert post('employees.csv', mode='replace').status_code == 400
+    missing = client.post('/employees/import', data={'file': (io.BytesIO(b'first_name\nAmal\n'), 'employees.csv')})
+    assert missing.status_code == 400 and 'birth_date' in missing.get_json()['message']
+
+def _add_employees(count):
+    db.session.add_all(_employee(matricule, f'Prénom{matricule}', f'Nom{matricule}', ('IT', 'Finance')[matricule % 2],
+                                 date(2015 + matricule % 5, 1, 6), date(2024, 1, 31) if matricule % 4 == 0 else None)
+                       for matricule in range(1, count + 1))
+    db.session.commit()
+
+def test_export_formats_agree(app):
+    import pyarrow.parquet as pq
+
+    with app.app_context():
+        _add_employees(7)
+        chunks = {fmt: list(stream_export('employees', fmt, batch_size=3)) for fmt in ('csv', 'ndjson', 'parquet')}
+
+    # Un morceau par lot de lignes (envoyé au fil de l'eau), plus la fin du fichier
+    assert len(chunks['csv']) == 4 and len(chunks['ndjson']) == 3
+    rows = [json.loads(line) for line in ''.join(chunks['ndjson']).splitlines()]
+    assert [row['matricule'] for row in rows] == list(range(1, 8))
+    assert 'departement_norm' not in rows[0] and rows[3]['date_left'] == '2024-01-31'
+
+    parquet = pq.ParquetFile(io.BytesIO(b''.join(chunks['parquet'])))
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read().to_pylist()
+    assert [row['matricule'] for row in table] == list(range(1, 8))
+    assert table[3]['date_left'] == date(2024, 1, 31) and table[0]['salary'] == rows[0]['salary'] == 2000.0
+
+    header, *lines = ''.join(chunks['csv']).splitlines()
+    assert header.split(',') == list(rows[0]) and len(lines) == 7
+
+def test_csv_export_round_trips_through_import(app):
+    with app.app_context():
+        # Lignes conformes aux règles du formulaire d'ajout (département en majuscules, actives)
+        db.session.add_all(_employee(matricule, f'Prénom{matricule}', f'Nom{matricule}', ('IT', 'FINANCE')[matricule % 2])
+                           for matricule in range(1, 6))
+        db.session.commit()
+        exported = ''.join(stream_export('employees', 'csv'))
+        for employee in Employee.query.all():
+            db.session.delete(employee)
+        db.session.commit()
+
+        report = import_employees(iter_csv(io.BytesIO(exported.encode('utf-8')))).to_dict()
+        assert (report['inserted'], report['failed']) == (5, 0)
+        assert ''.join(stream_export('employees', 'csv')) == exported
+
+def test_export_endpoint(app):
+    with app.app_context():
+        _add_employees(2)
+
+    client = _client()
+    response = client.get('/export/employees.ndjson')
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'].startswith('attachment; filename="employees-')
+    assert len(response.get_data(as_text=True).splitlines()) == 2
+    assert client.get('/export/salaries.csv').status_code == 400
+    assert client.get('/export/employees.xml').status_code == 400
+
+def test_lookup_follows_employee_changes(app, monkeypatch):
+    index = EmployeePrefixIndex(ttl=0)
+    monkeypatch.setattr(employee_index, '_employee_index', index)
+    with app.app_context():
+        db.session.add_all([_employee(1, 'Amal', 'Ben Ali'), _employee(12, 'Léna', 'Gharbi'),
+                            _employee(123, 'Lamia', 'Benali', date_left=date(2023, 2, 28))])
+        db.session.commit()
+
+        def matricules(prefix, **options):
+            return [entry['matricule'] for entry in index.lookup(prefix, **options)]
+
+        # Nom, prénom, "prénom nom" sans accents ni casse, matricule; un employé une seule fois
+        assert matricules('ben') == [1, 123]
+        assert matricules('LENA') == matricules('lena gh') == [12]
+        assert matricules('1') == [1, 12, 123] and matricules('1', limit=2) == [1, 12]
+        assert matricules('ben', active_only=True) == [1]
+        assert matricules('  ') == []
+
+        # Index tenu à jour par les changements validés
+        db.session.get(Employee, 12).last_name = 'Trabelsi'
+        db.session.delete(db.session.get(Employee, 1))
+        db.session.commit()
+        assert matricules('gharbi') == [] and matricules('trab') == [12]
+        assert matricules('ben') == [123]
+
+def test_lookup_endpoint(app, monkeypatch):
+    monkeypatch.setattr(employee_index, '_employee_index', EmployeePrefixIndex(ttl=0))
+    with app.app_context():
+        db.session.add_all([_employee(1, 'Amal', 'Ben Ali'), _employee(2, 'Sami', 'Ben Salah', date_left=date(2023, 2, 28))])
+        db.session.commit()
+
+    client = _client()
+    body = client.get('/employees/lookup?q=ben&status=active').get_json()
+    assert body['results'] == [{'matricule': 1, 'first_name': 'Amal', 'last_name': 'Ben Ali',
+                                'departement': 'IT', 'position': None, 'active': True}]
+    assert len(client.get('/employees/lookup?q=ben&limit=1').get_json()['results']) == 1
+
+def test_api_pages_by_key_with_projection(app):
+    with app.app_context():
+        _add_employees(5)
+
+    client = _client()
+    pages, cursor = [], None
+    while True:
+        body = client.get('/api/employees', query_string={'limit': 2, 'fields': 'last_name', 'after': cursor}).get_json()
+        pages.append([employee['matricule'] for employee in body['employees']])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert pages == [[1, 2], [3, 4], [5]]
+    assert body['employees'] == [{'matricule': 5, 'last_name': 'Nom5'}]
+
+    body = client.get('/api/employees?departement=finance&status=active').get_json()
+    assert [employee['matricule'] for employee in body['employees']] == [1, 3, 5]
+    assert body['employees'][0]['date_joined'] == '2016-01-06' and body['employees'][0]['salary'] == 2000.0
+    assert client.get('/api/employees?fields=salary,password').status_code == 400
+
+def test_api_bulk_lookup_reports_missing(app):
+    with app.app_context():
+        _add_employees(3)
+
+    client = _client()
+    body = client.get('/api/employees?matricules=3,1,99,3&fields=first_name').get_json()
+    assert body['employees'] == [{'matricule': 1, 'first_name': 'Prénom1'}, {'matricule': 3, 'first_name': 'Prénom3'}]
+    assert body['missing'] == [99]
+    assert client.get('/api/employees?matricules=1,deux').status_code == 400
+
+def test_api_etag_changes_with_the_table(app):
+    with app.app_context():
+        _add_employees(2)
+
+    client = _client()
+    first = client.get('/api/employees')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.cache_control.no_cache
+    cached = client.get('/api/employees', headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.headers['ETag'] == etag
+    # ETag propre à chaque requête
+    assert client.get('/api/employees?limit=1').headers['ETag'] != etag
+    assert client.get('/api/employees/1', headers={'If-None-Match': etag}).status_code == 200
+
+    # Écriture par l'API, puis import hors ORM: l'ancien ETag ne vaut plus
+    assert client.put('/api/employees/1', json={'position': 'Analyste'}).status_code == 200
+    changed = client.get('/api/employees', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    etag = changed.headers['ETag']
+    with app.app_context():
+        rows = 'first_name,last_name,birth_date\nAmal,Ben Ali,1990-01-01\n'
+        import_employees(iter_csv(io.BytesIO(rows.encode('utf-8'))))
+    assert client.get('/api/employees', headers={'If-None-Match': etag}).status_code == 200
+
+def test_version_counter_is_created_by_the_first_bump(app):
+    with app.app_context():
+        # Ligne absente (base sans la migration 0005): insérée puis incrémentée par l'upsert
+        TableVersion.query.filter_by(table_name='termination').delete()
+        db.session.commit()
+        for _ in range(2):
+            bump_version(db.session.connection(), 'termination')
+        db.session.commit()
+        assert table_version('termination') == 2
+
+def test_api_writes(app):
+    client = _client()
+    employee = {'matricule': 7, 'first_name': 'Amal', 'last_name': 'Ben Ali', 'birth_date': '1990-01-01', 'departement': 'it'}
+    created = client.post('/api/employees', json=employee)
+    assert created.status_code == 201 and created.get_json()['departement'] == 'IT'
+    assert client.post('/api/employees', json=employee).status_code == 409
+    assert client.post('/api/employees', json={**employee, 'matricule': 8, 'salary': -1}).status_code == 400
+
+    # Corps absent, illisible ou qui n'est pas un objet JSON
+    assert client.post('/api/employees', json=[employee]).status_code == 400
+    assert client.put('/api/employees/7', data='{', content_type='application/json').status_code == 400
+    assert client.patch('/api/employees/7/terminate').status_code == 400
+
+    updated = client.put('/api/employees/7', json={'salary': 3000}).get_json()
+    assert (updated['salary'], updated['first_name']) == (3000.0, 'Amal')
+    terminated = client.patch('/api/employees/7/terminate', json={'date_left': '2024-06-30'}).get_json()
+    assert terminated['date_left'] == '2024-06-30'
+    # Date de départ: écrite par PUT (null la retire), refusée si ce n'est pas une date
+    assert client.put('/api/employees/7', json={'date_left': '2024-07-31'}).get_json()['date_left'] == '2024-07-31'
+    assert client.put('/api/employees/7', json={'date_left': None}).get_json()['date_left'] is None
+    for date_left in (20240630, ['2024-06-30'], '30/06/2024'):
+        assert client.patch('/api/employees/7/terminate', json={'date_left': date_left}).status_code == 400
+        assert client.put('/api/employees/7', json={'date_left': date_left}).status_code == 400
+    assert client.get('/api/employees/7').get_json()['date_left'] is None
+    assert client.delete('/api/employees/7').status_code == 200
+    assert client.get('/api/employees/7').status_code == 404
+
+def test_api_requires_login(app):
+    assert _get_app().test_client().get('/api/employees').status_code == 401
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-q'])
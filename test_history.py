@@ -0,0 +1,155 @@
+import os
+from datetime import datetime, timedelta
+
+# Base SQLite en mémoire (jamais la base configurée)
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('PRELOAD_MODEL', 'off')
+os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+os.environ.setdefault('STARTUP_REPORT', '0')
+
+import re
+
+import pytest
+
+from app import create_app, db
+from app.history_writer import HistoryWriter, history_record
+from app.main import HISTORY_PAGE_SIZE
+from app.models import PredictionHistory, User
+
+SCENARIO = (2025, 2026, 10, 5, 100)
+
+_app = None
+
+def _get_app():
+    global _app
+    if _app is None:
+        _app = create_app()
+        with _app.app_context():
+            db.create_all()
+            for user_id in (1, 2):
+                db.session.add(User(id=user_id, username=f'user{user_id}', email_adress=f'user{user_id}@example.com',
+                                    password_hash='x', matricule=user_id))
+            db.session.commit()
+    return _app
+
+def _record(user_id, index, created_at=None):
+    """Ligne d'historique dont le résultat dépend de index"""
+    payload = {'predictions': [{'Year': 2025, 'Total_Salary': 1000.0 + index, 'End_Employees': 100 + index}],
+               'graph': f'data:image/png;base64,{index}'}
+    record = history_record(user_id, SCENARIO, f'key-{index}', 'test', payload)
+    if created_at is not None:
+        record['created_at'] = created_at
+    return record
+
+def _client(user_id):
+    client = _get_app().test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    return client
+
+def _page(client, url):
+    """Identifiants affichés et lien vers la page suivante"""
+    html = client.get(url).get_data(as_text=True)
+    ids = [int(history_id) for history_id in re.findall(r'/history/(\d+)/result', html)]
+    older = re.search(r'href="(/history/?\?before=[^"]+)"', html)
+    return ids, older.group(1).replace('&amp;', '&') if older else None
+
+def _history_count():
+    with _get_app().app_context():
+        return PredictionHistory.query.count()
+
+@pytest.fixture
+def history():
+    """Historique vidé avant chaque test"""
+    app = _get_app()
+    with app.app_context():
+        PredictionHistory.query.delete()
+        db.session.commit()
+    return app
+
+
+def test_history_pages_cover_every_row_once(history):
+    # Dates identiques sur plusieurs lignes: départage par id
+    base = datetime(2025, 1, 1)
+    records = [_record(1, index, base + timedelta(minutes=index // 3)) for index in range(2 * HISTORY_PAGE_SIZE + 5)]
+    records += [_record(2, 100 + index, base) for index in range(3)]
+    writer = HistoryWriter(history, enabled=False)
+    for record in records:
+        writer.submit(record)
+
+    with history.app_context():
+        expected = [row.id for row in PredictionHistory.query.filter_by(user_id=1).order_by(
+            PredictionHistory.created_at.desc(), PredictionHistory.id.desc())]
+
+    client = _client(1)
+    pages, url = [], '/history'
+    while url:
+        ids, url = _page(client, url)
+        pages.append(ids)
+    assert [len(ids) for ids in pages] == [HISTORY_PAGE_SIZE, HISTORY_PAGE_SIZE, 5]
+    assert sum(pages, []) == expected
+
+    # Curseur illisible: première page
+    assert _page(client, '/history?before=pas-un-curseur')[0] == pages[0]
+
+def test_history_result_is_loaded_on_demand(history):
+    writer = HistoryWriter(history, enabled=False)
+    writer.submit(_record(1, 7))
+    writer.submit(_record(2, 8))
+    with history.app_context():
+        own, other = (PredictionHistory.query.filter_by(user_id=user_id).one() for user_id in (1, 2))
+        assert (own.total_payroll, own.horizon_years, own.end_employees) == (1007.0, 1, 107)
+        own_id, other_id = own.id, other.id
+
+    client = _client(1)
+    response = client.get(f'/history/{own_id}/result')
+    assert response.status_code == 200 and response.cache_control.private
+    # Images base64 retirées du résultat stocké
+    assert response.get_json()['result'] == {'predictions': [{'Year': 2025, 'Total_Salary': 1007.0, 'End_Employees': 107}]}
+    assert client.get(f'/history/{other_id}/result').status_code == 404
+
+def test_writer_batches_rows(history):
+    writer = HistoryWriter(history, batch_size=50, flush_interval=0.05)
+    for index in range(120):
+        # Dix résultats distincts: un seul stockage par résultat partagé
+        writer.submit(_record(1, index % 10))
+    writer.flush()
+
+    stats = writer.stats()
+    assert (stats['enqueued'], stats['written'], stats['sync_writes'], stats['depth']) == (120, 120, 0, 0)
+    assert stats['batches'] < 120 and 'flush_ms' in stats
+    assert _history_count() == 120
+    with history.app_context():
+        assert db.session.query(PredictionHistory.result_id).distinct().count() == 10
+    writer.shutdown()
+
+def test_writer_writes_synchronously_when_full(history, monkeypatch):
+    writer = HistoryWriter(history, maxsize=2, put_timeout=0.01)
+    # Thread d'écriture jamais démarré: la base "ne suit pas"
+    monkeypatch.setattr(writer, '_ensure_started', lambda: None)
+    for index in range(3):
+        writer.submit(_record(1, index))
+
+    stats = writer.stats()
+    assert (stats['enqueued'], stats['depth'], stats['backpressure_waits'], stats['sync_writes']) == (2, 2, 1, 1)
+    # Aucune ligne perdue: celle qui n'a pas trouvé de place est déjà écrite
+    assert _history_count() == 1
+
+    writer.shutdown()
+    assert _history_count() == 3 and writer.stats()['depth'] == 0
+    # Après l'arrêt, les lignes sont écrites par la requête
+    writer.submit(_record(1, 3))
+    assert _history_count() == 4
+
+def test_writer_keeps_the_batch_when_a_row_fails(history):
+    writer = HistoryWriter(history, enabled=False)
+    # user_id manquant: NOT NULL refusé par la base
+    writer._write_batch([_record(1, 0), _record(None, 1), _record(1, 2)])
+
+    stats = writer.stats()
+    assert (stats['written'], stats['failed']) == (2, 1)
+    assert _history_count() == 2
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-q'])
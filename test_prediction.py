@@ -0,0 +1,413 @@
+import json
+import os
+import time
+from types import SimpleNamespace
+
+# Base SQLite en mémoire (jamais la base configurée)
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('PRELOAD_MODEL', 'off')
+os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+os.environ.setdefault('STARTUP_REPORT', '0')
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import create_app, db, model_loader, rendering, scenario_cache
+from app.artifact_bundle import LinearModel, write_bundle
+from app.model_stats import ModelStats
+from app.prediction import (FEATURE_COLUMNS, build_features, optimize_recruitments, predict_batch, predict_salaries, sensitivity_grid,
+                            simulate_salaries)
+from app.rendering import GraphRenderer, digest_from_url
+from app.scenario_cache import ScenarioCache
+from app.tree_engine import TreeEnsemble
+
+SCENARIO = {'start_year': 2025, 'end_year': 2026, 'recruitments': 10, 'departures': 5, 'initial_employees': 100}
+
+
+def _write_linear_bundle(bundles_dir, coef):
+    """Bundle minimal (un modèle linéaire), désigné comme version courante"""
+    scaler = SimpleNamespace(mean_=np.zeros(len(FEATURE_COLUMNS)), scale_=np.ones(len(FEATURE_COLUMNS)))
+    model = LinearModel(np.asarray(coef, dtype=float), 1000.0)
+    version, _ = write_bundle(bundles_dir, {'linear': {'family': 'linear', 'model': model, 'metrics': {'r2': 1.0}}},
+                              scaler, FEATURE_COLUMNS, 'linear')
+    return version
+
+@pytest.fixture
+def two_bundles(tmp_path, monkeypatch):
+    """Deux versions dans un dossier de bundles temporaire; la seconde est la version courante"""
+    bundles_dir = str(tmp_path / 'bundles')
+    old = _write_linear_bundle(bundles_dir, [0, 0, 0, 0, 10])
+    new = _write_linear_bundle(bundles_dir, [0, 0, 0, 0, 20])
+    monkeypatch.setattr(model_loader, 'BUNDLES_DIR', bundles_dir)
+    monkeypatch.setattr(model_loader, 'registry', model_loader.ModelRegistry())
+    monkeypatch.setattr(model_loader, '_pinned', {})
+    return old, new
+
+
+def test_worker_bundle_is_pinned_to_parent_version(two_bundles):
+    old, new = two_bundles
+    assert model_loader.get_bundle().version == new
+
+    # Un processus du pool dont le bundle courant a changé score avec la version du parent
+    pinned = model_loader.get_bundle_version(old)
+    assert pinned.version == old
+    assert model_loader.get_bundle_version(new).version == new
+
+    scenarios = [(2025, 2026, 10, 5, 100)]
+    old_result = predict_batch(scenarios, version=old)[0][1]
+    new_result = predict_batch(scenarios, version=new)[0][1]
+    assert (old_result['Total_Salary'] < new_result['Total_Salary']).all()
+    assert old_result['Total_Salary'].tolist() == predict_batch(scenarios, bundle=pinned)[0][1]['Total_Salary'].tolist()
+
+def test_unavailable_version_fails(two_bundles):
+    with pytest.raises(RuntimeError):
+        model_loader.get_bundle_version('0000000000000000')
+
+
+def _loop_forecast(bundle, start_year, end_year, recruitments, departures, initial_employees):
+    """Ancienne boucle de predict_salaries: un appel au modèle par mois; masse salariale annuelle"""
+    yearly, employees = [], float(initial_employees)
+    for year in range(start_year, end_year + 1):
+        total = 0.0
+        for month in range(1, 13):
+            row = [year, month, departures / 12, recruitments / 12,
+                   max(1, employees + (recruitments / 12 - departures / 12) * (month - 1))]
+            frame = pd.DataFrame([row], columns=FEATURE_COLUMNS)
+            total += max(0.0, float(bundle.model.predict(bundle.scaler.transform(frame))[0]))
+        yearly.append(total)
+        employees = max(0, employees + recruitments - departures)
+    return yearly
+
+def test_vectorized_scoring_matches_monthly_loop():
+    bundle = model_loader.get_bundle().select('xgboost')
+    for scenario in ((2025, 2030, 120, 80, 1500), (2026, 2027, 0, 300, 200)):
+        yearly_df = predict_salaries(*scenario, bundle=bundle)[1]
+        # Le booster cumule ses arbres en float32, l'évaluateur compilé en float64: écart
+        # relatif de l'ordre de 1e-7 par mois (une dizaine d'euros sur une masse annuelle de 5e7)
+        assert np.allclose(yearly_df['Total_Salary'], _loop_forecast(bundle, *scenario), rtol=1e-6, atol=0)
+
+def test_batch_matches_single_scenarios():
+    bundle = model_loader.get_bundle()
+    scenarios = [(2025, 2030, 120, 80, 1500), (2025, 2026, 10, 5, 100), (2030, 2032, 0, 50, 40)]
+    for scenario, (monthly_df, yearly_df) in zip(scenarios, predict_batch(scenarios, bundle)):
+        single_monthly, single_yearly = predict_salaries(*scenario, bundle=bundle)
+        assert np.allclose(yearly_df['Total_Salary'], single_yearly['Total_Salary'], rtol=1e-6, atol=0)
+        assert yearly_df['End_Employees'].tolist() == single_yearly['End_Employees'].tolist()
+        assert monthly_df['Employees'].tolist() == single_monthly['Employees'].tolist()
+
+
+def test_simulation_does_not_depend_on_worker_count():
+    bundle = model_loader.get_bundle()
+    options = {'n_samples': 600, 'recruitments_std': 15.0, 'seed': 7, 'chunk_size': 200, 'bundle': bundle}
+    serial = simulate_salaries(2025, 2028, 100, 60, 1000, max_workers=1, **options)
+    # Chaque bloc a sa graine dérivée de seed: mêmes tirages, quel que soit le processus qui le calcule
+    assert simulate_salaries(2025, 2028, 100, 60, 1000, max_workers=2, **options) == serial
+    assert simulate_salaries(2025, 2028, 100, 60, 1000, max_workers=1, **{**options, 'seed': 8}) != serial
+
+    assert serial['quantiles'] == ['P10', 'P50', 'P90'] and len(serial['monthly']) == 48
+    for year in serial['yearly']:
+        assert year['P10'] <= year['P50'] <= year['P90']
+        assert year['End_Employees_P10'] <= year['End_Employees_P90']
+
+
+def test_sensitivity_grid_matches_single_scenarios():
+    bundle = model_loader.get_bundle()
+    recruitments, departures, initial = [0, 50, 200], [10, 100], [300, 1200]
+    yearly_salaries, end_employees = sensitivity_grid(2025, 2027, recruitments, departures, initial, bundle=bundle)
+    assert yearly_salaries.shape == end_employees.shape == (2, 3, 2, 3)
+    for i, n_initial in enumerate(initial):
+        for r, n_recruitments in enumerate(recruitments):
+            for d, n_departures in enumerate(departures):
+                yearly_df = predict_salaries(2025, 2027, n_recruitments, n_departures, n_initial, bundle=bundle)[1]
+                assert np.allclose(yearly_salaries[i, r, d], yearly_df['Total_Salary'], rtol=1e-6, atol=0.01)
+                assert end_employees[i, r, d].tolist() == yearly_df['End_Employees'].tolist()
+
+
+def test_optimizer_respects_budget_and_bounds():
+    bundle = model_loader.get_bundle()
+    # Budget annuel: masse salariale sans recrutement + 5 %
+    baseline = predict_salaries(2025, 2027, 0, 40, 800, bundle=bundle)[1]['Total_Salary'].tolist()
+    budget = [round(total * 1.05, 2) for total in baseline]
+    params = dict(start_year=2025, end_year=2027, departures=40, initial_employees=800, budget=budget,
+                  max_recruitments=300, population=100, iterations=20, seed=11, bundle=bundle)
+    result = optimize_recruitments(**params)
+
+    assert result['feasible']
+    assert all(0 <= hires <= 300 for hires in result['recruitments'])
+    assert all(year['Total_Salary'] <= year['Budget'] for year in result['yearly'])
+    # Les montants rapportés sont ceux du calendrier retenu
+    yearly_df = predict_salaries(2025, 2027, result['recruitments'], 40, 800, bundle=bundle)[1]
+    assert np.allclose([year['Total_Salary'] for year in result['yearly']], yearly_df['Total_Salary'], rtol=1e-6)
+    assert result['end_employees'] == yearly_df['End_Employees'].iloc[-1]
+    # Le budget laisse de la marge: mieux que l'effectif sans recrutement (800 - 3 x 40)
+    assert result['end_employees'] > 680
+    # Même graine, même calendrier
+    assert optimize_recruitments(**params)['recruitments'] == result['recruitments']
+
+def test_optimizer_reports_infeasible_budget():
+    bundle = model_loader.get_bundle()
+    baseline = predict_salaries(2025, 2026, 0, 10, 500, bundle=bundle)[1]['Total_Salary'].sum()
+    result = optimize_recruitments(2025, 2026, 10, 500, total_budget=baseline * 0.5, population=50,
+                                   iterations=5, seed=1, bundle=bundle)
+    assert not result['feasible']
+    # Le moins mauvais calendrier ne recrute personne
+    assert result['recruitments'] == [0, 0]
+
+def test_grouped_tree_evaluation_matches_traversal(monkeypatch):
+    # Plusieurs blocs de groupes, et des effectifs exactement sur des seuils
+    monkeypatch.setattr(TreeEnsemble, 'MAX_GROUP_CELLS', 5000)
+    initial, recruitments, departures = np.meshgrid([800.0, 1500.0], np.linspace(0, 300, 12), np.linspace(0, 120, 12),
+                                                    indexing='ij')
+    features, _, _ = build_features(2025, 2029, recruitments[..., None], departures[..., None], initial)
+    rows = features.reshape(-1, len(FEATURE_COLUMNS))
+    bundle = model_loader.get_bundle()
+    for name in bundle.models:
+        compiled = bundle.select(name).compiled
+        if compiled is None:
+            continue
+        points = compiled.split_points()[4]
+        rows[::7, 4] = points[np.arange(len(rows[::7])) % len(points)]
+        grouped = compiled._predict_grouped(rows)
+        assert grouped is not None
+        traversed = np.concatenate([compiled._predict_chunk(rows[start:start + 64]) for start in range(0, len(rows), 64)])
+        np.testing.assert_allclose(grouped, traversed, rtol=1e-12)
+
+@pytest.mark.parametrize('model_name', ['xgboost', 'random_forest', 'linear'])
+def test_interactive_paths_stay_under_a_second(model_name):
+    bundle = model_loader.get_bundle().select(model_name)
+    grid = (np.linspace(0, 500, 50), np.linspace(0, 200, 50), [1000])
+    sensitivity_grid(2025, 2026, *grid, bundle=bundle)
+
+    # Grille 50 x 50 sur 10 ans, 1000 trajectoires sur 20 ans (un seul processus)
+    start = time.perf_counter()
+    sensitivity_grid(2025, 2034, *grid, bundle=bundle)
+    assert time.perf_counter() - start < 1.0
+    start = time.perf_counter()
+    simulate_salaries(2025, 2044, 100, 50, 1000, n_samples=1000, seed=1, max_workers=1, bundle=bundle)
+    assert time.perf_counter() - start < 1.0
+
+def test_ab_routing_is_stable_and_weighted():
+    bundle = model_loader.get_bundle()
+    split = model_loader.parse_model_split('xgboost:3,linear:1,unknown:5')
+    assert split == [('xgboost', 3.0), ('linear', 1.0), ('unknown', 5.0)]
+    chosen = [model_loader.route_model(bundle, None, f'scenario-{i}', split).model_name for i in range(2000)]
+    # Modèle absent du bundle ignoré; même clé, même modèle
+    assert set(chosen) == {'xgboost', 'linear'}
+    assert 0.2 < chosen.count('linear') / len(chosen) < 0.3
+    assert model_loader.route_model(bundle, None, 'scenario-7', split).model_name == chosen[7]
+    assert model_loader.route_model(bundle, 'linear', 'scenario-7', split).model_name == 'linear'
+    with pytest.raises(KeyError):
+        model_loader.route_model(bundle, 'unknown')
+    with pytest.raises(ValueError):
+        model_loader.parse_model_split('linear:-1')
+
+def test_model_stats_counts_calls_rows_and_errors():
+    stats = ModelStats(window=10)
+    for _ in range(12):
+        with stats.timed('linear', 24):
+            pass
+    with pytest.raises(RuntimeError):
+        with stats.timed('linear', 5):
+            raise RuntimeError('échec')
+    snapshot = stats.snapshot()['linear']
+    assert (snapshot['calls'], snapshot['rows'], snapshot['errors']) == (13, 12 * 24 + 5, 1)
+    assert 0 <= snapshot['latency_ms']['p50'] <= snapshot['latency_ms']['p95'] <= snapshot['latency_ms']['max']
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Application sur une base vide; graphiques (rendus dans le processus) et cache dans tmp_path"""
+    monkeypatch.setattr(rendering, '_graph_renderer', GraphRenderer(str(tmp_path / 'graphs'), workers=0))
+    monkeypatch.setattr(scenario_cache, '_scenario_cache', ScenarioCache())
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app.test_client()
+
+def _touch(path, mtime):
+    os.utime(path, (mtime, mtime))
+
+def test_graph_sweep_removes_least_recently_used(tmp_path):
+    renderer = GraphRenderer(str(tmp_path), workers=0)
+    digests = []
+    for salary in (1000.0, 2000.0, 3000.0):
+        spec = {'kind': 'monthly', 'version': 1, 'periods': ['2025-01', '2025-02'], 'salaries': [salary, salary]}
+        digest = rendering.spec_digest(spec)
+        renderer._write(digest, 'json', json.dumps(spec).encode('utf-8'))
+        renderer._write(digest, 'png', b'x' * 1000)
+        digests.append(digest)
+    oldest, middle, newest = digests
+    for age, digest in zip((300, 200, 100), digests):
+        for ext in ('json', 'png'):
+            _touch(renderer._path(digest, ext), 1_000_000 - age)
+    # Le plus ancien redevient le plus récemment utilisé
+    assert renderer.keep(oldest)
+
+    size = sum(os.path.getsize(renderer._path(digest, ext)) for digest in digests for ext in ('json', 'png'))
+    renderer.max_bytes = size - 1
+    assert renderer.sweep() == 1
+    assert not renderer.keep(middle) and not os.path.exists(renderer._path(middle, 'png'))
+    assert renderer.keep(oldest) and renderer.keep(newest)
+    assert renderer.get(middle, 'png') is None
+
+def test_graph_submit_renders_each_png_once(tmp_path, monkeypatch):
+    renderer = GraphRenderer(str(tmp_path), workers=1)
+    rendered = []
+    monkeypatch.setattr(renderer, '_render_async', lambda digest, fmt, spec: rendered.append((digest, fmt)))
+    monthly = pd.DataFrame({'Year': [2025, 2025], 'Month': [1, 2], 'Predicted_Salary': [1000.0, 1100.0]})
+
+    digest = renderer.submit(monthly)
+    assert rendered == [(digest, 'png')]
+    renderer._write(digest, 'png', b'png')
+    # Graphique déjà rendu: spécification conservée, aucun nouveau rendu
+    assert renderer.submit(monthly) == digest and rendered == [(digest, 'png')]
+
+def test_scenario_cache_disk_is_bounded(tmp_path):
+    cache = ScenarioCache(maxsize=1, cache_dir=str(tmp_path), max_disk_bytes=20_000)
+    keys = [cache.make_key('forecast', [index], 'v') for index in range(100)]
+    for index, key in enumerate(keys):
+        cache.set(key, {'predictions': 'x' * 1000})
+        _touch(cache._path(key), 1_000_000 + index)
+
+    # Balayage à l'écriture: le dossier reste sous la borne (à SWEEP_EVERY près) et garde les plus récents
+    assert sum(entry.stat().st_size for entry in os.scandir(tmp_path)) <= 20_000 * (1 + scenario_cache.SWEEP_EVERY)
+    assert cache.stats()['disk_evictions'] > 0
+    assert cache.get(keys[-2]) is not None
+    assert cache.get(keys[0]) is None
+
+def test_predict_renders_swept_graph_again(client):
+    first = client.post('/prediction/predict', json=SCENARIO).get_json()
+    digest = digest_from_url(first['graph'])
+    renderer = rendering._graph_renderer
+    assert renderer.keep(digest)
+
+    # Graphique supprimé par le balayage: le résultat en cache le redemande, il est recalculé
+    for name in os.listdir(renderer.graph_dir):
+        os.remove(os.path.join(renderer.graph_dir, name))
+    second = client.post('/prediction/predict', json=SCENARIO).get_json()
+    assert second['graph'] == first['graph']
+    assert second['predictions'] == first['predictions']
+    assert client.get(second['graph']).status_code == 200
+
+
+def test_batch_endpoint_keeps_order_and_reports_invalid(client):
+    scenarios = [SCENARIO, {**SCENARIO, 'end_year': 2020}, {**SCENARIO, 'initial_employees': 400}]
+    body = client.post('/prediction/batch', json={'scenarios': scenarios}).get_json()
+    assert body['status'] == 'success' and body['count'] == 3
+    assert [result['status'] for result in body['results']] == ['success', 'error', 'success']
+    assert 'predictions' not in body['results'][1]
+
+    bundle = model_loader.get_bundle()
+    for index in (0, 2):
+        expected = predict_salaries(*(scenarios[index][field] for field in SCENARIO), bundle=bundle)[1]
+        predictions = body['results'][index]['predictions']
+        assert [p['End_Employees'] for p in predictions] == expected['End_Employees'].tolist()
+        assert np.allclose([p['Total_Salary'] for p in predictions], expected['Total_Salary'], rtol=1e-6, atol=0)
+
+    assert client.post('/prediction/batch', json={'scenarios': []}).status_code == 400
+
+
+def test_predict_with_seeded_simulation(client):
+    request = {**SCENARIO, 'simulate': True, 'n_samples': 200, 'seed': 3}
+    first = client.post('/prediction/predict', json=request).get_json()
+    assert first['simulation']['n_samples'] == 200 and first['simulation']['seed'] == 3
+    # Simulation avec graine reproductible: même réponse
+    assert client.post('/prediction/predict', json=request).get_json()['simulation'] == first['simulation']
+    assert client.post('/prediction/predict', json={**request, 'n_samples': 0}).status_code == 400
+
+
+def test_sensitivity_endpoint_layout(client):
+    request = {'start_year': 2025, 'end_year': 2026, 'recruitments': {'start': 0, 'stop': 100, 'step': 50},
+               'departures': [10, 20], 'initial_employees': 500}
+    body = client.post('/prediction/sensitivity', json=request).get_json()
+    assert body['recruitments'] == [0, 50, 100] and body['initial_employees'] == [500]
+    # Une grille par (effectif initial, année): lignes = recrutements, colonnes = départs
+    assert [(grid['initial_employees'], grid['year']) for grid in body['grids']] == [(500, 2025), (500, 2026)]
+    assert all(len(grid['total_payroll']) == 3 and len(grid['total_payroll'][0]) == 2 for grid in body['grids'])
+    expected = predict_salaries(2025, 2026, 50, 20, 500, bundle=model_loader.get_bundle())[1]
+    assert np.isclose(body['grids'][1]['total_payroll'][1][1], expected['Total_Salary'][1], rtol=1e-6)
+
+    too_large = {**request, 'recruitments': {'start': 0, 'stop': 10000}, 'departures': {'start': 0, 'stop': 10}}
+    assert client.post('/prediction/sensitivity', json=too_large).status_code == 400
+
+
+def test_optimize_endpoint(client):
+    request = {'start_year': 2025, 'end_year': 2026, 'departures': 10, 'initial_employees': 500,
+               'total_budget': 1e12, 'max_recruitments': 50, 'population': 20, 'iterations': 3, 'seed': 2}
+    body = client.post('/prediction/optimize', json=request).get_json()
+    # Budget sans contrainte: recrutement maximal chaque année
+    assert body['status'] == 'success' and body['feasible'] and body['recruitments'] == [50, 50]
+    assert client.post('/prediction/optimize', json={**request, 'budget': 1e6}).status_code == 400
+    assert client.post('/prediction/optimize', json={**request, 'population': 5}).status_code == 400
+
+
+def _chunks(response):
+    return [chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk for chunk in response.response]
+
+def test_stream_ndjson_framing(client):
+    response = client.post('/prediction/predict/stream', json=SCENARIO, buffered=False)
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['X-Accel-Buffering'] == 'no'
+    # Un événement par morceau émis, chacun sur une ligne complète
+    chunks = _chunks(response)
+    assert all(chunk.endswith('\n') and chunk.count('\n') == 1 for chunk in chunks)
+    events = [json.loads(chunk) for chunk in chunks]
+    assert [event['event'] for event in events] == ['year', 'year', 'graph', 'done']
+
+    expected = predict_salaries(*SCENARIO.values(), bundle=model_loader.get_bundle())
+    assert [event['yearly'] for event in events[:2]] == expected[1].to_dict('records')
+    assert all(len(event['monthly']) == 12 for event in events[:2])
+    # Le flux complet alimente le cache de /predict: même graphique, mêmes prévisions
+    predict = client.post('/prediction/predict', json=SCENARIO).get_json()
+    assert predict['graph'] == events[2]['graph']
+    assert predict['predictions'] == [event['yearly'] for event in events[:2]]
+
+def test_stream_sse_framing(client):
+    for kwargs in ({'query_string': {'format': 'sse'}}, {'headers': {'Accept': 'text/event-stream'}}):
+        response = client.post('/prediction/predict/stream', json=SCENARIO, buffered=False, **kwargs)
+        assert response.mimetype == 'text/event-stream'
+        chunks = _chunks(response)
+        assert all(chunk.endswith('\n\n') for chunk in chunks)
+        for chunk in chunks:
+            event_line, data_line = chunk.rstrip('\n').split('\n')
+            assert event_line.startswith('event: ') and data_line.startswith('data: ')
+            assert json.loads(data_line[len('data: '):])['event'] == event_line[len('event: '):]
+        assert [chunk.split('\n')[0] for chunk in chunks][-1] == 'event: done'
+
+    assert client.post('/prediction/predict/stream', json={**SCENARIO, 'end_year': 2000}).status_code == 400
+
+
+def test_predict_serves_the_requested_model(client):
+    bundle = model_loader.get_bundle()
+
+    def calls():
+        return {model['name']: (model['stats'] or {}).get('calls', 0)
+                for model in client.get('/prediction/models').get_json()['models']}
+
+    before = calls()
+
+    body = client.post('/prediction/predict', json={**SCENARIO, 'model': 'linear'}).get_json()
+    assert (body['model'], body['model_version']) == ('linear', bundle.version)
+    expected = predict_salaries(*SCENARIO.values(), bundle=bundle.select('linear'))[1]
+    assert [p['Total_Salary'] for p in body['predictions']] == expected['Total_Salary'].tolist()
+    default = client.post('/prediction/predict', json=SCENARIO).get_json()
+    assert default['model'] == bundle.default_model and default['predictions'] != body['predictions']
+
+    assert calls()['linear'] > before['linear']
+    listed = client.get('/prediction/models').get_json()['models']
+    assert all(set(model['training_metrics']) == {'r2_score', 'mse'} for model in listed)
+    assert client.post('/prediction/predict', json={**SCENARIO, 'model': 'unknown'}).status_code == 400
+
+def test_non_object_json_body_is_rejected(client):
+    for url in ('/prediction/predict', '/prediction/predict/stream', '/prediction/batch',
+                '/prediction/sensitivity', '/prediction/optimize'):
+        for body in ([1, 2], 5, 'texte', True):
+            response = client.post(url, json=body)
+            assert response.status_code == 400, (url, body)
+            assert response.get_json()['status'] == 'error'
+
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-q'])
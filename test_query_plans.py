@@ -0,0 +1,221 @@
+import os
+from datetime import date, datetime
+
+# Base SQLite en mémoire (jamais la base configurée), schéma construit par les migrations
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('PRELOAD_MODEL', 'off')
+os.environ.setdefault('MODEL_WATCH_INTERVAL', '0')
+os.environ.setdefault('STARTUP_REPORT', '0')
+
+import re
+
+from sqlalchemy import and_, event, inspect, or_, text
+
+from app import create_app, db
+from app.employees import filter_employees, search_employees
+from app.headcount import HEADCOUNT, current_headcount, current_headcount_query, rebuild_headcount
+from app.migrations import upgrade
+from app.models import Employee, PredictionHistory, Recruitment, Termination
+
+# Table employees telle qu'avant la migration 0003 (sans colonnes dérivées)
+LEGACY_EMPLOYEES = """
+CREATE TABLE employees (
+    matricule INTEGER PRIMARY KEY,
+    first_name VARCHAR(50) NOT NULL,
+    last_name VARCHAR(50) NOT NULL,
+    birth_date DATE NOT NULL,
+    position VARCHAR(50),
+    salary NUMERIC(10, 2),
+    departement VARCHAR(50),
+    indemnite1 NUMERIC(10, 2),
+    indemnite2 NUMERIC(10, 2),
+    date_joined DATE,
+    date_left DATE
+)
+"""
+
+_app = None
+
+def _get_app():
+    global _app
+    if _app is None:
+        _app = create_app()
+        with _app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(text(LEGACY_EMPLOYEES))
+                conn.execute(text(
+                    "INSERT INTO employees (matricule, first_name, last_name, birth_date, departement, date_joined, date_left) "
+                    "VALUES (1, 'Amal', 'Ben Ali', '1990-01-01', ' it ', '2019-03-04', NULL), "
+                    "(2, 'Sami', 'Trabelsi', '1985-06-15', 'Finance', '2021-09-01', '2023-02-28'), "
+                    "(3, 'Léna', 'Gharbi', '1995-11-20', '', NULL, NULL), "
+                    "(4, 'Ines', 'Jaziri', '1993-03-03', ' réseaux ', NULL, NULL), "
+                    "(5000, 'Youssef', 'Mansour', '1988-04-10', 'IT', '2015-01-05', NULL)"
+                ))
+            upgrade()
+    return _app
+
+def _plan(query):
+    """Détail de EXPLAIN QUERY PLAN pour une requête SQLAlchemy (paramètres insérés)"""
+    statement = getattr(query, 'statement', query)
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    return [row[-1] for row in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+
+# Recherches par préfixe: plusieurs plages d'index, seules les lignes trouvées sont triées
+SORTED_MATCHES = {'recherche par nom', 'recherche par matricule'}
+
+def _hot_queries():
+    """Requêtes fréquentes de l'application et index attendu pour chacune"""
+    history = PredictionHistory.query.filter_by(user_id=1).filter(or_(
+        PredictionHistory.created_at < datetime(2025, 1, 1),
+        and_(PredictionHistory.created_at == datetime(2025, 1, 1), PredictionHistory.id < 100)
+    )).order_by(PredictionHistory.created_at.desc(), PredictionHistory.id.desc()).limit(21)
+
+    return {
+        'historique paginé': (history, 'ix_prediction_history_user_created'),
+        'employés par département': (filter_employees(Employee.query, departement='it'),
+                                     'ix_employees_departement_norm'),
+        'employés actifs par département': (filter_employees(Employee.query, departement='IT', status='active'),
+                                            'ix_employees_departement_norm'),
+        'employés par année d\'entrée': (filter_employees(Employee.query, year=2019), 'ix_employees_join_year'),
+        'liste des départements': (db.session.query(Employee.departement_norm).distinct()
+                                   .filter(Employee.departement_norm.isnot(None))
+                                   .order_by(Employee.departement_norm), 'ix_employees_departement_norm'),
+        'liste des années': (db.session.query(Employee.join_year).distinct()
+                             .filter(Employee.join_year.isnot(None))
+                             .order_by(Employee.join_year.desc()), 'ix_employees_join_year'),
+        'entrées sur une période': (Employee.query.filter(Employee.date_joined.between(date(2020, 1, 1), date(2020, 12, 31))),
+                                    'ix_employees_date_joined'),
+        'départs sur une période': (Employee.query.filter(Employee.date_left >= date(2020, 1, 1)),
+                                    'ix_employees_date_left'),
+        'recherche par nom': (search_employees(Employee.query, 'ben').order_by(Employee.matricule).limit(51),
+                              'ix_employees_last_name_norm'),
+        'recherche par matricule': (search_employees(Employee.query, '5').order_by(Employee.matricule).limit(51),
+                                    'PRIMARY KEY'),
+        'page suivante': (Employee.query.filter(Employee.matricule > 50).order_by(Employee.matricule).limit(51),
+                          'PRIMARY KEY'),
+        'recrutements récents': (Recruitment.query.order_by(Recruitment.recruitment_date.desc()), 'ix_recruitment_date'),
+        'départs récents': (Termination.query.order_by(Termination.termination_date.desc()), 'ix_termination_date'),
+        'effectif courant': (current_headcount_query(today=date(2024, 6, 30)), 'sqlite_autoindex_headcount_monthly_1'),
+    }
+
+def test_migration_backfills_derived_columns():
+    with _get_app().app_context():
+        rows = db.session.execute(text(
+            'SELECT matricule, departement_norm, join_year FROM employees WHERE matricule <= 4 ORDER BY matricule'
+        )).fetchall()
+        # Majuscules hors ASCII: même forme que normalize_departement() (UPPER de SQLite s'arrête à l'ASCII)
+        assert [tuple(row) for row in rows] == [(1, 'IT', 2019), (2, 'FINANCE', 2021), (3, None, None), (4, 'RÉSEAUX', None)]
+
+        names = db.session.execute(text(
+            'SELECT first_name_norm, last_name_norm FROM employees WHERE matricule <= 3 ORDER BY matricule'
+        )).fetchall()
+        assert [tuple(row) for row in names] == [('amal', 'ben ali'), ('sami', 'trabelsi'), ('lena', 'gharbi')]
+
+def test_migrations_create_referenced_tables_first():
+    # Base vide: sous MySQL une clé étrangère vers une table pas encore créée échoue,
+    # SQLite l'accepte: l'ordre des CREATE TABLE est vérifié explicitement
+    app = create_app()
+    with app.app_context():
+        created = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            match = re.match(r'\s*CREATE TABLE (?:IF NOT EXISTS )?"?(\w+)', statement)
+            if match:
+                created.append(match.group(1))
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            upgrade()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        assert set(db.metadata.tables) <= set(inspect(db.engine).get_table_names())
+        for table in db.metadata.sorted_tables:
+            for key in table.foreign_keys:
+                referenced = key.column.table.name
+                assert created.index(referenced) < created.index(table.name), \
+                    f"{table.name} créée avant {referenced}"
+
+def test_search_matches_prefixes():
+    with _get_app().app_context():
+        def matricules(search):
+            return [employee.matricule for employee in
+                    search_employees(Employee.query, search).filter(Employee.matricule <= 3).order_by(Employee.matricule)]
+
+        assert matricules('ben') == [1]
+        assert matricules('LÉN') == [3]
+        assert matricules('amal ben') == [1]
+        assert matricules('ali') == []
+        assert matricules('2') == [2]
+        # Ni débordement d'entier ni chiffres non ASCII: recherche par nom, sans résultat
+        assert matricules('9' * 40) == []
+        assert matricules('²') == []
+        assert matricules('١') == []
+
+def test_derived_columns_follow_orm_writes():
+    with _get_app().app_context():
+        employee = Employee(matricule=100, first_name='Nour', last_name='Haddad', birth_date=date(1992, 2, 2),
+                            departement='rh ', date_joined=date(2024, 5, 6))
+        db.session.add(employee)
+        db.session.commit()
+        assert (employee.departement_norm, employee.join_year) == ('RH', 2024)
+
+        employee.departement = 'Finance'
+        employee.date_joined = None
+        db.session.commit()
+        assert (employee.departement_norm, employee.join_year) == ('FINANCE', None)
+
+def test_headcount_follows_employee_writes():
+    with _get_app().app_context():
+        def rows():
+            return {(row.year, row.month, row.departement): (row.active, row.joined, row.left, float(row.payroll))
+                    for row in db.session.execute(HEADCOUNT.select()) if row.active or row.joined or row.left}
+
+        # Employés 1 et 5000 (IT) présents en juin 2024, employé 2 parti en février 2023
+        assert current_headcount('it', today=date(2024, 6, 30))['active'] == 2
+        assert rows()[(2023, 2, 'FINANCE')] == (0, 0, 1, 0.0)
+
+        employee = Employee(matricule=200, first_name='Rim', last_name='Saidi', birth_date=date(1990, 1, 1),
+                            departement='IT', salary=1500, indemnite1=100, date_joined=date(2020, 7, 1))
+        db.session.add(employee)
+        db.session.commit()
+        employee.date_left = date(2022, 3, 15)
+        db.session.commit()
+        employee.salary = 1800
+        db.session.commit()
+        employee.date_joined = date(2016, 1, 1)
+        db.session.commit()
+
+        incremental = rows()
+        with db.engine.begin() as conn:
+            rebuild_headcount(conn)
+        assert incremental == rows()
+        assert incremental[(2022, 2, 'IT')] == (3, 0, 0, 1900.0)
+        assert incremental[(2022, 3, 'IT')] == (2, 0, 1, 0.0)
+
+        # Sans date d'entrée l'employé n'est plus compté
+        employee.date_joined = None
+        db.session.commit()
+        assert current_headcount('it', today=date(2021, 1, 31))['active'] == 2
+
+def test_hot_queries_use_indexes():
+    with _get_app().app_context():
+        failures = []
+        for name, (query, index) in _hot_queries().items():
+            plan = _plan(query)
+            sorted_in_memory = any('TEMP B-TREE' in step for step in plan) and name not in SORTED_MATCHES
+            if not any(index in step for step in plan) or sorted_in_memory:
+                failures.append(f"{name}: {plan}")
+        assert not failures, 'Requêtes sans index:\n' + '\n'.join(failures)
+
+if __name__ == '__main__':
+    with _get_app().app_context():
+        for name, (query, index) in _hot_queries().items():
+            print(f"{name}: {' | '.join(_plan(query))}")
+    test_migration_backfills_derived_columns()
+    test_migrations_create_referenced_tables_first()
+    test_derived_columns_follow_orm_writes()
+    test_search_matches_prefixes()
+    test_headcount_follows_employee_writes()
+    test_hot_queries_use_indexes()
+    print("✅ Requêtes fréquentes servies par les index")
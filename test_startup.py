@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+
+# Budget de démarrage à froid (import de app + create_app), en millisecondes
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 1500))
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Exécuté dans un interpréteur neuf pour mesurer un vrai démarrage à froid
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+from app.startup import startup_report
+create_app()
+report = startup_report()
+report['wall_ms'] = (time.perf_counter() - start) * 1000
+print(json.dumps(report))
+"""
+
+def _cold_start():
+    env = dict(os.environ,
+               DATABASE_URL='sqlite://',
+               PRELOAD_MODEL='off',
+               MODEL_WATCH_INTERVAL='0',
+               STARTUP_REPORT='0')
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+# Configuration par défaut (aucune variable PRELOAD_MODEL / MODEL_WATCH_INTERVAL):
+# modèle chargé par create_app(), threads du registre avant et après la première requête
+DEFAULTS_PROBE = """
+import json, threading
+from app import create_app
+from app.model_loader import registry
+app = create_app()
+loaded = registry.loaded
+threads = lambda: sorted(thread.name for thread in threading.enumerate() if thread.name.startswith('model-registry'))
+created = threads()
+app.test_client().get('/login')
+print(json.dumps({'preload': app.config['PRELOAD_MODEL'], 'watch_interval': app.config['MODEL_WATCH_INTERVAL'],
+                  'loaded': loaded, 'after_create_app': created, 'after_request': threads()}))
+"""
+
+def test_startup_within_budget():
+    # Meilleur de trois mesures pour limiter le bruit de la machine
+    best = min(_cold_start()['wall_ms'] for _ in range(3))
+    assert best <= STARTUP_BUDGET_MS, f"Démarrage {best:.0f} ms > budget {STARTUP_BUDGET_MS:.0f} ms"
+
+def test_heavy_modules_not_imported_at_startup():
+    report = _cold_start()
+    assert report['heavy_modules_loaded'] == [], f"Modules lourds importés au démarrage: {report['heavy_modules_loaded']}"
+
+def test_every_blueprint_is_timed():
+    names = {step['name'] for step in _cold_start()['steps'] if step['kind'] == 'blueprint'}
+    assert {'auth', 'main', 'employees', 'recruitment', 'termination', 'prediction'} <= names
+
+def test_default_configuration():
+    env = {key: value for key, value in os.environ.items()
+           if key not in ('PRELOAD_MODEL', 'MODEL_WATCH_INTERVAL', 'STARTUP_REPORT')}
+    env['DATABASE_URL'] = 'sqlite://'
+    output = subprocess.run([sys.executable, '-c', DEFAULTS_PROBE], cwd=ROOT_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    report = json.loads(output.strip().splitlines()[-1])
+    # Modèle chargé et préchauffé avant que create_app() ne rende la main
+    assert report['preload'] == 'sync' and report['loaded']
+    assert 'model-registry-preload' not in report['after_create_app']
+    assert report['watch_interval'] > 0
+    # Surveillance démarrée par la première requête servie, pas par create_app()
+    assert 'model-registry-watcher' not in report['after_create_app']
+    assert 'model-registry-watcher' in report['after_request']
+
+if __name__ == '__main__':
+    report = _cold_start()
+    print(f"Démarrage à froid: {report['wall_ms']:.0f} ms (budget {STARTUP_BUDGET_MS:.0f} ms)")
+    test_startup_within_budget()
+    test_heavy_modules_not_imported_at_startup()
+    test_every_blueprint_is_timed()
+    test_default_configuration()
+    print("✅ Démarrage dans le budget")